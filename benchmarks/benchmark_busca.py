@@ -0,0 +1,127 @@
+"""
+Benchmark da busca textual: índice invertido em memória vs. LIKE no banco.
+
+Cria um banco de teste temporário com N notícias de texto sintético, monta o
+índice (``IndiceBusca.carregar``) e mede consultas de um e dois termos com
+``indice_busca.buscar``, com o full-text do banco (``busca_banco.buscar``:
+FTS5 no SQLite, tsvector + GIN no PostgreSQL) e com o filtro ``icontains``
+equivalente (varredura).
+Mede também as sugestões por prefixo (``indice_sugestoes.sugerir``).
+
+Uso: python benchmarks/benchmark_busca.py [noticias] [repeticoes]
+"""
+import os
+import random
+import sys
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'claraboiacorp.settings')
+
+import django
+
+django.setup()
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import setup_test_environment
+
+from jcpemobile import busca_banco
+from jcpemobile.busca import indice_busca
+from jcpemobile.models import Noticia
+from jcpemobile.sugestoes import indice_sugestoes
+
+PALAVRAS = (
+    'recife governo eleição prefeitura futebol sport náutico santa cruz chuva trânsito '
+    'metrô saúde hospital escola educação economia emprego turismo praia carnaval frevo '
+    'polícia segurança obra ponte estrada orçamento câmara deputado senador vacina cultura'
+).split()
+CONSULTAS = ('eleições', 'hospital', 'carnaval frevo', 'orçamento câmara', 'ponte')
+PREFIXOS = ('e', 'el', 'ele', 'elei', 'ca', 'carn', 'po', 'pont')
+
+
+def vocabulario(rng, tamanho=20000):
+    """Palavras do noticiário misturadas a um vocabulário sintético com frequência de Zipf."""
+    silabas = ('ba', 'ce', 'di', 'fo', 'gu', 'la', 'me', 'ni', 'po', 'ra', 'se', 'ti', 'vo', 'ção', 'mas')
+    palavras = list(dict.fromkeys(
+        ''.join(rng.choice(silabas) for _ in range(rng.randint(2, 4))) for _ in range(tamanho)
+    ))
+    # As palavras buscadas ficam no meio da distribuição, não entre as mais comuns
+    for i, palavra in enumerate(PALAVRAS):
+        palavras.insert(200 + i * 50, palavra)
+    pesos = [1 / posicao for posicao in range(1, len(palavras) + 1)]
+    return palavras, pesos
+
+
+def texto(rng, vocab, quantidade):
+    palavras, pesos = vocab
+    return ' '.join(rng.choices(palavras, pesos, k=quantidade))
+
+
+def popular(total):
+    rng = random.Random(42)
+    vocab = vocabulario(rng)
+    for inicio in range(0, total, 2000):
+        Noticia.objects.bulk_create([
+            Noticia(
+                titulo=texto(rng, vocab, 8).capitalize(),
+                slug=f'busca-{i}',
+                resumo=texto(rng, vocab, 25),
+                conteudo=texto(rng, vocab, 300),
+            )
+            for i in range(inicio, min(inicio + 2000, total))
+        ])
+
+
+def medir(funcao, repeticoes, consultas=CONSULTAS):
+    tempos = []
+    for _ in range(repeticoes):
+        for consulta in consultas:
+            inicio = time.perf_counter()
+            funcao(consulta)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def like(consulta):
+    """O que uma busca sem índice precisa: total de resultados e a primeira página."""
+    filtro = Q()
+    for termo in consulta.split():
+        filtro |= Q(titulo__icontains=termo) | Q(resumo__icontains=termo) | Q(conteudo__icontains=termo)
+    noticias = Noticia.objects.filter(filtro)
+    return noticias.count(), list(noticias.order_by('-data_publicacao').values_list('id', flat=True)[:20])
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    setup_test_environment()
+    nome_original = connection.creation.create_test_db(verbosity=0)
+    try:
+        popular(total)
+        cache.clear()
+        inicio = time.perf_counter()
+        indice_busca.carregar()
+        print(f'{total} notícias; índice montado em {time.perf_counter() - inicio:.1f}s')
+
+        resultados = (
+            ('índice (BM25)', medir(lambda q: indice_busca.buscar(q, limite=20), repeticoes)),
+            ('full-text banco', medir(lambda q: busca_banco.buscar(q, limite=20), repeticoes)),
+            ('LIKE no banco', medir(like, max(1, repeticoes // 4))),
+        )
+        inicio = time.perf_counter()
+        indice_sugestoes.sincronizar()
+        print(f'sugestões montadas em {time.perf_counter() - inicio:.1f}s')
+        resultados += (('sugestões', medir(indice_sugestoes.sugerir, repeticoes, PREFIXOS)),)
+        print(f"{'':16}{'média (ms)':>12}{'mediana (ms)':>14}{'p95 (ms)':>10}")
+        for nome, tempos in resultados:
+            p95 = sorted(tempos)[int(len(tempos) * 0.95) - 1]
+            print(f'{nome:16}{statistics.mean(tempos):12.2f}{statistics.median(tempos):14.2f}{p95:10.2f}')
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+"""
+Benchmark do processamento de imagens de notícia: ``imagens.cortar_e_redimensionar``
+(decodificação reduzida, recorte antes da conversão de cor) vs. o caminho
+antigo do ``Noticia.save``, que abria o upload em resolução cheia e convertia
+o quadro inteiro para RGB antes de cortar.
+
+Cada imagem é processada num subprocesso próprio, para que o pico de memória
+(``VmHWM``) seja só daquele processamento; o tempo inclui a codificação
+do JPEG final. Sem diretório, gera um corpus sintético (fotos de celular de
+12 e 50 MP, panorama, PNG com transparência e com paleta) numa pasta
+temporária.
+
+Uso: python benchmarks/benchmark_imagens.py [diretorio_com_imagens]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'claraboiacorp.settings')
+
+from PIL import Image, ImageFilter
+
+Image.MAX_IMAGE_PIXELS = None
+
+CORPUS = (
+    ('celular_12mp.jpg', (4000, 3000), 'RGB', 'JPEG'),
+    ('celular_50mp.jpg', (8160, 6120), 'RGB', 'JPEG'),
+    ('panorama_24mp.jpg', (8000, 3000), 'RGB', 'JPEG'),
+    ('arte_12mp.png', (4000, 3000), 'RGBA', 'PNG'),
+    ('grafico_4mp.png', (2400, 1600), 'P', 'PNG'),
+)
+
+
+def gerar_corpus(pasta):
+    """Fotos sintéticas: gradiente com ruído, para o JPEG ter tamanho realista."""
+    for nome, tamanho, modo, formato in CORPUS:
+        caminho = os.path.join(pasta, nome)
+        if os.path.exists(caminho):
+            continue
+        base = Image.linear_gradient('L').resize(tamanho).convert('RGB')
+        ruido = Image.effect_noise(tamanho, 40).convert('RGB')
+        img = Image.blend(base, ruido, 0.3).filter(ImageFilter.SMOOTH)
+        if modo == 'RGBA':
+            img.putalpha(Image.linear_gradient('L').resize(tamanho))
+        elif modo == 'P':
+            img = img.quantize(64)
+        img.save(caminho, format=formato, quality=92)
+        del img, base, ruido
+
+
+def processar_anterior(arquivo):
+    """O ``_processar_imagem`` de antes, sem o salvamento no storage."""
+    img = Image.open(arquivo)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
+        img = background
+    largura_original, altura_original = img.size
+    if largura_original / altura_original > 2.0:
+        nova_largura, nova_altura = int(altura_original * 2.0), altura_original
+        x_offset, y_offset = (largura_original - nova_largura) // 2, 0
+    else:
+        nova_largura, nova_altura = largura_original, int(largura_original / 2.0)
+        x_offset, y_offset = 0, (altura_original - nova_altura) // 2
+    img_cortada = img.crop((x_offset, y_offset, x_offset + nova_largura, y_offset + nova_altura))
+    if img_cortada.width > 1200:
+        img_cortada = img_cortada.resize((1200, 600), Image.Resampling.LANCZOS)
+    output = BytesIO()
+    img_cortada.save(output, format='JPEG', quality=90, optimize=True)
+    return output.getvalue()
+
+
+def processar_atual(arquivo):
+    from jcpemobile.imagens import QUALIDADE_JPEG, codificar, cortar_e_redimensionar
+
+    return codificar(cortar_e_redimensionar(arquivo), 'JPEG', quality=QUALIDADE_JPEG, optimize=True)
+
+
+def pico_rss_kib():
+    """Pico de RSS do processo. VmHWM, e não ``ru_maxrss``, que no Linux herda
+    o pico do processo pai (o que gerou o corpus) através do exec."""
+    try:
+        with open('/proc/self/status') as status:
+            for linha in status:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def executar(caminho, implementacao):
+    """Roda no subprocesso: imprime tempo e memória em JSON."""
+    import django
+
+    django.setup()
+    funcao = processar_atual if implementacao == 'atual' else processar_anterior
+    with open(caminho, 'rb') as arquivo:
+        dados = arquivo.read()
+    antes = pico_rss_kib()
+    inicio = time.perf_counter()
+    funcao(BytesIO(dados))
+    tempo = time.perf_counter() - inicio
+    pico = pico_rss_kib()
+    print(json.dumps({'tempo': tempo, 'pico_mb': pico / 1024, 'acrescimo_mb': (pico - antes) / 1024}))
+
+
+def medir(caminho, implementacao):
+    saida = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--executar', implementacao, caminho],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def main():
+    if len(sys.argv) > 1:
+        pasta = sys.argv[1]
+    else:
+        pasta = os.path.join(tempfile.gettempdir(), 'benchmark_imagens')
+        os.makedirs(pasta, exist_ok=True)
+        print(f'Gerando corpus sintético em {pasta}...')
+        gerar_corpus(pasta)
+
+    nomes = sorted(nome for nome in os.listdir(pasta) if not nome.startswith('.'))
+    print(f"{'imagem':<22}{'px':>12}  {'anterior':>22}  {'atual':>22}")
+    totais = {'anterior': [0.0, 0.0], 'atual': [0.0, 0.0]}
+    for nome in nomes:
+        caminho = os.path.join(pasta, nome)
+        with Image.open(caminho) as img:
+            largura, altura = img.size
+        linha = f'{nome:<22}{f"{largura}x{altura}":>12}'
+        for implementacao in ('anterior', 'atual'):
+            resultado = medir(caminho, implementacao)
+            totais[implementacao][0] += resultado['tempo']
+            totais[implementacao][1] = max(totais[implementacao][1], resultado['acrescimo_mb'])
+            linha += f"  {resultado['tempo'] * 1000:8.0f} ms {resultado['acrescimo_mb']:7.0f} MB"
+        print(linha)
+    print(f"{'total / pior pico':<34}" + ''.join(
+        f'  {tempo * 1000:8.0f} ms {pico:7.0f} MB' for tempo, pico in totais.values()
+    ))
+    print('(MB = acréscimo do pico de RSS durante o processamento)')
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--executar':
+        executar(sys.argv[3], sys.argv[2])
+    else:
+        main()
@@ -0,0 +1,95 @@
+"""
+Benchmark de renderização do index.html com e sem cache de fragmentos.
+
+Cria um banco de teste temporário com notícias em todas as seções e mede
+o tempo de render_to_string do template (dados já carregados), comparando
+fragmentos desligados (TTL 0) com fragmentos em cache.
+
+Uso: python benchmarks/benchmark_index.py [repeticoes]
+"""
+import os
+import sys
+import statistics
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'claraboiacorp.settings')
+
+import django
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+from django.test.utils import setup_test_environment
+
+from jcpemobile.models import Autor, Categoria, Noticia
+from jcpemobile.pagina_inicial import (
+    SECOES_PAGINA_INICIAL, carregar_pagina_inicial, contexto_fragmentos,
+)
+
+
+def popular():
+    categoria = Categoria.objects.create(nome='Benchmark')
+    autor = Autor.objects.create(nome='Redação')
+    # bulk_create: sem processamento de imagem no save(); basta o caminho do arquivo
+    Noticia.objects.bulk_create([
+        Noticia(
+            titulo=f'Notícia {i} da seção {secao}',
+            slug=f'{secao}-{i}',
+            resumo='Resumo da notícia para o card da página inicial. ' * 3,
+            conteudo='Conteúdo.',
+            imagem=f'noticias/{secao}-{i}.jpg',
+            categoria=categoria,
+            autor=autor,
+            secao=secao,
+        )
+        for secao in SECOES_PAGINA_INICIAL
+        for i in range(10)
+    ])
+
+
+def medir(contexto, request, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        render_to_string('index.html', contexto, request=request)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    setup_test_environment()
+    nome_original = connection.creation.create_test_db(verbosity=0)
+    try:
+        popular()
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        dados = carregar_pagina_inicial()
+
+        cache.clear()
+        sem_cache = dict(dados, **contexto_fragmentos())
+        sem_cache['fragmentos_ttl'] = 0
+        antes = medir(sem_cache, request, repeticoes)
+
+        cache.clear()
+        com_cache = dict(dados, **contexto_fragmentos())
+        render_to_string('index.html', com_cache, request=request)  # aquece os fragmentos
+        depois = medir(com_cache, request, repeticoes)
+
+        print(f'index.html - {repeticoes} renderizações')
+        print(f"{'':24}{'média (ms)':>12}{'mediana (ms)':>14}{'p95 (ms)':>10}")
+        for nome, tempos in (('sem cache de fragmentos', antes), ('com cache de fragmentos', depois)):
+            p95 = sorted(tempos)[int(len(tempos) * 0.95) - 1]
+            print(f'{nome:24}{statistics.mean(tempos):12.2f}{statistics.median(tempos):14.2f}{p95:10.2f}')
+        print(f'ganho: {statistics.mean(antes) / statistics.mean(depois):.1f}x')
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark da votação em enquete: ingestão em lote (``votos.BufferVotos``) vs.
+o caminho antigo, um ``exists()`` com junção e um ``create()`` por voto.
+
+Cria um banco de teste temporário com uma enquete de quatro opções e mede
+votos por segundo de IPs distintos, com uma fração de votos repetidos, em
+várias threads. No buffer, o tempo inclui o ``flush`` final.
+
+Uso: python benchmarks/benchmark_votos.py [votos] [threads]
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'claraboiacorp.settings')
+
+import django
+
+django.setup()
+
+from django.db import IntegrityError, connection, connections
+from django.test.utils import setup_test_environment
+
+from jcpemobile.enquetes import resultados_enquete
+from jcpemobile.models import Enquete, Opcao, Voto
+from jcpemobile.votos import BufferVotos
+
+
+def criar_enquete():
+    enquete = Enquete.objects.create(titulo='Benchmark', pergunta='Quem vence?')
+    opcoes = [Opcao.objects.create(enquete=enquete, texto=f'Opção {i}').id for i in range(4)]
+    return enquete.id, opcoes
+
+
+def gerar_votos(total, opcoes):
+    rng = random.Random(42)
+    # ~10% de leitores votando de novo
+    ips = [f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}' for i in range(int(total * 0.9))]
+    return [(rng.choice(opcoes), rng.choice(ips) if i % 10 == 0 else ips[i % len(ips)]) for i in range(total)]
+
+
+def em_threads(funcao, votos, threads):
+    partes = [votos[i::threads] for i in range(threads)]
+
+    def executar(parte):
+        for opcao_id, ip in parte:
+            funcao(opcao_id, ip)
+        connections.close_all()
+
+    trabalhadores = [threading.Thread(target=executar, args=(parte,)) for parte in partes]
+    inicio = time.perf_counter()
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    return time.perf_counter() - inicio
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    setup_test_environment()
+    nome_original = connection.creation.create_test_db(verbosity=0)
+    trava = threading.Lock()
+    try:
+        enquete_id, opcoes = criar_enquete()
+        votos = gerar_votos(total, opcoes)
+
+        def antigo(opcao_id, ip):
+            # SQLite não aceita escritas concorrentes: serializado como no banco
+            with trava:
+                if not Voto.objects.filter(opcao__enquete_id=enquete_id, ip_usuario=ip).exists():
+                    try:
+                        Voto.objects.create(opcao_id=opcao_id, enquete_id=enquete_id, ip_usuario=ip)
+                    except IntegrityError:
+                        pass
+
+        duracao_antigo = em_threads(antigo, votos, threads)
+        Voto.objects.all().delete()
+
+        buffer = BufferVotos(intervalo=0.5, tamanho_maximo=2000)
+        inicio = time.perf_counter()
+        em_threads(lambda opcao_id, ip: buffer.registrar(enquete_id, opcao_id, ip), votos, threads)
+        buffer.parar()
+        duracao_buffer = time.perf_counter() - inicio
+
+        resultados = resultados_enquete(enquete_id)
+        print(f'{total} votos, {threads} threads, {resultados["total"]} aceitos')
+        print(f"{'':22}{'votos/s':>10}{'total (s)':>11}")
+        print(f"{'exists + create':22}{total / duracao_antigo:10.0f}{duracao_antigo:11.2f}")
+        print(f"{'buffer + bulk_create':22}{total / duracao_buffer:10.0f}{duracao_buffer:11.2f}")
+    finally:
+        connection.creation.destroy_test_db(nome_original, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+Teste de carga dos resultados de enquete ao vivo (SSE).
+
+Abre N conexões ociosas em ``/api/enquetes/<id>/ao-vivo/``, confere que cada
+uma recebe o evento inicial de resultados e as mantém abertas por alguns
+segundos, contando eventos e pings. Só usa a biblioteca padrão (asyncio).
+
+Com o servidor ASGI rodando (ex.: ``uvicorn claraboiacorp.asgi:application``):
+
+    python benchmarks/carga_sse.py <enquete_id> [conexoes] [segundos] [host:porta]
+
+Votos feitos enquanto o teste roda aparecem na coluna de eventos: cada tick
+do servidor gera uma consulta e um evento para todas as conexões.
+"""
+import asyncio
+import resource
+import sys
+import time
+
+
+async def leitor(host, porta, caminho, estatisticas, pronto, parar):
+    try:
+        reader, writer = await asyncio.open_connection(host, porta)
+    except OSError:
+        estatisticas['falhas'] += 1
+        pronto.release()
+        return
+    writer.write(f'GET {caminho} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode())
+    await writer.drain()
+    inicial = False
+    try:
+        status = await reader.readline()
+        if b' 200 ' not in status:
+            estatisticas['falhas'] += 1
+            return
+        while not parar.is_set():
+            linha = await asyncio.wait_for(reader.readline(), timeout=60)
+            if not linha:
+                break
+            if linha.startswith(b'event: resultados'):
+                if not inicial:
+                    inicial = True
+                    estatisticas['conectadas'] += 1
+                    pronto.release()
+                else:
+                    estatisticas['eventos'] += 1
+            elif linha.startswith(b': ping'):
+                estatisticas['pings'] += 1
+    except (OSError, asyncio.TimeoutError):
+        estatisticas['quedas'] += 1
+    finally:
+        if not inicial:
+            estatisticas['falhas'] += 1
+            pronto.release()
+        writer.close()
+
+
+async def main():
+    enquete_id = int(sys.argv[1])
+    conexoes = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    segundos = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+    host, _, porta = (sys.argv[4] if len(sys.argv) > 4 else '127.0.0.1:8000').partition(':')
+    caminho = f'/api/enquetes/{enquete_id}/ao-vivo/'
+
+    # Cada conexão é um descritor de arquivo
+    _, maximo = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (maximo, maximo))
+
+    estatisticas = {'conectadas': 0, 'falhas': 0, 'quedas': 0, 'eventos': 0, 'pings': 0}
+    pronto = asyncio.Semaphore(0)
+    parar = asyncio.Event()
+    inicio = time.perf_counter()
+    tarefas = []
+    for _ in range(conexoes):
+        tarefas.append(asyncio.create_task(leitor(host, int(porta or 8000), caminho, estatisticas, pronto, parar)))
+        # Sem rajada: o backlog de accept do servidor é limitado
+        await asyncio.sleep(0.001)
+    for _ in range(conexoes):
+        await pronto.acquire()
+    print(f"{estatisticas['conectadas']} conexões com o evento inicial em {time.perf_counter() - inicio:.1f}s "
+          f"({estatisticas['falhas']} falhas)")
+
+    await asyncio.sleep(segundos)
+    print(f"após {segundos:.0f}s ociosas: {estatisticas['conectadas'] - estatisticas['quedas']} abertas, "
+          f"{estatisticas['eventos']} eventos, {estatisticas['pings']} pings, {estatisticas['quedas']} quedas")
+    parar.set()
+    for tarefa in tarefas:
+        tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
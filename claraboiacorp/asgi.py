@@ -3,6 +3,12 @@ ASGI config for claraboiacorp project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Necessário para os resultados de enquete ao vivo (Server-Sent Events em
+``/api/enquetes/<id>/ao-vivo/``), que mantêm uma conexão aberta por leitor:
+
+    uvicorn claraboiacorp.asgi:application
+    gunicorn claraboiacorp.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -154,6 +154,93 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# ==========================================================
+# 🗃️ Cache
+# Em produção aponte DJANGO_CACHE_BACKEND para um cache compartilhado entre
+# processos (ex.: django.core.cache.backends.redis.RedisCache + DJANGO_CACHE_LOCATION).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', 'jcpemobile'),
+    }
+}
+
+# Dados da página inicial por conjunto de categorias preferidas (segundos)
+PAGINA_INICIAL_CACHE_TTL = int(os.getenv('PAGINA_INICIAL_CACHE_TTL', '60'))
+PAGINA_INICIAL_TRAVA_TTL = int(os.getenv('PAGINA_INICIAL_TRAVA_TTL', '10'))
+# HTML renderizado de cada seção do index.html (invalidado por versão de seção)
+PAGINA_INICIAL_FRAGMENTOS_TTL = int(os.getenv('PAGINA_INICIAL_FRAGMENTOS_TTL', '600'))
+# HTML da página de notícia para visitantes anônimos (por slug)
+PAGINA_NOTICIA_CACHE_TTL = int(os.getenv('PAGINA_NOTICIA_CACHE_TTL', '300'))
+# Retrato dos totais do painel administrativo (recalculado em segundo plano)
+ESTATISTICAS_CACHE_TTL = int(os.getenv('ESTATISTICAS_CACHE_TTL', '60'))
+ESTATISTICAS_TRAVA_TTL = int(os.getenv('ESTATISTICAS_TRAVA_TTL', '30'))
+PAINEL_NOTICIAS_POR_PAGINA = int(os.getenv('PAINEL_NOTICIAS_POR_PAGINA', '25'))
+
+# ==========================================================
+# 👁️ Visualizações (ingestão em lote)
+# Com VISUALIZACOES_SINCRONO cada leitura é gravada na hora (testes/depuração).
+VISUALIZACOES_SINCRONO = os.getenv('VISUALIZACOES_SINCRONO', '0').lower() in ['true', '1', 't']
+VISUALIZACOES_FLUSH_INTERVALO = float(os.getenv('VISUALIZACOES_FLUSH_INTERVALO', '5'))
+VISUALIZACOES_FLUSH_TAMANHO = int(os.getenv('VISUALIZACOES_FLUSH_TAMANHO', '500'))
+# Falhas seguidas ao gravar um lote antes de descartá-lo
+VISUALIZACOES_MAX_FALHAS = int(os.getenv('VISUALIZACOES_MAX_FALHAS', '5'))
+# Dias de visualizações brutas mantidos pelo comando compactar_visualizacoes
+VISUALIZACOES_RETENCAO_DIAS = int(os.getenv('VISUALIZACOES_RETENCAO_DIAS', '90'))
+# Dias de sketches de visitantes únicos (cardinalidade.py) mantidos pelo mesmo comando
+SKETCHES_RETENCAO_DIAS = int(os.getenv('SKETCHES_RETENCAO_DIAS', '400'))
+
+# ==========================================================
+# 🗳️ Votos de enquete (ingestão em lote, votos.py)
+# Com VOTOS_SINCRONO cada voto é gravado na hora (testes/depuração).
+VOTOS_SINCRONO = os.getenv('VOTOS_SINCRONO', '0').lower() in ['true', '1', 't']
+VOTOS_FLUSH_INTERVALO = float(os.getenv('VOTOS_FLUSH_INTERVALO', '1'))
+VOTOS_FLUSH_TAMANHO = int(os.getenv('VOTOS_FLUSH_TAMANHO', '1000'))
+# Enquetes com votantes mantidos em memória (as usadas mais recentemente)
+VOTOS_ENQUETES_EM_MEMORIA = int(os.getenv('VOTOS_ENQUETES_EM_MEMORIA', '20'))
+# Falhas seguidas ao gravar um lote antes de descartá-lo
+VOTOS_MAX_FALHAS = int(os.getenv('VOTOS_MAX_FALHAS', '5'))
+
+# Resultados ao vivo (SSE, ao_vivo.py): intervalo entre agregações e ping (s)
+ENQUETE_AO_VIVO_INTERVALO = float(os.getenv('ENQUETE_AO_VIVO_INTERVALO', '1'))
+ENQUETE_AO_VIVO_PING = float(os.getenv('ENQUETE_AO_VIVO_PING', '15'))
+# Só ligar com o site servido via ASGI (claraboiacorp/asgi.py): sob WSGI cada
+# stream prende um worker. Desligado, a página consulta api_resultados_enquete
+# a cada ENQUETE_RESULTADOS_INTERVALO segundos.
+ENQUETE_AO_VIVO_SSE = os.getenv('ENQUETE_AO_VIVO_SSE', '0').lower() in ['true', '1', 't']
+ENQUETE_RESULTADOS_INTERVALO = float(os.getenv('ENQUETE_RESULTADOS_INTERVALO', '15'))
+
+# ==========================================================
+# 🖼️ Imagens de notícia (processadas em segundo plano, imagens.py)
+# Com IMAGENS_SINCRONO a imagem é processada no próprio save (testes/depuração).
+IMAGENS_SINCRONO = os.getenv('IMAGENS_SINCRONO', '0').lower() in ['true', '1', 't']
+IMAGENS_WORKERS = int(os.getenv('IMAGENS_WORKERS', '2'))
+# Uploads com mais pixels são recusados antes de decodificar (bombas de descompressão)
+IMAGENS_MAX_PIXELS = int(os.getenv('IMAGENS_MAX_PIXELS', '100000000'))
+
+# ==========================================================
+# 🔗 Notícias relacionadas (recalculadas em segundo plano, relacionadas.py)
+# Com RELACIONADAS_SINCRONO o recálculo roda no próprio commit (testes/depuração).
+RELACIONADAS_SINCRONO = os.getenv('RELACIONADAS_SINCRONO', '0').lower() in ['true', '1', 't']
+
+# Ranking deslizante de mais lidas (hoje/semana/mês) mantido em memória
+RANKING_CAPACIDADE = int(os.getenv('RANKING_CAPACIDADE', '2000'))
+RANKING_SINCRONIZACAO_INTERVALO = int(os.getenv('RANKING_SINCRONIZACAO_INTERVALO', '60'))
+RANKING_RECARGA_FECHADOS = int(os.getenv('RANKING_RECARGA_FECHADOS', '3600'))
+
+# Motor da busca pública (/api/busca/): 'memoria' (índice BM25 em cada processo)
+# ou 'banco' (tsvector + GIN no PostgreSQL, FTS5 no SQLite; busca_banco.py)
+BUSCA_MOTOR = os.getenv('BUSCA_MOTOR', 'memoria')
+
+# Nomes de tags/categorias e títulos aproximados (trigramas.py): com True e a
+# extensão pg_trgm instalada, a comparação é feita pelo PostgreSQL
+TRIGRAMAS_PG_TRGM = os.getenv('TRIGRAMAS_PG_TRGM', '0').lower() in ['true', '1', 't']
+
+# Sugestões da busca: recálculo dos pesos (s) e Cache-Control das respostas (s)
+SUGESTOES_PESOS_INTERVALO = int(os.getenv('SUGESTOES_PESOS_INTERVALO', '60'))
+SUGESTOES_CACHE_TTL = int(os.getenv('SUGESTOES_CACHE_TTL', '60'))
+SUGESTOES_CACHE_PREFIXO_CURTO = int(os.getenv('SUGESTOES_CACHE_PREFIXO_CURTO', '300'))
+
 # ==========================================================
 # 🔢 Configuração padrão de chave primária
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from .models import Categoria, Tag, Noticia, Autor, Feedback, Enquete, Opcao, Voto
+from .busca_banco import buscar_noticias
 
 # Mostra as opções dentro da página de edição de uma enquete
 class OpcaoInline(admin.TabularInline):
@@ -7,6 +11,7 @@ class OpcaoInline(admin.TabularInline):
     extra = 2  # quantas opções aparecem por padrão para adicionar
     min_num = 2  # exige no mínimo 2 opções (pode remover se quiser)
     can_delete = True  # permite remover opções
+    readonly_fields = ('quantidade_votos',)
 
 # Mostra opções dentro da enquete que está dentro da notícia
 class OpcaoEnqueteInline(admin.TabularInline):
@@ -35,10 +40,19 @@ class EnqueteAdmin(admin.ModelAdmin):
     search_fields = ('titulo', 'pergunta')
     inlines = [OpcaoInline]  # mostra as opções na mesma tela da enquete
 
+    def get_queryset(self, request):
+        # Total somado dos contadores das opções na própria consulta da listagem
+        return super().get_queryset(request).annotate(total=Coalesce(Sum('opcoes__quantidade_votos'), 0))
+
+    @admin.display(description='Total de votos', ordering='total')
+    def total_votos(self, obj):
+        return obj.total
+
 # Admin para visualizar os votos (só leitura)
 @admin.register(Voto)
 class VotoAdmin(admin.ModelAdmin):
     list_display = ('opcao', 'ip_usuario', 'data')
+    list_select_related = ('opcao',)
     list_filter = ('data',)
     search_fields = ('ip_usuario', 'opcao__texto', 'opcao__enquete__titulo')
     readonly_fields = ('opcao', 'ip_usuario', 'data')  # impede alterar votos
@@ -61,13 +75,36 @@ class TagAdmin(admin.ModelAdmin):
 	search_fields = ('nome',)
 
 
+class ListaPorRelevancia(ChangeList):
+	"""Lista de notícias que, numa busca sem ordenação escolhida, mostra as mais relevantes primeiro."""
+
+	def get_queryset(self, request, exclude_parameters=None):
+		queryset = super().get_queryset(request, exclude_parameters)
+		# A ordenação padrão é aplicada antes da busca; a anotação relevancia
+		# vem de NoticiaAdmin.get_search_results
+		if self.query.strip() and ORDER_VAR not in self.params:
+			queryset = queryset.order_by('-relevancia', '-data_publicacao', '-pk')
+		return queryset
+
+
 @admin.register(Noticia)
 class NoticiaAdmin(admin.ModelAdmin):
-	list_display = ('titulo', 'categoria', 'autor', 'data_publicacao')
+	list_display = ('titulo', 'categoria', 'autor', 'data_publicacao', 'imagem_status')
+	# Só para exibir a caixa de busca: quem busca é o banco (busca_banco.py)
 	search_fields = ('titulo', 'resumo', 'conteudo')
-	list_filter = ('categoria', 'autor', 'tags')
+	list_filter = ('categoria', 'autor', 'tags', 'imagem_status')
+	# A imagem é processada depois do save (imagens.py)
+	readonly_fields = ('imagem_status',)
 	inlines = [EnqueteInline]
 
+	def get_search_results(self, request, queryset, search_term):
+		if not search_term.strip():
+			return queryset, False
+		return buscar_noticias(search_term, queryset), False
+
+	def get_changelist(self, request, **kwargs):
+		return ListaPorRelevancia
+
 
 @admin.register(Autor)
 class AutorAdmin(admin.ModelAdmin):
@@ -0,0 +1,125 @@
+# jcpemobile/ao_vivo.py
+"""Resultados de enquete ao vivo por Server-Sent Events (ASGI).
+
+Cada processo mantém uma ``Transmissao`` por enquete com leitores conectados.
+Uma única tarefa asyncio por enquete consulta os resultados
+(``enquetes.resultados_enquete``, uma consulta) a cada
+``ENQUETE_AO_VIVO_INTERVALO`` segundos e, se mudaram, entrega o mesmo evento
+já serializado a todos os leitores: o custo por tick não depende de quantos
+estão conectados. Sem leitores, a tarefa termina. Um erro ao consultar (banco
+fora do ar, por exemplo) é registrado no log e a tarefa tenta de novo no
+próximo tick.
+
+Cada leitor tem uma fila de tamanho 1 com o último evento: um leitor lento
+pula resultados intermediários em vez de acumular memória.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .enquetes import resultados_enquete
+
+logger = logging.getLogger(__name__)
+
+
+def evento_sse(dados, evento='resultados'):
+    return f'event: {evento}\ndata: {json.dumps(dados, separators=(",", ":"))}\n\n'
+
+
+class Transmissao:
+    """Leitores de uma enquete e a tarefa que agrega e distribui os resultados."""
+
+    def __init__(self, enquete_id, intervalo):
+        self.enquete_id = enquete_id
+        self.intervalo = intervalo
+        self.leitores = set()
+        self.ultimo = None
+        self.tarefa = None
+
+    def entregar(self, evento):
+        for fila in self.leitores:
+            if fila.full():
+                fila.get_nowait()
+            fila.put_nowait(evento)
+
+    async def atualizar(self):
+        resultados = await sync_to_async(resultados_enquete)(self.enquete_id)
+        evento = evento_sse(dict(resultados, enquete_id=self.enquete_id))
+        if evento != self.ultimo:
+            self.ultimo = evento
+            self.entregar(evento)
+
+    async def executar(self):
+        try:
+            while self.leitores:
+                await asyncio.sleep(self.intervalo)
+                if not self.leitores:
+                    break
+                try:
+                    await self.atualizar()
+                except Exception:
+                    logger.exception('Erro ao atualizar os resultados ao vivo da enquete %s', self.enquete_id)
+        finally:
+            self.tarefa = None
+
+
+class CentralAoVivo:
+    """Transmissões ativas do processo (uma por enquete)."""
+
+    def __init__(self):
+        self._transmissoes = {}
+
+    def __len__(self):
+        return sum(len(transmissao.leitores) for transmissao in self._transmissoes.values())
+
+    async def conectar(self, enquete_id):
+        """Fila do novo leitor, já com os resultados atuais."""
+        transmissao = self._transmissoes.get(enquete_id)
+        if transmissao is None:
+            transmissao = self._transmissoes[enquete_id] = Transmissao(
+                enquete_id, getattr(settings, 'ENQUETE_AO_VIVO_INTERVALO', 1.0)
+            )
+        fila = asyncio.Queue(maxsize=1)
+        transmissao.leitores.add(fila)
+        try:
+            if transmissao.ultimo is None:
+                await transmissao.atualizar()
+            else:
+                fila.put_nowait(transmissao.ultimo)
+        except BaseException:
+            # Erro no banco ou cliente cancelado antes de eventos() assumir a fila
+            self.desconectar(enquete_id, fila)
+            raise
+        if transmissao.tarefa is None or transmissao.tarefa.done():
+            transmissao.tarefa = asyncio.get_running_loop().create_task(transmissao.executar())
+        return fila
+
+    def desconectar(self, enquete_id, fila):
+        transmissao = self._transmissoes.get(enquete_id)
+        if transmissao is None:
+            return
+        transmissao.leitores.discard(fila)
+        if not transmissao.leitores:
+            # A tarefa vê o conjunto vazio e termina no próximo tick
+            del self._transmissoes[enquete_id]
+
+    async def eventos(self, enquete_id):
+        """Gerador do corpo SSE de um leitor; o ping mantém proxies sem fechar a conexão."""
+        fila = await self.conectar(enquete_id)
+        ping = getattr(settings, 'ENQUETE_AO_VIVO_PING', 15.0)
+        try:
+            # O cliente reconecta após 3 s se a conexão cair
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    yield await asyncio.wait_for(fila.get(), timeout=ping)
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+        finally:
+            self.desconectar(enquete_id, fila)
+
+
+central_ao_vivo = CentralAoVivo()
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class JcpemobileConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'jcpemobile'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .busca_banco import garantir_estrutura
+
+        post_migrate.connect(garantir_estrutura, sender=self)
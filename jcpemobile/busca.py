@@ -0,0 +1,281 @@
+# jcpemobile/busca.py
+"""Busca de notícias com índice invertido em memória e ranking BM25.
+
+Título, subtítulo, resumo e conteúdo são normalizados (minúsculas, sem
+acentos, sem stopwords) e reduzidos a um radical leve (plural, gênero e
+advérbios em -mente), então "Eleições", "eleição" e "eleicao" caem no mesmo
+termo. Cada termo aponta para as notícias em que aparece com a frequência
+ponderada pelo campo (``PESOS_CAMPOS``); a consulta só visita as listas dos
+seus termos, sem varrer a tabela.
+
+Cada processo mantém o seu índice. Salvar ou apagar uma notícia registra a
+alteração no cache (``registrar_alteracao``, chamado por ``signals.py``) com
+um número de versão; antes de cada busca o índice reindexa só as notícias
+alteradas desde a versão que conhece. Se alguma alteração já expirou do
+cache, o índice é reconstruído do banco.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.utils import timezone
+
+# Peso de cada campo na frequência do termo (BM25F simplificado)
+PESOS_CAMPOS = {'titulo': 3.0, 'subtitulo': 2.0, 'resumo': 1.5, 'conteudo': 1.0}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CHAVE_VERSAO = 'busca:versao'
+ALTERACOES_TTL = 24 * 3600
+# Mais alterações pendentes que isso: reconstruir é mais barato que reindexar uma a uma
+LIMITE_ALTERACOES = 2000
+
+STOPWORDS = frozenset((
+    'a', 'ao', 'aos', 'as', 'com', 'como', 'da', 'das', 'de', 'do', 'dos', 'e', 'ela', 'ele',
+    'em', 'entre', 'era', 'foi', 'ha', 'isso', 'mais', 'mas', 'na', 'nas', 'no', 'nos', 'o',
+    'os', 'ou', 'para', 'pela', 'pelas', 'pelo', 'pelos', 'por', 'que', 'se', 'sem', 'ser',
+    'sao', 'seu', 'sua', 'um', 'uma', 'umas', 'uns',
+))
+
+# (sufixo, substituição) do plural, testados em ordem
+PLURAIS = (
+    ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+    ('ns', 'm'), ('res', 'r'), ('zes', 'z'),
+)
+
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas e sem acentos ("Eleição" -> "eleicao")."""
+    return unicodedata.normalize('NFKD', texto or '').encode('ascii', 'ignore').decode().lower()
+
+
+@lru_cache(maxsize=100_000)
+def radical(token):
+    """Stemming leve para português: remove plural, -mente e a vogal final."""
+    if len(token) <= 3 or token.isdigit():
+        return token
+    for sufixo, troca in PLURAIS:
+        if token.endswith(sufixo) and len(token) - len(sufixo) >= 2:
+            token = token[:-len(sufixo)] + troca
+            break
+    else:
+        if token.endswith('s') and not token.endswith(('ss', 'us')):
+            token = token[:-1]
+    if token.endswith('mente') and len(token) > 8:
+        token = token[:-5]
+    if len(token) > 4 and token[-1] in 'aoe':
+        token = token[:-1]
+    return token
+
+
+def termos(texto):
+    return [radical(palavra) for palavra in _PALAVRA.findall(normalizar(texto)) if palavra not in STOPWORDS]
+
+
+class IndiceBusca:
+    """Índice invertido ``termo -> {noticia_id: frequência ponderada}``."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._limpar()
+        self._carregado = False
+        self._versao = None
+
+    def _limpar(self):
+        self._postings = defaultdict(dict)
+        # noticia_id -> (comprimento, categoria_id, tag_ids, data_publicacao)
+        self._docs = {}
+        self._termos_doc = {}
+        self._comprimento_total = 0.0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def invalidar(self):
+        """Descarta o índice; a próxima busca reconstrói a partir do banco."""
+        with self._lock:
+            self._limpar()
+            self._carregado = False
+
+    # --- indexação -------------------------------------------------------
+
+    def _adicionar(self, noticia_id, campos, categoria_id, tag_ids, data_publicacao):
+        frequencias = Counter()
+        for campo, peso in PESOS_CAMPOS.items():
+            for termo in termos(campos.get(campo)):
+                frequencias[termo] += peso
+        for termo, frequencia in frequencias.items():
+            self._postings[termo][noticia_id] = frequencia
+        comprimento = sum(frequencias.values())
+        self._docs[noticia_id] = (comprimento, categoria_id, frozenset(tag_ids), data_publicacao)
+        self._termos_doc[noticia_id] = list(frequencias)
+        self._comprimento_total += comprimento
+
+    def _remover(self, noticia_id):
+        doc = self._docs.pop(noticia_id, None)
+        if doc is None:
+            return
+        self._comprimento_total -= doc[0]
+        for termo in self._termos_doc.pop(noticia_id, ()):
+            lista = self._postings.get(termo)
+            if lista is not None:
+                lista.pop(noticia_id, None)
+                if not lista:
+                    del self._postings[termo]
+
+    def _indexar_do_banco(self, noticia_ids=None):
+        from .models import Noticia
+
+        noticias = Noticia.objects.all()
+        tags = Noticia.tags.through.objects.all()
+        if noticia_ids is not None:
+            noticias = noticias.filter(id__in=noticia_ids)
+            tags = tags.filter(noticia_id__in=noticia_ids)
+        tags_por_noticia = defaultdict(list)
+        for noticia_id, tag_id in tags.values_list('noticia_id', 'tag_id'):
+            tags_por_noticia[noticia_id].append(tag_id)
+
+        colunas = ('id', 'categoria_id', 'data_publicacao', *PESOS_CAMPOS)
+        for linha in noticias.values(*colunas).iterator(chunk_size=2000):
+            noticia_id = linha['id']
+            self._remover(noticia_id)
+            self._adicionar(noticia_id, linha, linha['categoria_id'],
+                            tags_por_noticia.get(noticia_id, ()), linha['data_publicacao'])
+
+    def carregar(self):
+        """Reconstrói o índice inteiro a partir do banco."""
+        with self._lock:
+            versao = versao_atual()
+            self._limpar()
+            self._indexar_do_banco()
+            self._carregado = True
+            self._versao = versao
+
+    def reindexar(self, noticia_ids):
+        """Reindexa as notícias informadas (as que não existem mais saem do índice)."""
+        with self._lock:
+            for noticia_id in noticia_ids:
+                self._remover(noticia_id)
+            self._indexar_do_banco(noticia_ids)
+
+    def sincronizar(self):
+        """Aplica as alterações registradas no cache desde a última sincronização."""
+        with self._lock:
+            if not self._carregado:
+                self.carregar()
+                return
+            versao, alteradas = alteracoes_desde(self._versao)
+            if alteradas is None:
+                self.carregar()
+            elif alteradas:
+                self.reindexar(alteradas)
+            self._versao = versao
+
+    # --- consulta --------------------------------------------------------
+
+    def buscar(self, consulta, categoria_id=None, tag_ids=None, desde=None,
+               ordenar='relevancia', limite=20, deslocamento=0):
+        """Retorna ``(total, [(noticia_id, score)])`` da página pedida."""
+        self.sincronizar()
+        termos_consulta = list(dict.fromkeys(termos(consulta)))
+        if not termos_consulta:
+            return 0, []
+
+        with self._lock:
+            total_docs = len(self._docs)
+            if not total_docs:
+                return 0, []
+            media = self._comprimento_total / total_docs or 1.0
+            scores = defaultdict(float)
+            for termo in termos_consulta:
+                lista = self._postings.get(termo)
+                if not lista:
+                    continue
+                idf = math.log(1 + (total_docs - len(lista) + 0.5) / (len(lista) + 0.5))
+                for noticia_id, frequencia in lista.items():
+                    comprimento = self._docs[noticia_id][0]
+                    normalizacao = BM25_K1 * (1 - BM25_B + BM25_B * comprimento / media)
+                    scores[noticia_id] += idf * frequencia * (BM25_K1 + 1) / (frequencia + normalizacao)
+
+            tag_ids = set(tag_ids or ())
+            candidatos = []
+            for noticia_id, score in scores.items():
+                _, categoria, tags, data_publicacao = self._docs[noticia_id]
+                if categoria_id is not None and categoria != categoria_id:
+                    continue
+                if tag_ids and not tag_ids & tags:
+                    continue
+                if desde is not None and (data_publicacao is None or data_publicacao < desde):
+                    continue
+                candidatos.append((score, data_publicacao, noticia_id))
+
+        fim = deslocamento + limite
+        if ordenar == 'recentes':
+            pagina = heapq.nlargest(fim, candidatos, key=lambda c: (c[1], c[0]))
+        elif ordenar == 'antigas':
+            pagina = heapq.nsmallest(fim, candidatos, key=lambda c: (c[1], -c[0]))
+        else:
+            pagina = heapq.nlargest(fim, candidatos)
+        return len(candidatos), [(noticia_id, score) for score, _, noticia_id in pagina[deslocamento:fim]]
+
+
+def _chave_alteracao(versao):
+    return f'busca:alteracao:{versao}'
+
+
+def versao_atual():
+    versao = cache.get(CHAVE_VERSAO)
+    if versao is None:
+        cache.add(CHAVE_VERSAO, 0, timeout=None)
+        versao = cache.get(CHAVE_VERSAO, 0)
+    return versao
+
+
+def alteracoes_desde(versao):
+    """Notícias alteradas depois de ``versao``: ``(versao_atual, ids)``.
+
+    ``ids`` é None quando não dá para saber (versão desconhecida, alterações
+    expiradas ou demais) e o chamador deve recarregar tudo.
+    """
+    atual = versao_atual()
+    if versao is None or atual < versao or atual - versao > LIMITE_ALTERACOES:
+        return atual, None
+    if atual == versao:
+        return atual, set()
+    chaves = [_chave_alteracao(v) for v in range(versao + 1, atual + 1)]
+    alteradas = cache.get_many(chaves)
+    if len(alteradas) < len(chaves):
+        return atual, None
+    return atual, set(alteradas.values())
+
+
+def registrar_alteracao(noticia_id):
+    """Anota que a notícia mudou; os índices de todos os processos a reindexam."""
+    try:
+        versao = cache.incr(CHAVE_VERSAO)
+    except ValueError:
+        cache.add(CHAVE_VERSAO, 0, timeout=None)
+        versao = cache.incr(CHAVE_VERSAO)
+    cache.set(_chave_alteracao(versao), noticia_id, timeout=ALTERACOES_TTL)
+
+
+def inicio_do_periodo(periodo):
+    """'hoje', 'semana' ou 'mes' -> datetime inicial (None para qualquer data)."""
+    agora = timezone.localtime()
+    if periodo == 'hoje':
+        return agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    if periodo == 'semana':
+        return agora - timezone.timedelta(days=7)
+    if periodo == 'mes':
+        return agora - timezone.timedelta(days=30)
+    return None
+
+
+indice_busca = IndiceBusca()
@@ -0,0 +1,189 @@
+# jcpemobile/busca_banco.py
+"""Busca textual feita pelo próprio banco, com um backend por fornecedor.
+
+- PostgreSQL: coluna ``busca_vetor`` (``tsvector`` gerado pelo banco a partir
+  de título, subtítulo, resumo e conteúdo, com pesos A-D e a configuração
+  ``portuguese``) e índice GIN. A consulta é um ``to_tsquery`` com as
+  palavras ligadas por ``&`` e cada uma por prefixo (``:*``), como no
+  SQLite; o ranking é ``ts_rank_cd``.
+- SQLite (desenvolvimento): tabela FTS5 ``jcpemobile_noticia_fts`` com
+  conteúdo externo, mantida por triggers, tokenizador sem acentos e ranking
+  ``bm25`` com os mesmos pesos. Cada termo casa por prefixo.
+- Outros bancos: ``icontains`` nos mesmos campos, sem ranking.
+
+A coluna, a tabela e os triggers são criados pela migração 0018 (com o SQL
+congelado nela). O SQLite recria a tabela de notícias em algumas migrações e leva os triggers
+junto, então ``garantir_estrutura`` roda também no ``post_migrate``.
+
+``buscar_noticias`` filtra um queryset e o anota com ``relevancia`` (é o que
+usa o admin); ``buscar`` tem a mesma assinatura de
+``IndiceBusca.buscar`` e atende a API pública quando ``BUSCA_MOTOR = 'banco'``.
+"""
+import re
+
+from django.db import connection as conexao_padrao
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TABELA = 'jcpemobile_noticia'
+TABELA_FTS = 'jcpemobile_noticia_fts'
+# Campos indexados e peso de cada um (mesma ordem dos pesos A-D do Postgres)
+CAMPOS = ('titulo', 'subtitulo', 'resumo', 'conteudo')
+PESOS_BM25 = (3.0, 2.0, 1.5, 1.0)
+# Termos considerados de uma consulta (o resto é ignorado)
+MAXIMO_TERMOS = 16
+
+_PALAVRA = re.compile(r'\w+')
+
+
+class BackendBusca:
+    """Fallback sem índice: ``icontains`` em todos os campos, relevância zero."""
+
+    vendor = None
+
+    def garantir_estrutura(self, connection):
+        pass
+
+    def filtrar(self, queryset, consulta):
+        palavras = _PALAVRA.findall(consulta)[:MAXIMO_TERMOS]
+        if not palavras:
+            return queryset.none()
+        for palavra in palavras:
+            condicao = Q()
+            for campo in CAMPOS:
+                condicao |= Q(**{f'{campo}__icontains': palavra})
+            queryset = queryset.filter(condicao)
+        return queryset.annotate(relevancia=Value(0.0, output_field=FloatField()))
+
+
+class BackendPostgres(BackendBusca):
+    vendor = 'postgresql'
+
+    def filtrar(self, queryset, consulta):
+        # Só palavras (sem a sintaxe do tsquery), todas obrigatórias e por prefixo
+        palavras = _PALAVRA.findall(consulta)[:MAXIMO_TERMOS]
+        if not palavras:
+            return queryset.none()
+        expressao = ' & '.join(f'{palavra}:*' for palavra in palavras)
+        tabela = queryset.model._meta.db_table
+        consulta_ts = "to_tsquery('portuguese'::regconfig, %s)"
+        return queryset.filter(
+            RawSQL(f'"{tabela}"."busca_vetor" @@ {consulta_ts}', (expressao,), output_field=BooleanField())
+        ).annotate(
+            relevancia=RawSQL(f'ts_rank_cd("{tabela}"."busca_vetor", {consulta_ts})', (expressao,),
+                              output_field=FloatField())
+        )
+
+
+class BackendSqlite(BackendBusca):
+    vendor = 'sqlite'
+
+    SQL_TRIGGERS = (
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ai AFTER INSERT ON {TABELA} BEGIN
+            INSERT INTO {TABELA_FTS}(rowid, {', '.join(CAMPOS)})
+            VALUES (new.id, {', '.join(f'new.{c}' for c in CAMPOS)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_ad AFTER DELETE ON {TABELA} BEGIN
+            INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, {', '.join(CAMPOS)})
+            VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in CAMPOS)});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {TABELA_FTS}_au AFTER UPDATE OF {', '.join(CAMPOS)} ON {TABELA} BEGIN
+            INSERT INTO {TABELA_FTS}({TABELA_FTS}, rowid, {', '.join(CAMPOS)})
+            VALUES ('delete', old.id, {', '.join(f'old.{c}' for c in CAMPOS)});
+            INSERT INTO {TABELA_FTS}(rowid, {', '.join(CAMPOS)})
+            VALUES (new.id, {', '.join(f'new.{c}' for c in CAMPOS)});
+        END
+        """,
+    )
+    SQL_RECONSTRUIR = f"INSERT INTO {TABELA_FTS}({TABELA_FTS}) VALUES ('rebuild')"
+
+    def _triggers_existentes(self, cursor):
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            (f'{TABELA_FTS}_a_',),
+        )
+        return cursor.fetchone()[0]
+
+    def garantir_estrutura(self, connection):
+        """Recria triggers perdidos (e reindexa, pois as alterações sem eles não entraram)."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", (TABELA_FTS,))
+            if cursor.fetchone() is None or self._triggers_existentes(cursor) == len(self.SQL_TRIGGERS):
+                return
+            for sql in self.SQL_TRIGGERS:
+                cursor.execute(sql)
+            cursor.execute(self.SQL_RECONSTRUIR)
+
+    def filtrar(self, queryset, consulta):
+        # Cada palavra entre aspas (sem operadores do FTS5) e por prefixo
+        palavras = _PALAVRA.findall(consulta)[:MAXIMO_TERMOS]
+        if not palavras:
+            return queryset.none()
+        expressao = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        tabela = queryset.model._meta.db_table
+        pesos = ', '.join(str(peso) for peso in PESOS_BM25)
+        # Junção com a tabela FTS: o bm25() sai da mesma varredura do MATCH
+        # (uma subconsulta correlacionada refaria o MATCH para cada notícia)
+        return queryset.extra(
+            tables=[TABELA_FTS],
+            where=[f'{TABELA_FTS}.rowid = "{tabela}"."id"', f'{TABELA_FTS} MATCH %s'],
+            params=[expressao],
+            # bm25() é menor para os melhores resultados
+            select={'relevancia': f'-bm25({TABELA_FTS}, {pesos})'},
+        )
+
+
+BACKENDS = {backend.vendor: backend for backend in (BackendPostgres(), BackendSqlite())}
+_FALLBACK = BackendBusca()
+
+
+def backend_para(connection=None):
+    return BACKENDS.get((connection or conexao_padrao).vendor, _FALLBACK)
+
+
+def garantir_estrutura(using='default', **kwargs):
+    """Receiver de ``post_migrate``."""
+    from django.db import connections
+
+    connection = connections[using]
+    backend_para(connection).garantir_estrutura(connection)
+
+
+def buscar_noticias(consulta, queryset=None):
+    """``queryset`` (padrão: todas as notícias) filtrado pela consulta e anotado com ``relevancia``."""
+    from .models import Noticia
+
+    if queryset is None:
+        queryset = Noticia.objects.all()
+    return backend_para().filtrar(queryset, consulta or '')
+
+
+def buscar(consulta, categoria_id=None, tag_ids=None, desde=None,
+           ordenar='relevancia', limite=20, deslocamento=0):
+    """Mesmo contrato de ``IndiceBusca.buscar``: ``(total, [(noticia_id, score)])``."""
+    from .models import Noticia
+
+    noticias = buscar_noticias(consulta)
+    if categoria_id is not None:
+        noticias = noticias.filter(categoria_id=categoria_id)
+    if tag_ids:
+        noticias = noticias.filter(
+            id__in=Noticia.tags.through.objects.filter(tag_id__in=tag_ids).values('noticia_id')
+        )
+    if desde is not None:
+        noticias = noticias.filter(data_publicacao__gte=desde)
+
+    total = noticias.count()
+    if ordenar == 'recentes':
+        noticias = noticias.order_by('-data_publicacao', '-id')
+    elif ordenar == 'antigas':
+        noticias = noticias.order_by('data_publicacao', 'id')
+    else:
+        noticias = noticias.order_by('-relevancia', '-data_publicacao', '-id')
+    pagina = noticias.values_list('id', 'relevancia')[deslocamento:deslocamento + limite]
+    return total, [(noticia_id, relevancia or 0.0) for noticia_id, relevancia in pagina]
@@ -0,0 +1,24 @@
+# jcpemobile/cache_paginas.py
+"""Cache do HTML completo da página de notícia para visitantes anônimos.
+
+A página não tem mais nada do leitor: a visualização é contada pelo beacon
+e o estado (salva, já votou) vem por JSON. Por isso o HTML de cada slug
+pode ser servido do cache até a notícia mudar (ver ``signals.py``); as
+notícias relacionadas exibidas nela se atualizam pelo TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+
+def chave_pagina_noticia(slug):
+    return f'pagina_noticia:{slug}'
+
+
+def guardar_pagina_noticia(slug, conteudo):
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode()
+    cache.set(chave_pagina_noticia(slug), conteudo, getattr(settings, 'PAGINA_NOTICIA_CACHE_TTL', 300))
+
+
+def invalidar_pagina_noticia(*slugs):
+    cache.delete_many([chave_pagina_noticia(slug) for slug in slugs if slug])
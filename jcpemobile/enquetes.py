@@ -0,0 +1,73 @@
+# jcpemobile/enquetes.py
+"""Resultados de enquete a partir dos contadores de ``Opcao``.
+
+Cada ``Opcao`` guarda ``quantidade_votos``, incrementado ou decrementado com
+``F()`` quando um ``Voto`` é criado ou apagado (``signals.py``). Os resultados
+de uma enquete (votos e percentuais) saem de uma única consulta às opções,
+sem contar a tabela de votos. ``reconciliar_contadores`` (comando
+``reconciliar_votos``) confere os contadores com a contagem real e corrige os
+divergentes.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Opcao, Voto
+
+
+def resultados_enquete(enquete_id):
+    """``{'total', 'opcoes': [{'id', 'texto', 'votos', 'percentual'}]}`` em uma consulta."""
+    opcoes = list(
+        Opcao.objects.filter(enquete_id=enquete_id).order_by('id').values('id', 'texto', 'quantidade_votos')
+    )
+    total = sum(opcao['quantidade_votos'] for opcao in opcoes)
+    return {
+        'total': total,
+        'opcoes': [
+            {
+                'id': opcao['id'],
+                'texto': opcao['texto'],
+                'votos': opcao['quantidade_votos'],
+                'percentual': round(opcao['quantidade_votos'] / total * 100, 1) if total else 0,
+            }
+            for opcao in opcoes
+        ],
+    }
+
+
+def ajustar_contador(opcao_id, delta):
+    """Soma ``delta`` ao contador no próprio banco (sem ler o valor antes)."""
+    opcoes = Opcao.objects.filter(pk=opcao_id)
+    if delta < 0:
+        # Contador já divergente não fica negativo; reconciliar_votos acerta
+        opcoes = opcoes.filter(quantidade_votos__gte=-delta)
+    opcoes.update(quantidade_votos=F('quantidade_votos') + delta)
+
+
+def contagem_real():
+    return Coalesce(
+        Subquery(
+            Voto.objects.filter(opcao=OuterRef('pk')).order_by().values('opcao')
+            .annotate(total=Count('id')).values('total')
+        ),
+        0,
+    )
+
+
+def reconciliar_contadores(corrigir=True):
+    """Opções cujo contador difere da contagem real: ``[(opcao_id, contador, real)]``.
+
+    Com ``corrigir``, os divergentes recebem a contagem real num único UPDATE
+    (calculada pelo banco no momento da escrita, sem perder votos concorrentes).
+    """
+    divergentes = [
+        (opcao_id, contador, real)
+        for opcao_id, contador, real in (
+            Opcao.objects.annotate(real=contagem_real()).values_list('id', 'quantidade_votos', 'real').order_by('id')
+        )
+        if contador != real
+    ]
+    if corrigir and divergentes:
+        Opcao.objects.filter(id__in=[opcao_id for opcao_id, _, _ in divergentes]).update(
+            quantidade_votos=contagem_real()
+        )
+    return divergentes
@@ -0,0 +1,70 @@
+# jcpemobile/estatisticas.py
+"""Números do topo do painel administrativo, lidos de um retrato em cache.
+
+Os quatro totais são calculados juntos e guardados com o horário do
+cálculo, então o painel sempre mostra valores do mesmo instante. Quando o
+retrato passa de ``ESTATISTICAS_CACHE_TTL`` segundos, quem pega a trava
+dispara o recálculo numa thread e todos continuam recebendo o retrato
+anterior; só o primeiro acesso (cache vazio) espera pelo cálculo.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHAVE_ESTATISTICAS = 'painel:estatisticas'
+
+
+def calcular_estatisticas():
+    from .models import Autor, Categoria, Noticia, Visualizacao
+
+    return {
+        'total_noticias': Noticia.objects.count(),
+        'total_categorias': Categoria.objects.count(),
+        'total_autores': Autor.objects.count(),
+        'visualizacoes_hoje': Visualizacao.objects.filter(data=timezone.now().date()).count(),
+        'atualizado_em': timezone.now(),
+    }
+
+
+def atualizar_estatisticas():
+    """Recalcula e grava o retrato no cache."""
+    estatisticas = calcular_estatisticas()
+    cache.set(CHAVE_ESTATISTICAS, {
+        'expira': time.time() + getattr(settings, 'ESTATISTICAS_CACHE_TTL', 60),
+        'dados': estatisticas,
+    }, timeout=None)
+    return estatisticas
+
+
+def _atualizar_em_segundo_plano(chave_trava):
+    try:
+        atualizar_estatisticas()
+    except Exception:
+        logger.exception('Erro ao atualizar as estatísticas do painel')
+    finally:
+        cache.delete(chave_trava)
+        # A thread tem conexão própria; não deixá-la aberta.
+        connections.close_all()
+
+
+def obter_estatisticas():
+    """Retrato atual; dispara a atualização em segundo plano se estiver vencido."""
+    entrada = cache.get(CHAVE_ESTATISTICAS)
+    if entrada is None:
+        return atualizar_estatisticas()
+
+    if entrada['expira'] <= time.time():
+        chave_trava = f'{CHAVE_ESTATISTICAS}:trava'
+        if cache.add(chave_trava, 1, timeout=getattr(settings, 'ESTATISTICAS_TRAVA_TTL', 30)):
+            threading.Thread(
+                target=_atualizar_em_segundo_plano, args=(chave_trava,),
+                name='estatisticas-painel', daemon=True,
+            ).start()
+    return entrada['dados']
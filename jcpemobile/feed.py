@@ -0,0 +1,76 @@
+# jcpemobile/feed.py
+"""Feed de notícias paginado por cursor (keyset), usado pelo Neels.
+
+As páginas seguem a ordem ``(data_publicacao, id)`` decrescente. O cursor
+guarda a data e o id da última notícia entregue, e a próxima página começa
+logo depois dela com ``WHERE (data, id) < (cursor)``, apoiado no índice
+``noticia_feed_idx``. Por isso o custo de cada página não depende do tamanho
+do acervo nem de quão fundo o leitor rolou, ao contrário de ``OFFSET``.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .imagens import srcset
+from .models import Noticia
+
+TAMANHO_PAGINA = 6
+LIMITE_MAXIMO = 30
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(noticia):
+    bruto = f'{noticia.data_publicacao.isoformat()}|{noticia.pk}'
+    return base64.urlsafe_b64encode(bruto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna ``(data_publicacao, id)``; levanta ``CursorInvalido`` se o cursor estiver corrompido."""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        data, noticia_id = bruto.rsplit('|', 1)
+        return datetime.fromisoformat(data), int(noticia_id)
+    except (ValueError, UnicodeDecodeError) as erro:
+        raise CursorInvalido(f'Cursor inválido: {cursor!r}') from erro
+
+
+def paginar_por_cursor(noticias, cursor=None, limite=TAMANHO_PAGINA):
+    """Pagina qualquer queryset de notícias na ordem do feed.
+
+    Retorna ``(noticias, proximo_cursor)``; ``proximo_cursor`` é None na última página.
+    """
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    noticias = noticias.order_by('-data_publicacao', '-id')
+    if cursor:
+        data, noticia_id = decodificar_cursor(cursor)
+        noticias = noticias.filter(
+            Q(data_publicacao__lt=data) | Q(data_publicacao=data, id__lt=noticia_id)
+        )
+    # Uma notícia a mais só para saber se existe próxima página
+    noticias = list(noticias[:limite + 1])
+    if len(noticias) > limite:
+        noticias = noticias[:limite]
+        return noticias, codificar_cursor(noticias[-1])
+    return noticias, None
+
+
+def pagina_feed(cursor=None, limite=TAMANHO_PAGINA):
+    return paginar_por_cursor(Noticia.objects.select_related('categoria'), cursor, limite)
+
+
+def serializar_card(noticia):
+    return {
+        'id': noticia.id,
+        'titulo': noticia.titulo,
+        'slug': noticia.slug,
+        'resumo': noticia.resumo,
+        'imagem': noticia.imagem.url if noticia.imagem else None,
+        # Mesmas variantes WebP do card (includes/card_neels.html), para a pré-carga
+        'imagem_srcset': srcset(noticia.imagem_variantes, 'webp') or None,
+        'categoria': noticia.categoria.nome if noticia.categoria else None,
+        'data_publicacao': noticia.data_publicacao.isoformat(),
+    }
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from .imagens import ImagemGrandeDemais, verificar_tamanho
 from .models import Noticia, Categoria, Autor, Tag, Feedback
 import re
 
@@ -164,6 +165,17 @@ class NoticiaForm(forms.ModelForm):
             raise ValidationError('O resumo não pode ter mais de 300 caracteres.')
         return resumo
 
+    def clean_imagem(self):
+        imagem = self.cleaned_data.get('imagem')
+        # forms.ImageField já abriu o upload (só o cabeçalho) e guardou em .image
+        cabecalho = getattr(imagem, 'image', None)
+        if cabecalho is not None:
+            try:
+                verificar_tamanho(cabecalho)
+            except ImagemGrandeDemais:
+                raise ValidationError('A imagem tem resolução grande demais. Envie uma versão menor.')
+        return imagem
+
 
 class CategoriaForm(forms.ModelForm):
     """Formulário para criar e editar categorias"""
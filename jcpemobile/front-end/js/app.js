@@ -216,6 +216,13 @@ function configurarListenersGlobais() {
 // ===================================================
 
 function carregarDadosLocais() {
+    // Salvos que vieram da conta não ficam no navegador depois do logout
+    // (computador compartilhado: não passam para a conta do próximo usuário)
+    if (document.body.dataset.userAuthenticated === 'false' && localStorage.getItem('salvosDaConta')) {
+        localStorage.removeItem('noticiasSalvas');
+        localStorage.removeItem('salvosDaConta');
+    }
+
     // Carregar notícias salvas
     const salvas = localStorage.getItem('noticiasSalvas');
     if (salvas) {
@@ -209,11 +209,22 @@ function configurarSugestoes() {
     }
 }
 
+// Respostas já recebidas nesta página, por prefixo
+const cacheSugestoes = new Map();
+let ultimoTermoSugestoes = '';
+
 function mostrarSugestoes(termo) {
-    const sugestoesDiv = document.getElementById('sugestoesBusca');
+    ultimoTermoSugestoes = termo;
+    obterSugestoes(termo).then(sugestoes => {
+        // Ignorar respostas que chegam depois de o leitor continuar digitando
+        if (termo === ultimoTermoSugestoes) {
+            renderizarSugestoes(sugestoes, termo);
+        }
+    });
+}
 
-    // Simular sugestões (em produção viria do backend)
-    const sugestoes = obterSugestoes(termo);
+function renderizarSugestoes(sugestoes, termo) {
+    const sugestoesDiv = document.getElementById('sugestoesBusca');
 
     if (sugestoes.length === 0) {
         sugestoesDiv.style.display = 'none';
@@ -222,9 +233,9 @@ function mostrarSugestoes(termo) {
 
     // Criar HTML das sugestões
     const html = sugestoes.map(sugestao => `
-        <div class="sugestao-item" data-termo="${sugestao}">
-            <i class="fas fa-search"></i>
-            <span>${destacarTermo(sugestao, termo)}</span>
+        <div class="sugestao-item" data-termo="${escaparHtml(sugestao.texto)}" data-slug="${sugestao.tipo === 'noticia' ? escaparHtml(sugestao.slug) : ''}">
+            <i class="fas ${sugestao.tipo === 'noticia' ? 'fa-newspaper' : 'fa-search'}"></i>
+            <span>${destacarTermo(escaparHtml(sugestao.texto), escaparHtml(termo))}</span>
         </div>
     `).join('');
 
@@ -234,6 +245,11 @@ function mostrarSugestoes(termo) {
     // Adicionar eventos
     sugestoesDiv.querySelectorAll('.sugestao-item').forEach(item => {
         item.addEventListener('click', () => {
+            // Sugestão de notícia leva direto a ela; tags e categorias viram busca
+            if (item.dataset.slug) {
+                window.location.href = '/' + encodeURIComponent(item.dataset.slug) + '/';
+                return;
+            }
             const termoSugestao = item.dataset.termo;
             document.querySelector('.campo-busca').value = termoSugestao;
             executarBusca(termoSugestao);
@@ -243,29 +259,25 @@ function mostrarSugestoes(termo) {
 }
 
 function obterSugestoes(termo) {
-    // Sugestões mockadas - em produção viria do backend
-    const todasSugestoes = [
-        'política pernambuco',
-        'política nacional',
-        'eleições 2024',
-        'economia brasil',
-        'esportes recife',
-        'sport recife',
-        'cultura pernambuco',
-        'educação pública',
-        'mobilidade urbana',
-        'saúde pública',
-        'covid pernambuco',
-        'vacinação recife'
-    ];
-
-    return todasSugestoes
-        .filter(s => s.toLowerCase().includes(termo.toLowerCase()))
-        .slice(0, 5);
+    const chave = termo.toLowerCase();
+    if (cacheSugestoes.has(chave)) {
+        return Promise.resolve(cacheSugestoes.get(chave));
+    }
+
+    return fetch('/api/busca/sugestoes/?q=' + encodeURIComponent(chave), { headers: { 'Accept': 'application/json' } })
+        .then(response => response.ok ? response.json() : Promise.reject(response.status))
+        .then(data => {
+            cacheSugestoes.set(chave, data.sugestoes);
+            return data.sugestoes;
+        })
+        .catch(error => {
+            console.error('Erro ao obter sugestões:', error);
+            return [];
+        });
 }
 
 function destacarTermo(texto, termo) {
-    const regex = new RegExp(`(${termo})`, 'gi');
+    const regex = new RegExp(`(${termo.replace(/[.*+?^${}()|[\]\\]/g, '\\$&')})`, 'gi');
     return texto.replace(regex, '<strong>$1</strong>');
 }
 
@@ -347,12 +359,21 @@ function buscarNoticias(termo, filtros = {}) {
     // Mostrar loading
     mostrarLoadingBusca();
 
-    // Simular busca (em produção seria uma chamada API)
-    setTimeout(() => {
-        const resultados = simularResultadosBusca(termo, filtros);
-        mostrarResultadosBusca(resultados, termo);
-        esconderLoadingBusca();
-    }, 500);
+    const parametros = new URLSearchParams({ q: termo });
+    ['data', 'categoria', 'ordenar'].forEach(nome => {
+        if (filtros[nome]) parametros.set(nome, filtros[nome]);
+    });
+
+    fetch('/api/busca/?' + parametros.toString(), { headers: { 'Accept': 'application/json' } })
+        .then(response => response.ok ? response.json() : Promise.reject(response.status))
+        .then(data => {
+            mostrarResultadosBusca(data.resultados, termo, data.total);
+        })
+        .catch(error => {
+            console.error('Erro na busca:', error);
+            mostrarResultadosBusca([], termo, 0);
+        })
+        .finally(esconderLoadingBusca);
 }
 
 function executarBusca(termo) {
@@ -377,58 +398,20 @@ function executarBusca(termo) {
     }, 500);
 }
 
-function simularResultadosBusca(termo, filtros) {
-    // Simulação de resultados
-    const todasNoticias = [
-        {
-            id: 1,
-            titulo: 'Governo anuncia novas medidas econômicas',
-            categoria: 'economia',
-            data: new Date('2024-01-15'),
-            relevancia: 10
-        },
-        {
-            id: 2,
-            titulo: 'Sport vence clássico e assume liderança',
-            categoria: 'esportes',
-            data: new Date('2024-01-14'),
-            relevancia: 8
-        },
-        {
-            id: 3,
-            titulo: 'Nova linha de metrô é inaugurada no Recife',
-            categoria: 'mobilidade',
-            data: new Date('2024-01-13'),
-            relevancia: 9
-        }
-    ];
-
-    // Filtrar por termo
-    let resultados = todasNoticias.filter(n =>
-        n.titulo.toLowerCase().includes(termo.toLowerCase())
-    );
-
-    // Aplicar filtros
-    if (filtros.categoria) {
-        resultados = resultados.filter(n => n.categoria === filtros.categoria);
-    }
-
-    // Ordenar
-    if (filtros.ordenar === 'recentes') {
-        resultados.sort((a, b) => b.data - a.data);
-    } else if (filtros.ordenar === 'relevancia') {
-        resultados.sort((a, b) => b.relevancia - a.relevancia);
-    }
-
-    return resultados;
-}
-
 // ===================================================
 // EXIBIÇÃO DE RESULTADOS
 // ===================================================
 
-function mostrarResultadosBusca(resultados, termo) {
+function escaparHtml(texto) {
+    const div = document.createElement('div');
+    div.textContent = texto == null ? '' : String(texto);
+    return div.innerHTML;
+}
+
+function mostrarResultadosBusca(resultados, termo, total = resultados.length) {
     const feedNoticias = document.getElementById('feedNoticias');
+    if (!feedNoticias) return;
+    termo = escaparHtml(termo);
 
     if (resultados.length === 0) {
         feedNoticias.innerHTML = `
@@ -447,7 +430,7 @@ function mostrarResultadosBusca(resultados, termo) {
     feedNoticias.innerHTML = `
         <div class="resultados-busca">
             <div class="resultados-header">
-                <h2>${resultados.length} resultados para "${termo}"</h2>
+                <h2>${total} resultados para "${termo}"</h2>
                 <button class="botao-limpar-busca">Limpar busca</button>
             </div>
             <div class="resultados-lista">
@@ -463,11 +446,11 @@ function mostrarResultadosBusca(resultados, termo) {
 function criarCardResultado(noticia) {
     return `
         <article class="cartao-noticia">
-            <div class="cartao-conteudo">
-                <span style="font-size: 0.75rem; font-weight: 500; color: #dc2626; text-transform: uppercase; letter-spacing: 0.05em; display: block; margin-bottom: 8px;">${noticia.categoria}</span>
-                <h3 class="cartao-titulo">${noticia.titulo}</h3>
-                <time class="cartao-tempo">${window.JC.utils.formatarData(noticia.data)}</time>
-            </div>
+            <a href="/${encodeURIComponent(noticia.slug)}/" class="cartao-conteudo">
+                <span style="font-size: 0.75rem; font-weight: 500; color: #dc2626; text-transform: uppercase; letter-spacing: 0.05em; display: block; margin-bottom: 8px;">${escaparHtml(noticia.categoria || '')}</span>
+                <h3 class="cartao-titulo">${escaparHtml(noticia.titulo)}</h3>
+                <time class="cartao-tempo">${window.JC.utils.formatarData(new Date(noticia.data_publicacao))}</time>
+            </a>
         </article>
     `;
 }
@@ -482,6 +465,7 @@ function limparResultadosBusca() {
 
 function mostrarLoadingBusca() {
     const feedNoticias = document.getElementById('feedNoticias');
+    if (!feedNoticias) return;
     feedNoticias.innerHTML = `
         <div class="loading-busca">
             <div class="spinner"></div>
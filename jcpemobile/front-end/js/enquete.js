@@ -0,0 +1,83 @@
+/**
+ * Enquete da página da notícia
+ * Resultados ao vivo por Server-Sent Events (api_enquete_ao_vivo) quando o
+ * site é servido via ASGI (data-url-ao-vivo presente); senão, ou sem
+ * EventSource, api_resultados_enquete é consultado a cada data-intervalo ms.
+ * Em ambos os casos só enquanto a enquete está na tela.
+ */
+(function () {
+    const widget = document.getElementById('enqueteNoticia');
+    if (!widget) return;
+
+    const form = document.getElementById('enqueteForm');
+    const total = document.getElementById('enqueteTotal');
+    const intervalo = parseInt(widget.dataset.intervalo, 10) || 15000;
+    let fonte = null;
+    let timer = null;
+
+    function renderizarResultados(resultados) {
+        resultados.opcoes.forEach(opcao => {
+            const item = widget.querySelector(`.enquete-resultado[data-opcao-id="${opcao.id}"]`);
+            if (!item) return;
+            item.querySelector('.enquete-resultado-percentual').textContent = `${opcao.percentual}%`;
+            item.querySelector('.enquete-barra-preenchida').style.width = `${opcao.percentual}%`;
+        });
+        total.textContent = resultados.total === 1 ? '1 voto' : `${resultados.total} votos`;
+    }
+
+    function buscarResultados() {
+        fetch(widget.dataset.urlResultados)
+            .then(resposta => resposta.json())
+            .then(renderizarResultados)
+            .catch(erro => console.error('Erro ao carregar resultados da enquete:', erro));
+    }
+
+    function conectar() {
+        if (fonte || timer) return;
+        if (widget.dataset.urlAoVivo && window.EventSource) {
+            // O EventSource reconecta sozinho se a conexão cair (retry do servidor)
+            fonte = new EventSource(widget.dataset.urlAoVivo);
+            fonte.addEventListener('resultados', evento => renderizarResultados(JSON.parse(evento.data)));
+            return;
+        }
+        buscarResultados();
+        timer = setInterval(buscarResultados, intervalo);
+    }
+
+    function desconectar() {
+        if (fonte) {
+            fonte.close();
+            fonte = null;
+        }
+        if (timer) {
+            clearInterval(timer);
+            timer = null;
+        }
+    }
+
+    function mostrarEstado(estado) {
+        if (estado && estado.enquete && estado.enquete.ja_votou) {
+            form.style.display = 'none';
+        }
+    }
+
+    // O formulário vem do HTML em cache, sem token: usa o cookie do leitor
+    // (definido por api_estado_noticia)
+    form.addEventListener('submit', () => {
+        form.querySelector('[name=csrfmiddlewaretoken]').value = getCookie('csrftoken') || '';
+    });
+
+    document.addEventListener('jc:estado-noticia', evento => mostrarEstado(evento.detail));
+    if (window.JC && window.JC.state && window.JC.state.estadoNoticia) {
+        mostrarEstado(window.JC.state.estadoNoticia);
+    }
+
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entradas => {
+            entradas.forEach(entrada => (entrada.isIntersecting ? conectar() : desconectar()));
+        }).observe(widget);
+    } else {
+        conectar();
+    }
+    window.addEventListener('pagehide', desconectar);
+})();
@@ -103,6 +103,9 @@ function inicializarNoticias() {
 
     // Configurar auto-refresh
     configurarAutoRefresh();
+
+    // Levar para a conta, uma vez, os salvos feitos antes do login
+    sincronizarSalvosAoEntrar();
 }
 
 // ===================================================
@@ -315,6 +318,11 @@ function salvarNoticia(noticiaId) {
         salvos.push(noticiaId);
         window.JC.utils.salvarDadosLocais('noticiasSalvas', salvos);
     }
+    if (!usuarioLogado()) {
+        // Enviado para a conta no próximo login (sincronizarSalvosAoEntrar)
+        localStorage.setItem('salvosPendentes', 'true');
+    }
+    agendarSincronizacaoSalvos(noticiaId, true);
 }
 
 function removerNoticiaSalva(noticiaId) {
@@ -322,6 +330,117 @@ function removerNoticiaSalva(noticiaId) {
     salvos = salvos.filter(id => id !== noticiaId);
     window.JC.state.noticiasSalvas = salvos;
     window.JC.utils.salvarDadosLocais('noticiasSalvas', salvos);
+    agendarSincronizacaoSalvos(noticiaId, false);
+}
+
+// Alterações feitas em sequência viram uma única requisição ao servidor
+const filaSalvos = { adicionar: new Set(), remover: new Set(), timeout: null };
+
+function usuarioLogado() {
+    return document.body.dataset.userAuthenticated === 'true';
+}
+
+function agendarSincronizacaoSalvos(noticiaId, salvar) {
+    if (!usuarioLogado()) return;
+    const id = String(noticiaId);
+    (salvar ? filaSalvos.remover : filaSalvos.adicionar).delete(id);
+    (salvar ? filaSalvos.adicionar : filaSalvos.remover).add(id);
+
+    clearTimeout(filaSalvos.timeout);
+    filaSalvos.timeout = setTimeout(() => {
+        const adicionar = Array.from(filaSalvos.adicionar);
+        const remover = Array.from(filaSalvos.remover);
+        filaSalvos.adicionar.clear();
+        filaSalvos.remover.clear();
+        sincronizarSalvos(adicionar, remover);
+    }, 800);
+}
+
+// Mesmo limite de LIMITE_SINCRONIZACAO_SALVOS (views.py) por requisição
+const LIMITE_SINCRONIZACAO_SALVOS = 500;
+
+const COOKIE_SALVOS_APOS_LOGIN = 'salvos_apos_login';
+
+function sincronizarSalvosAoEntrar() {
+    if (!usuarioLogado()) return;
+    const aposLogin = document.cookie.match(new RegExp(`(?:^|;\\s*)${COOKIE_SALVOS_APOS_LOGIN}=`));
+    const pendentes = localStorage.getItem('salvosPendentes');
+    let sincronizacao;
+    if (pendentes) {
+        // A lista feita antes do login vai para a conta, uma vez
+        sincronizacao = sincronizarSalvos(window.JC.state.noticiasSalvas, []);
+    } else if (aposLogin || !localStorage.getItem('salvosDaConta')) {
+        // Nada a enviar: a lista da conta substitui a local (um salvo removido
+        // em outro aparelho não volta), lida por GET
+        sincronizacao = carregarSalvosDaConta();
+    } else {
+        return;
+    }
+    sincronizacao.then(sincronizado => {
+        if (sincronizado) {
+            localStorage.removeItem('salvosPendentes');
+            localStorage.setItem('salvosDaConta', 'true');
+            document.cookie = `${COOKIE_SALVOS_APOS_LOGIN}=; Max-Age=0; path=/`;
+        }
+    });
+}
+
+function carregarSalvosDaConta() {
+    return fetch('/api/salvos/sincronizar/?fields=id')
+        .then(response => response.ok ? response.json() : Promise.reject(response.status))
+        .then(data => guardarSalvosDaConta(data.salvos))
+        .catch(error => {
+            console.error('Erro ao carregar salvos:', error);
+            return false;
+        });
+}
+
+function guardarSalvosDaConta(ids) {
+    // O servidor passa a ser a fonte da lista de salvos
+    const salvos = ids.map(String);
+    window.JC.state.noticiasSalvas = salvos;
+    window.JC.utils.salvarDadosLocais('noticiasSalvas', salvos);
+    return true;
+}
+
+function sincronizarSalvos(adicionar, remover) {
+    if (!usuarioLogado()) return Promise.resolve(false);
+
+    // Em partes de até LIMITE_SINCRONIZACAO_SALVOS ids, uma depois da outra;
+    // a resposta da última traz a lista completa
+    const operacoes = adicionar.map(id => ['adicionar', id]).concat(remover.map(id => ['remover', id]));
+    const partes = [];
+    for (let i = 0; i < operacoes.length; i += LIMITE_SINCRONIZACAO_SALVOS) {
+        partes.push(operacoes.slice(i, i + LIMITE_SINCRONIZACAO_SALVOS));
+    }
+    if (!partes.length) partes.push([]);
+
+    return partes.reduce(
+        (anterior, parte) => anterior.then(() => enviarSalvos(
+            parte.filter(([acao]) => acao === 'adicionar').map(([, id]) => id),
+            parte.filter(([acao]) => acao === 'remover').map(([, id]) => id)
+        )),
+        Promise.resolve()
+    )
+    .then(data => guardarSalvosDaConta(data.salvos))
+    .catch(error => {
+        console.error('Erro ao sincronizar salvos:', error);
+        return false;
+    });
+}
+
+function enviarSalvos(adicionar, remover) {
+    const csrf = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+
+    return fetch('/api/salvos/sincronizar/', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'X-CSRFToken': csrf ? decodeURIComponent(csrf[1]) : ''
+        },
+        body: JSON.stringify({ adicionar: adicionar, remover: remover, fields: 'id' })
+    })
+    .then(response => response.ok ? response.json() : Promise.reject(response.status));
 }
 
 function animarSalvar(botao) {
@@ -0,0 +1,270 @@
+# jcpemobile/imagens.py
+"""Processamento das imagens de notícia fora da requisição.
+
+Salvar uma notícia com imagem nova só grava o arquivo enviado e marca
+``imagem_status = 'pendente'``; depois do commit, a notícia entra na fila de
+um pool de threads (``IMAGENS_WORKERS``). O worker corta a imagem em 2:1,
+limita a largura a ``LARGURA_MAXIMA`` e codifica em JPEG. Enquanto isso o
+site serve o arquivo original, e só ao final o campo ``imagem`` passa a
+apontar para o processado.
+
+O worker grava também variantes de ``LARGURAS_VARIANTES`` px em WebP e JPEG ao
+lado do processado (``<hash>-640.webp`` etc.) e guarda a lista em
+``Noticia.imagem_variantes``; a tag ``{% imagem_responsiva %}``
+(templatetags/imagens_responsivas.py) monta ``srcset``/``sizes`` com elas e
+o celular baixa a de 320 ou 640 px em vez da de 1200.
+
+O arquivo processado tem o nome do SHA-256 do original
+(``noticias/processadas/<hash>.jpg``): reenviar a mesma foto, repetir um
+processamento interrompido ou dois workers pegando a mesma notícia não
+codificam de novo. Salvar a notícia sem trocar a imagem não a reprocessa.
+
+Com ``IMAGENS_SINCRONO = True`` (útil em testes) o processamento roda no
+próprio commit. ``manage.py processar_imagens`` retoma as pendentes (a fila
+é em memória e se perde se o processo reiniciar); com ``--variantes``, gera
+as variantes das imagens processadas antes delas existirem.
+"""
+import hashlib
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+PROPORCAO = 2.0
+LARGURA_MAXIMA = 1200
+QUALIDADE_JPEG = 90
+PASTA_PROCESSADAS = 'noticias/processadas'
+LARGURAS_VARIANTES = (320, 640, 960, 1200)
+# formato -> (formato do Pillow, extensão, opções do encoder)
+FORMATOS_VARIANTES = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def hash_arquivo(nome):
+    sha256 = hashlib.sha256()
+    with default_storage.open(nome, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1024 * 1024), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def nome_processado(hash_origem):
+    return f'{PASTA_PROCESSADAS}/{hash_origem}.jpg'
+
+
+def nome_variante(hash_origem, largura, formato):
+    return f'{PASTA_PROCESSADAS}/{hash_origem}-{largura}.{FORMATOS_VARIANTES[formato][1]}'
+
+
+def codificar(img, formato_pillow, **opcoes):
+    saida = BytesIO()
+    img.save(saida, format=formato_pillow, **opcoes)
+    return saida.getvalue()
+
+
+class ImagemGrandeDemais(ValueError):
+    pass
+
+
+def verificar_tamanho(img):
+    """Recusa, só pelo cabeçalho, imagens com mais de ``IMAGENS_MAX_PIXELS`` (bombas de descompressão)."""
+    limite = getattr(settings, 'IMAGENS_MAX_PIXELS', 100_000_000)
+    largura, altura = img.size
+    if largura * altura > limite:
+        raise ImagemGrandeDemais(f'{largura}x{altura} px passa do limite de {limite} pixels')
+
+
+def _recorte(largura, altura):
+    """Caixa ``(x0, y0, x1, y1)`` do recorte 2:1 centralizado."""
+    if largura / altura > PROPORCAO:
+        # Imagem mais larga - cortar largura
+        nova_largura, nova_altura = int(altura * PROPORCAO), altura
+    else:
+        # Imagem mais alta - cortar altura
+        nova_largura, nova_altura = largura, int(largura / PROPORCAO)
+    x_offset = (largura - nova_largura) // 2
+    y_offset = (altura - nova_altura) // 2
+    return (x_offset, y_offset, x_offset + nova_largura, y_offset + nova_altura)
+
+
+def cortar_e_redimensionar(arquivo):
+    """Imagem RGB cortada em 2:1 (centralizada) com no máximo LARGURA_MAXIMA px.
+
+    A memória acompanha o tamanho final, não o do arquivo: o JPEG é
+    decodificado já reduzido (``draft``: 1/2, 1/4 ou 1/8, a maior redução que
+    ainda cobre o alvo), o redimensionamento lê só a caixa do recorte e reduz
+    por fator inteiro antes do LANCZOS (``reducing_gap``), e a conversão de
+    cor (fundo branco sob a transparência) é feita no tamanho final.
+    """
+    img = Image.open(arquivo)
+    verificar_tamanho(img)
+
+    caixa = _recorte(*img.size)
+    largura_final = min(LARGURA_MAXIMA, caixa[2] - caixa[0])
+    if largura_final < caixa[2] - caixa[0]:
+        tamanho_final = (largura_final, int(largura_final / PROPORCAO))
+        escala = largura_final / (caixa[2] - caixa[0])
+        # Sem efeito fora do JPEG
+        img.draft('RGB', (math.ceil(img.width * escala), math.ceil(img.height * escala)))
+        caixa = _recorte(*img.size)
+    else:
+        tamanho_final = (caixa[2] - caixa[0], caixa[3] - caixa[1])
+
+    if img.mode not in ('RGB', 'L', 'CMYK'):
+        # Paleta não redimensiona com LANCZOS e o alfa seria convertido na
+        # imagem inteira: recortar antes
+        img = img.crop(caixa)
+        if img.mode in ('P', 'PA', '1'):
+            img = img.convert('RGBA' if img.mode == 'PA' or 'transparency' in img.info else 'RGB')
+        caixa = (0, 0) + img.size
+    if tamanho_final != (caixa[2] - caixa[0], caixa[3] - caixa[1]):
+        img = img.resize(tamanho_final, Image.Resampling.LANCZOS, box=caixa, reducing_gap=3.0)
+    elif caixa != (0, 0) + img.size:
+        img = img.crop(caixa)
+
+    # Converter para RGB se necessário (para PNG com transparência)
+    if img.mode in ('RGBA', 'LA'):
+        fundo = Image.new('RGB', img.size, (255, 255, 255))
+        fundo.paste(img, mask=img.getchannel('A'))
+        img = fundo
+    elif img.mode != 'RGB':
+        img = img.convert('RGB')
+    return img
+
+
+def gerar_variantes(img, hash_origem, principal):
+    """Grava as variantes que faltam; retorna o manifesto ``{formato: [[largura, nome], ...]}``.
+
+    Nenhuma variante é maior que a imagem processada, que entra com a própria
+    largura; a maior JPEG é o próprio arquivo ``principal``.
+    """
+    larguras = [largura for largura in LARGURAS_VARIANTES if largura < img.width] + [img.width]
+    manifesto = {formato: [] for formato in FORMATOS_VARIANTES}
+    for largura in larguras:
+        reduzida = None
+        for formato, (formato_pillow, _, opcoes) in FORMATOS_VARIANTES.items():
+            if formato == 'jpeg' and largura == img.width:
+                manifesto[formato].append([largura, principal])
+                continue
+            nome = nome_variante(hash_origem, largura, formato)
+            if not default_storage.exists(nome):
+                if reduzida is None:
+                    reduzida = img if largura == img.width else img.resize(
+                        (largura, max(1, round(largura / PROPORCAO))), Image.Resampling.LANCZOS
+                    )
+                nome = default_storage.save(nome, ContentFile(codificar(reduzida, formato_pillow, **opcoes)))
+            manifesto[formato].append([largura, nome])
+    return manifesto
+
+
+def srcset(variantes, formato):
+    """Valor de ``srcset`` para o formato (``''`` se não houver variantes)."""
+    return ', '.join(f'{default_storage.url(nome)} {largura}w' for largura, nome in variantes.get(formato, ()))
+
+
+def _invalidar_caches(noticia):
+    from .cache_paginas import invalidar_pagina_noticia
+    from .pagina_inicial import invalidar_pagina_inicial, invalidar_secoes
+
+    invalidar_pagina_noticia(noticia['slug'])
+    invalidar_pagina_inicial()
+    invalidar_secoes(noticia['secao'])
+
+
+def processar_imagem_noticia(noticia_id):
+    """Processa a imagem pendente da notícia. Retorna o novo status (None se não havia o que fazer)."""
+    from .models import Noticia
+
+    noticia = Noticia.objects.filter(pk=noticia_id).values('imagem', 'slug', 'secao').first()
+    if not noticia or not noticia['imagem']:
+        return None
+    origem = noticia['imagem']
+    # Só um worker leva a notícia; e só se a imagem ainda for a mesma
+    mesma_imagem = Noticia.objects.filter(pk=noticia_id, imagem=origem)
+    if not mesma_imagem.filter(imagem_status__in=(Noticia.IMAGEM_PENDENTE, Noticia.IMAGEM_ERRO)).update(
+        imagem_status=Noticia.IMAGEM_PROCESSANDO
+    ):
+        return None
+
+    try:
+        if origem.startswith(f'{PASTA_PROCESSADAS}/'):
+            # Já processada (antes das variantes existirem): só faltam as variantes
+            destino = origem
+            hash_origem = origem.rsplit('/', 1)[-1].split('.', 1)[0]
+        else:
+            hash_origem = hash_arquivo(origem)
+            destino = nome_processado(hash_origem)
+        if default_storage.exists(destino):
+            with default_storage.open(destino, 'rb') as arquivo:
+                img = Image.open(arquivo)
+                img.load()
+        else:
+            with default_storage.open(origem, 'rb') as arquivo:
+                img = cortar_e_redimensionar(arquivo)
+            destino = default_storage.save(
+                destino, ContentFile(codificar(img, 'JPEG', quality=QUALIDADE_JPEG, optimize=True))
+            )
+        variantes = gerar_variantes(img, hash_origem, destino)
+    except Exception:
+        logger.exception('Erro ao processar a imagem da notícia %s (%s)', noticia_id, origem)
+        mesma_imagem.update(imagem_status=Noticia.IMAGEM_ERRO)
+        return Noticia.IMAGEM_ERRO
+
+    # Se o editor trocou a imagem no meio do caminho, a nova já está na fila
+    if mesma_imagem.update(imagem=destino, imagem_hash=hash_origem, imagem_variantes=variantes,
+                           imagem_status=Noticia.IMAGEM_PRONTA):
+        _invalidar_caches(noticia)
+    return Noticia.IMAGEM_PRONTA
+
+
+class FilaImagens:
+    """Pool de threads criado no primeiro uso."""
+
+    def __init__(self, workers=2):
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def agendar(self, noticia_id):
+        if getattr(settings, 'IMAGENS_SINCRONO', False):
+            processar_imagem_noticia(noticia_id)
+            return
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='imagens')
+        self._executor.submit(self._executar, noticia_id)
+
+    @staticmethod
+    def _executar(noticia_id):
+        try:
+            processar_imagem_noticia(noticia_id)
+        except Exception:
+            logger.exception('Erro no worker de imagens (notícia %s)', noticia_id)
+        finally:
+            # A thread tem conexão própria; não deixá-la aberta entre tarefas.
+            connections.close_all()
+
+    def parar(self, esperar=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=esperar)
+                self._executor = None
+
+
+fila_imagens = FilaImagens(workers=getattr(settings, 'IMAGENS_WORKERS', 2))
+
+
+def agendar_processamento(noticia_id):
+    """Enfileira depois do commit: o worker precisa ver a notícia e o arquivo gravados."""
+    transaction.on_commit(lambda: fila_imagens.agendar(noticia_id))
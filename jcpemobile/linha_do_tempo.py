@@ -0,0 +1,73 @@
+# jcpemobile/linha_do_tempo.py
+"""Linha do tempo: esqueleto por mês agregado no banco e meses sob demanda.
+
+A página recebe só anos, meses e totais (``GROUP BY TruncMonth``), então o
+custo de montá-la cresce com o número de meses, não de notícias. As notícias
+de um mês são lidas quando o leitor o expande, em páginas por cursor
+(``feed.paginar_por_cursor``). Os filtros de categoria e tag valem para as
+duas consultas.
+"""
+from datetime import datetime
+
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Noticia
+
+MESES_PT = {
+    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
+    5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
+    9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+}
+
+
+def filtrar_noticias(queryset, categoria=None, tag=None):
+    """Filtra por slug de categoria e por tag (id ou nome)."""
+    if categoria:
+        queryset = queryset.filter(categoria__slug=categoria)
+    if tag:
+        if str(tag).isdecimal():
+            queryset = queryset.filter(tags__id=int(tag))
+        else:
+            queryset = queryset.filter(tags__nome=tag)
+    return queryset
+
+
+def montar_esqueleto(categoria=None, tag=None):
+    """Anos e meses com notícias: ``[{'ano', 'total', 'meses': [{'numero', 'nome', 'total'}]}]``."""
+    meses = (
+        filtrar_noticias(Noticia.objects.all(), categoria, tag)
+        .annotate(mes=TruncMonth('data_publicacao'))
+        .values('mes')
+        .annotate(total=Count('id'))
+        .order_by('-mes')
+    )
+    anos = []
+    for linha in meses:
+        mes = linha['mes']
+        if not anos or anos[-1]['ano'] != mes.year:
+            anos.append({'ano': mes.year, 'total': 0, 'meses': []})
+        anos[-1]['total'] += linha['total']
+        anos[-1]['meses'].append({
+            'numero': mes.month,
+            'nome': MESES_PT[mes.month],
+            'total': linha['total'],
+        })
+    return anos
+
+
+def intervalo_do_mes(ano, mes):
+    """Início e fim (exclusivo) do mês no fuso atual, o mesmo usado por ``TruncMonth``."""
+    inicio = timezone.make_aware(datetime(ano, mes, 1))
+    fim = timezone.make_aware(datetime(ano + mes // 12, mes % 12 + 1, 1))
+    return inicio, fim
+
+
+def noticias_do_mes(ano, mes, categoria=None, tag=None):
+    """Queryset das notícias de um mês (sem ordenação: quem pagina ordena)."""
+    inicio, fim = intervalo_do_mes(ano, mes)
+    return filtrar_noticias(
+        Noticia.objects.filter(data_publicacao__gte=inicio, data_publicacao__lt=fim),
+        categoria, tag,
+    ).select_related('categoria', 'autor').prefetch_related('tags')
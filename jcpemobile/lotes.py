@@ -0,0 +1,83 @@
+# jcpemobile/lotes.py
+"""Inserção em lote que diz quais linhas entraram.
+
+``bulk_create(ignore_conflicts=True)`` não informa quais linhas o banco
+descartou pela restrição de unicidade, e os buffers de escrita (votos.py,
+visualizacoes.py) precisam saber: contadores e ouvintes só devem receber o
+que de fato foi gravado. Onde há RETURNING (PostgreSQL, SQLite 3.35+), um
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` devolve as chaves gravadas;
+nos outros bancos, as chaves já existentes são filtradas antes por um
+SELECT (um processo concorrente ainda pode gravar a mesma chave entre as
+duas consultas).
+"""
+import ipaddress
+
+from django.db import connection
+
+
+def normalizar_ip(ip):
+    """Forma canônica do IP; None se inválido (a coluna é inet no PostgreSQL
+    e um IP inválido derrubaria o lote inteiro)."""
+    try:
+        return str(ipaddress.ip_address(ip))
+    except ValueError:
+        return None
+
+
+def inserir_ignorando_conflitos(modelo, campos, linhas, unicos, tamanho_bloco=500):
+    """Insere ``linhas`` (tuplas na ordem de ``campos``) e retorna as que entraram.
+
+    ``unicos`` são os campos da restrição de unicidade que pode descartar
+    linhas; as linhas com a mesma chave dentro do lote contam uma vez só.
+    """
+    campos = [modelo._meta.get_field(nome) for nome in campos]
+    posicoes = [[campo.name for campo in campos].index(nome) for nome in unicos]
+
+    def chave(linha):
+        # Na forma em que o banco devolve (IPv6 normalizado, por exemplo)
+        return tuple(campos[posicao].to_python(linha[posicao]) for posicao in posicoes)
+
+    unicas = {}
+    for linha in linhas:
+        unicas.setdefault(chave(linha), linha)
+    if not unicas:
+        return []
+
+    if not connection.features.can_return_rows_from_bulk_insert:
+        existentes = set(
+            modelo.objects.filter(**{
+                f'{campos[posicao].name}__in': {chave_linha[i] for chave_linha in unicas}
+                for i, posicao in enumerate(posicoes)
+            }).values_list(*(campos[posicao].attname for posicao in posicoes))
+        )
+        novas = [linha for chave_linha, linha in unicas.items() if chave_linha not in existentes]
+        modelo.objects.bulk_create(
+            [modelo(**{campo.attname: valor for campo, valor in zip(campos, linha)}) for linha in novas],
+            batch_size=tamanho_bloco,
+            ignore_conflicts=True,
+        )
+        return novas
+
+    qn = connection.ops.quote_name
+    prefixo = 'INSERT INTO {} ({}) VALUES '.format(
+        qn(modelo._meta.db_table), ', '.join(qn(campo.column) for campo in campos)
+    )
+    sufixo = ' ON CONFLICT DO NOTHING RETURNING {}'.format(
+        ', '.join(qn(campos[posicao].column) for posicao in posicoes)
+    )
+    linha_sql = '({})'.format(', '.join(['%s'] * len(campos)))
+    pendentes = list(unicas.values())
+    gravadas = set()
+    with connection.cursor() as cursor:
+        for inicio in range(0, len(pendentes), tamanho_bloco):
+            bloco = pendentes[inicio:inicio + tamanho_bloco]
+            cursor.execute(
+                prefixo + ', '.join([linha_sql] * len(bloco)) + sufixo,
+                [campo.get_db_prep_save(valor, connection) for linha in bloco for campo, valor in zip(campos, linha)],
+            )
+            # O banco devolve os valores no formato dele (data como texto no SQLite)
+            gravadas.update(
+                tuple(campos[posicao].to_python(valor) for posicao, valor in zip(posicoes, retorno))
+                for retorno in cursor.fetchall()
+            )
+    return [linha for chave_linha, linha in unicas.items() if chave_linha in gravadas]
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from jcpemobile.relacionadas import atualizar_todas
+
+
+class Command(BaseCommand):
+    help = "Recalcula em lote as notícias relacionadas (NoticiaRelacionada) de todo o acervo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--total', type=int, default=6, help='Relacionadas guardadas por notícia.')
+
+    def handle(self, *args, **options):
+        total = atualizar_todas(k=options['total'])
+        self.stdout.write(self.style.SUCCESS(f'Relacionadas recalculadas para {total} notícias.'))
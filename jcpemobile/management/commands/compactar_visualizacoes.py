@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from jcpemobile.cardinalidade import podar_sketches
+from jcpemobile.models import Noticia, Visualizacao
+from jcpemobile.ranking import consolidar_dia, dias_pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida os dias fechados em NoticiaRankingDaily e remove as visualizações "
+        "brutas mais antigas que a retenção, em lotes. Os totais removidos são somados "
+        "em Noticia.visualizacoes_arquivadas. Pode ser interrompido e executado de novo. "
+        "Também apaga os sketches de visitantes únicos mais antigos que a retenção deles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retencao-dias',
+            type=int,
+            default=getattr(settings, 'VISUALIZACOES_RETENCAO_DIAS', 90),
+            help='Quantos dias de visualizações brutas manter (padrão: VISUALIZACOES_RETENCAO_DIAS).',
+        )
+        parser.add_argument(
+            '--retencao-sketches-dias',
+            type=int,
+            default=getattr(settings, 'SKETCHES_RETENCAO_DIAS', 400),
+            help='Quantos dias de sketches de visitantes únicos manter (padrão: SKETCHES_RETENCAO_DIAS).',
+        )
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Quantidade de linhas removidas por transação.',
+        )
+
+    def handle(self, *args, **options):
+        retencao = options['retencao_dias']
+        tamanho_lote = options['lote']
+        if retencao < 1 or options['retencao_sketches_dias'] < 1:
+            raise CommandError('A retenção deve ser de pelo menos 1 dia.')
+        if tamanho_lote < 1:
+            raise CommandError('O lote deve ter pelo menos 1 linha.')
+
+        # Nenhum dia é apagado antes de estar consolidado no ranking diário
+        for dia in dias_pendentes():
+            consolidar_dia(dia)
+
+        limite = timezone.now().date() - timezone.timedelta(days=retencao)
+        total = 0
+        while True:
+            removidas = self._arquivar_lote(limite, tamanho_lote)
+            if not removidas:
+                break
+            total += removidas
+            self.stdout.write(f'{total} visualizações arquivadas...')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} visualizações anteriores a {limite} removidas.'
+        ))
+
+        limite_sketches = timezone.now().date() - timezone.timedelta(days=options['retencao_sketches_dias'])
+        removidos = podar_sketches(limite_sketches)
+        self.stdout.write(self.style.SUCCESS(
+            f'{removidos} sketches anteriores a {limite_sketches} removidos.'
+        ))
+
+    @transaction.atomic
+    def _arquivar_lote(self, limite, tamanho_lote):
+        """Remove um lote e soma as contagens na mesma transação (retomável)."""
+        ids = list(
+            Visualizacao.objects.filter(data__lt=limite)
+            .order_by('id')
+            .values_list('id', flat=True)[:tamanho_lote]
+        )
+        if not ids:
+            return 0
+
+        contagens = (
+            Visualizacao.objects.filter(id__in=ids)
+            .values('noticia')
+            .annotate(total=Count('id'))
+            .values_list('noticia', 'total')
+        )
+        # Agrupa notícias com a mesma contagem para fazer um UPDATE por valor
+        noticias_por_total = defaultdict(list)
+        for noticia_id, quantidade in contagens:
+            noticias_por_total[quantidade].append(noticia_id)
+
+        Visualizacao.objects.filter(id__in=ids).delete()
+        for quantidade, noticia_ids in noticias_por_total.items():
+            Noticia.objects.filter(id__in=noticia_ids).update(
+                visualizacoes_arquivadas=F('visualizacoes_arquivadas') + quantidade
+            )
+        return len(ids)
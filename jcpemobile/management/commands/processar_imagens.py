@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from jcpemobile.imagens import processar_imagem_noticia
+from jcpemobile.models import Noticia
+
+
+class Command(BaseCommand):
+    help = "Processa as imagens de notícia pendentes ou com erro (a fila dos workers se perde ao reiniciar o processo)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incluir-processando', action='store_true',
+            help="Retoma também as marcadas como 'processando' (worker interrompido).",
+        )
+        parser.add_argument(
+            '--variantes', action='store_true',
+            help='Gera as variantes responsivas das imagens prontas que ainda não as têm.',
+        )
+
+    def handle(self, *args, **options):
+        status = [Noticia.IMAGEM_PENDENTE, Noticia.IMAGEM_ERRO]
+        if options['incluir_processando']:
+            status.append(Noticia.IMAGEM_PROCESSANDO)
+        noticias = Noticia.objects.filter(imagem_status__in=status)
+        if options['variantes']:
+            Noticia.objects.filter(imagem_status=Noticia.IMAGEM_PRONTA, imagem_variantes={}).update(
+                imagem_status=Noticia.IMAGEM_PENDENTE
+            )
+        if options['incluir_processando']:
+            noticias.filter(imagem_status=Noticia.IMAGEM_PROCESSANDO).update(imagem_status=Noticia.IMAGEM_PENDENTE)
+        resultado = {}
+        for noticia_id in noticias.values_list('id', flat=True):
+            status_final = processar_imagem_noticia(noticia_id)
+            resultado[status_final] = resultado.get(status_final, 0) + 1
+        prontas = resultado.get(Noticia.IMAGEM_PRONTA, 0)
+        erros = resultado.get(Noticia.IMAGEM_ERRO, 0)
+        self.stdout.write(self.style.SUCCESS(f'{prontas} imagens processadas, {erros} com erro.'))
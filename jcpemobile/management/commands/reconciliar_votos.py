@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from jcpemobile.enquetes import reconciliar_contadores
+
+
+class Command(BaseCommand):
+    help = "Confere o contador de votos de cada opção de enquete com a contagem real e corrige os divergentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Só lista as divergências, sem corrigir.')
+
+    def handle(self, *args, **options):
+        divergentes = reconciliar_contadores(corrigir=not options['dry_run'])
+        for opcao_id, contador, real in divergentes:
+            self.stdout.write(f'Opção {opcao_id}: contador {contador}, votos {real}')
+        acao = 'encontradas' if options['dry_run'] else 'corrigidas'
+        self.stdout.write(self.style.SUCCESS(f'{len(divergentes)} divergências {acao}.'))
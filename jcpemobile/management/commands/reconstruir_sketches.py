@@ -0,0 +1,36 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jcpemobile.cardinalidade import reconstruir_sketches
+
+
+class Command(BaseCommand):
+    help = (
+        "Monta os sketches HyperLogLog diários (SketchVisitantesDiario) a partir das "
+        "visualizações brutas, para os dias anteriores aos sketches. Pode ser executado "
+        "de novo: IPs já contados não alteram a estimativa. Dias já compactados "
+        "(compactar_visualizacoes) não têm mais linhas brutas e ficam de fora."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primeiro dia (AAAA-MM-DD). Padrão: o mais antigo.')
+        parser.add_argument('--ate', help='Último dia (AAAA-MM-DD), inclusive. Padrão: hoje.')
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=5000,
+            help='Visualizações somadas aos sketches por transação.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            desde = datetime.date.fromisoformat(options['desde']) if options['desde'] else None
+            ate = datetime.date.fromisoformat(options['ate']) if options['ate'] else None
+        except ValueError as e:
+            raise CommandError(f'Data inválida: {e}')
+        if options['lote'] < 1:
+            raise CommandError('O lote deve ter pelo menos 1 linha.')
+
+        total = reconstruir_sketches(desde, ate, options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'{total} visualizações somadas aos sketches diários.'))
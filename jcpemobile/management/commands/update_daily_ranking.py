@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from jcpemobile.ranking import atualizar_daily_rank, consolidar_dia, dias_pendentes, ranking_deslizante
+
+
+class Command(BaseCommand):
+    help = (
+        "Consolida as visualizações de cada dia fechado em NoticiaRankingDaily "
+        "e atualiza Noticia.daily_rank. Dias já consolidados são ignorados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dia',
+            action='append',
+            default=[],
+            help='Recalcula um dia específico (AAAA-MM-DD), mesmo se já consolidado. Pode repetir.',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            dias = [datetime.date.fromisoformat(d) for d in options['dia']]
+        except ValueError as e:
+            raise CommandError(f'Data inválida: {e}')
+
+        if not dias:
+            dias = dias_pendentes()
+
+        for dia in dias:
+            total = consolidar_dia(dia)
+            self.stdout.write(f'{dia}: {total} notícias no ranking')
+
+        ultimo_dia = atualizar_daily_rank()
+        ranking_deslizante.invalidar()
+        if ultimo_dia:
+            self.stdout.write(self.style.SUCCESS(f'daily_rank atualizado para {ultimo_dia}'))
+        else:
+            self.stdout.write('Nenhum dia consolidado ainda.')
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0012_noticia_subtitulo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='daily_rank',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='daily_rank_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='NoticiaRankingDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('rank', models.PositiveIntegerField()),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings_diarios', to='jcpemobile.noticia')),
+            ],
+            options={
+                'ordering': ['-date', 'rank'],
+                'indexes': [models.Index(fields=['date', 'rank'], name='jcpemobile__date_6e2346_idx')],
+                'unique_together': {('noticia', 'date')},
+            },
+        ),
+    ]
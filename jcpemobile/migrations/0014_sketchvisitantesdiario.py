@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:41
+
+import django.db.models.deletion
+import jcpemobile.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0013_noticia_daily_rank_noticia_daily_rank_date_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SketchVisitantesDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('registros', models.BinaryField(default=jcpemobile.models._sketch_vazio)),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sketches_diarios', to='jcpemobile.noticia')),
+            ],
+            options={
+                'unique_together': {('noticia', 'data')},
+            },
+        ),
+    ]
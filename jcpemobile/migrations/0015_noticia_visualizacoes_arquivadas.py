@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0014_sketchvisitantesdiario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='visualizacoes_arquivadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
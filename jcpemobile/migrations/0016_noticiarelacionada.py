@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0015_noticia_visualizacoes_arquivadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoticiaRelacionada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionadas_calculadas', to='jcpemobile.noticia')),
+                ('relacionada', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='relacionada_em', to='jcpemobile.noticia')),
+            ],
+            options={
+                'ordering': ['noticia', 'posicao'],
+                'unique_together': {('noticia', 'relacionada')},
+            },
+        ),
+    ]
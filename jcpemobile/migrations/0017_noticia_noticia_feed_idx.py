@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 15:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0016_noticiarelacionada'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['-data_publicacao', '-id'], name='noticia_feed_idx'),
+        ),
+    ]
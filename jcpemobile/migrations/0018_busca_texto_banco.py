@@ -0,0 +1,81 @@
+# Estrutura da busca textual no banco (jcpemobile/busca_banco.py):
+# coluna tsvector + índice GIN no PostgreSQL, tabela FTS5 + triggers no SQLite.
+#
+# O SQL fica aqui, congelado: busca_banco.py pode mudar sem reescrever o que
+# esta migração já aplicou.
+
+from django.db import migrations
+
+SQL_POSTGRES = (
+    """
+    ALTER TABLE jcpemobile_noticia ADD COLUMN IF NOT EXISTS busca_vetor tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(subtitulo, '')), 'B') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(resumo, '')), 'C') ||
+        setweight(to_tsvector('portuguese'::regconfig, coalesce(conteudo, '')), 'D')
+    ) STORED
+    """,
+    'CREATE INDEX IF NOT EXISTS noticia_busca_vetor_idx ON jcpemobile_noticia USING gin (busca_vetor)',
+)
+SQL_POSTGRES_REVERSO = (
+    'DROP INDEX IF EXISTS noticia_busca_vetor_idx',
+    'ALTER TABLE jcpemobile_noticia DROP COLUMN IF EXISTS busca_vetor',
+)
+
+SQL_SQLITE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS jcpemobile_noticia_fts USING fts5("
+    "titulo, subtitulo, resumo, conteudo, content='jcpemobile_noticia', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    """
+    CREATE TRIGGER IF NOT EXISTS jcpemobile_noticia_fts_ai AFTER INSERT ON jcpemobile_noticia BEGIN
+        INSERT INTO jcpemobile_noticia_fts(rowid, titulo, subtitulo, resumo, conteudo)
+        VALUES (new.id, new.titulo, new.subtitulo, new.resumo, new.conteudo);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jcpemobile_noticia_fts_ad AFTER DELETE ON jcpemobile_noticia BEGIN
+        INSERT INTO jcpemobile_noticia_fts(jcpemobile_noticia_fts, rowid, titulo, subtitulo, resumo, conteudo)
+        VALUES ('delete', old.id, old.titulo, old.subtitulo, old.resumo, old.conteudo);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS jcpemobile_noticia_fts_au
+    AFTER UPDATE OF titulo, subtitulo, resumo, conteudo ON jcpemobile_noticia BEGIN
+        INSERT INTO jcpemobile_noticia_fts(jcpemobile_noticia_fts, rowid, titulo, subtitulo, resumo, conteudo)
+        VALUES ('delete', old.id, old.titulo, old.subtitulo, old.resumo, old.conteudo);
+        INSERT INTO jcpemobile_noticia_fts(rowid, titulo, subtitulo, resumo, conteudo)
+        VALUES (new.id, new.titulo, new.subtitulo, new.resumo, new.conteudo);
+    END
+    """,
+    "INSERT INTO jcpemobile_noticia_fts(jcpemobile_noticia_fts) VALUES ('rebuild')",
+)
+SQL_SQLITE_REVERSO = (
+    'DROP TRIGGER IF EXISTS jcpemobile_noticia_fts_ai',
+    'DROP TRIGGER IF EXISTS jcpemobile_noticia_fts_ad',
+    'DROP TRIGGER IF EXISTS jcpemobile_noticia_fts_au',
+    'DROP TABLE IF EXISTS jcpemobile_noticia_fts',
+)
+
+
+def _executar(schema_editor, por_banco):
+    for sql in por_banco.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(sql)
+
+
+def instalar(apps, schema_editor):
+    _executar(schema_editor, {'postgresql': SQL_POSTGRES, 'sqlite': SQL_SQLITE})
+
+
+def desinstalar(apps, schema_editor):
+    _executar(schema_editor, {'postgresql': SQL_POSTGRES_REVERSO, 'sqlite': SQL_SQLITE_REVERSO})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0017_noticia_noticia_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar, desinstalar),
+    ]
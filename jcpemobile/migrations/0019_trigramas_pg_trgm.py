@@ -0,0 +1,41 @@
+# Extensão pg_trgm e índices GIN de trigramas (jcpemobile/trigramas.py), só no
+# PostgreSQL e só se o usuário do banco puder criar a extensão.
+#
+# SQL congelado aqui; os índices sobre lower() são trocados pela 0025.
+
+from django.db import DatabaseError, migrations, transaction
+
+COLUNAS = (('jcpemobile_tag', 'nome'), ('jcpemobile_categoria', 'nome'), ('jcpemobile_noticia', 'titulo'))
+
+
+def instalar_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for tabela, coluna in COLUNAS:
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {tabela}_{coluna}_trgm_idx ON {tabela} USING gin (lower({coluna}) gin_trgm_ops)'
+                )
+    except DatabaseError:
+        # Sem permissão para criar extensões: o índice em memória atende
+        pass
+
+
+def remover_pg_trgm(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for tabela, coluna in COLUNAS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {tabela}_{coluna}_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0018_busca_texto_banco'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar_pg_trgm, remover_pg_trgm),
+    ]
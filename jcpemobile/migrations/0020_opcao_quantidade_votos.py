@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:08
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Opcao = apps.get_model('jcpemobile', 'Opcao')
+    Voto = apps.get_model('jcpemobile', 'Voto')
+    votos = Voto.objects.filter(opcao=OuterRef('pk')).order_by().values('opcao').annotate(total=Count('id')).values('total')
+    Opcao.objects.update(quantidade_votos=Coalesce(Subquery(votos), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0019_trigramas_pg_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='opcao',
+            name='quantidade_votos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
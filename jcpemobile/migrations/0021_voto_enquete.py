@@ -0,0 +1,40 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def preencher_enquete_e_deduplicar(apps, schema_editor):
+    Voto = apps.get_model('jcpemobile', 'Voto')
+    Opcao = apps.get_model('jcpemobile', 'Opcao')
+    Voto.objects.update(
+        enquete_id=Subquery(Opcao.objects.filter(pk=OuterRef('opcao_id')).values('enquete_id')[:1])
+    )
+    # Votos repetidos do mesmo IP na mesma enquete: fica o primeiro
+    repetidos = (
+        Voto.objects.values('enquete_id', 'ip_usuario')
+        .annotate(primeiro=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for grupo in repetidos:
+        Voto.objects.filter(enquete_id=grupo['enquete_id'], ip_usuario=grupo['ip_usuario']).exclude(
+            id=grupo['primeiro']
+        ).delete()
+    votos = Voto.objects.filter(opcao=OuterRef('pk')).order_by().values('opcao').annotate(total=Count('id')).values('total')
+    Opcao.objects.update(quantidade_votos=Coalesce(Subquery(votos), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0020_opcao_quantidade_votos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voto',
+            name='enquete',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='votos', to='jcpemobile.enquete'),
+        ),
+        migrations.RunPython(preencher_enquete_e_deduplicar, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Separada da 0021: no PostgreSQL o ALTER TABLE não pode rodar na mesma
+# transação das atualizações de chave estrangeira (eventos de trigger pendentes).
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0021_voto_enquete'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='voto',
+            name='enquete',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='votos', to='jcpemobile.enquete'),
+        ),
+        migrations.AddConstraint(
+            model_name='voto',
+            constraint=models.UniqueConstraint(fields=('enquete', 'ip_usuario'), name='voto_unico_por_enquete'),
+        ),
+    ]
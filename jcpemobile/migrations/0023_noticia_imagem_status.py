@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+def marcar_existentes(apps, schema_editor):
+    # Imagens já gravadas passaram pelo processamento antigo, no save
+    Noticia = apps.get_model('jcpemobile', 'Noticia')
+    Noticia.objects.exclude(imagem__isnull=True).exclude(imagem='').update(imagem_status='pronta')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0022_voto_unico_por_enquete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='imagem_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='imagem_status',
+            field=models.CharField(blank=True, choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('pronta', 'Pronta'), ('erro', 'Erro')], default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
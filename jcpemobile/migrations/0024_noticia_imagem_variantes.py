@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0023_noticia_imagem_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='imagem_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Índices de trigramas sem acentos (unaccent) para os operadores % e <% do
+# pg_trgm; substitui os índices sobre lower() criados pela 0019.
+#
+# SQL congelado aqui: trigramas.py só usa a função jcpemobile_sem_acento.
+
+from django.db import DatabaseError, migrations, transaction
+
+COLUNAS = (('jcpemobile_tag', 'nome'), ('jcpemobile_categoria', 'nome'), ('jcpemobile_noticia', 'titulo'))
+
+
+def instalar_sem_acento(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+            # unaccent não é IMMUTABLE; a função precisa ser para entrar no índice
+            schema_editor.execute(
+                "CREATE OR REPLACE FUNCTION jcpemobile_sem_acento(text) RETURNS text AS "
+                "$$ SELECT public.unaccent('public.unaccent'::regdictionary, lower($1)) $$ "
+                "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT"
+            )
+            for tabela, coluna in COLUNAS:
+                schema_editor.execute(f'DROP INDEX IF EXISTS {tabela}_{coluna}_trgm_idx')
+                schema_editor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {tabela}_{coluna}_trgm_sem_acento_idx '
+                    f'ON {tabela} USING gin (jcpemobile_sem_acento({coluna}) gin_trgm_ops)'
+                )
+    except DatabaseError:
+        # Sem permissão para criar extensões: o índice em memória atende
+        pass
+
+
+def remover_sem_acento(apps, schema_editor):
+    """Volta aos índices da 0019 (se o pg_trgm estiver instalado)."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for tabela, coluna in COLUNAS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {tabela}_{coluna}_trgm_sem_acento_idx')
+    schema_editor.execute('DROP FUNCTION IF EXISTS jcpemobile_sem_acento(text)')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    for tabela, coluna in COLUNAS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {tabela}_{coluna}_trgm_idx ON {tabela} USING gin (lower({coluna}) gin_trgm_ops)'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jcpemobile', '0024_noticia_imagem_variantes'),
+    ]
+
+    operations = [
+        migrations.RunPython(instalar_sem_acento, remover_sem_acento),
+    ]
@@ -5,10 +5,25 @@ from django.utils import timezone
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from PIL import Image
-from io import BytesIO
-from django.core.files.base import ContentFile
-import os
+from .cardinalidade import HyperLogLog, mesclar_sketches
+
+
+def campos_para_salvar(instancia, protegidos, kwargs):
+    """``kwargs`` do ``save()`` sem os campos ``protegidos`` no UPDATE.
+
+    Contadores e campos gravados por ``update()`` em outro lugar (``F()``,
+    comandos, worker) não entram num save completo: a instância carregada
+    antes escreveria por cima o valor antigo. Só são gravados no INSERT ou
+    quando ``update_fields`` os nomeia.
+    """
+    if instancia._state.adding or kwargs.get('force_insert') or kwargs.get('update_fields') is not None:
+        return kwargs
+    adiados = instancia.get_deferred_fields()
+    campos = [
+        campo.name for campo in instancia._meta.concrete_fields
+        if not campo.primary_key and campo.name not in protegidos and campo.attname not in adiados
+    ]
+    return dict(kwargs, update_fields=campos)
 
 class Categoria(models.Model):
     nome = models.CharField(max_length=100, unique=True)
@@ -52,104 +67,140 @@ class Noticia(models.Model):
         ('ultimas_noticias', 'Últimas Notícias'),
         ('receita_da_boa', 'Receita da Boa'),
     ]
-    
+
+    IMAGEM_PENDENTE = 'pendente'
+    IMAGEM_PROCESSANDO = 'processando'
+    IMAGEM_PRONTA = 'pronta'
+    IMAGEM_ERRO = 'erro'
+    IMAGEM_STATUS_CHOICES = [
+        (IMAGEM_PENDENTE, 'Pendente'),
+        (IMAGEM_PROCESSANDO, 'Processando'),
+        (IMAGEM_PRONTA, 'Pronta'),
+        (IMAGEM_ERRO, 'Erro'),
+    ]
+
     titulo = models.CharField(max_length=200)
     subtitulo = models.CharField(max_length=300, blank=True, null=True)
     slug = models.SlugField(unique=True, blank=True)
     resumo = models.TextField(max_length=300, blank=True, null=True)
     conteudo = models.TextField()
     imagem = models.ImageField(upload_to="noticias/", blank=True, null=True)
+    # Processamento da imagem (imagens.py): o original é servido até ficar 'pronta'
+    imagem_status = models.CharField(max_length=12, choices=IMAGEM_STATUS_CHOICES, blank=True, default='', editable=False)
+    # SHA-256 do arquivo enviado, que dá nome ao processado
+    imagem_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Variantes responsivas da processada: {formato: [[largura, arquivo], ...]}
+    imagem_variantes = models.JSONField(default=dict, blank=True, editable=False)
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, related_name="noticias")
     autor = models.ForeignKey(Autor, on_delete=models.SET_NULL, null=True, related_name="noticias")
     tags = models.ManyToManyField(Tag, blank=True, related_name="noticias")
     secao = models.CharField(max_length=50, choices=SECAO_CHOICES, default='noticia_do_dia', verbose_name='Seção')
     data_publicacao = models.DateTimeField(auto_now_add=True)
+    # Posição no ranking do último dia fechado (preenchido por update_daily_ranking)
+    daily_rank = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    daily_rank_date = models.DateField(null=True, blank=True)
+    # Visualizações brutas já removidas pela compactação (compactar_visualizacoes)
+    visualizacoes_arquivadas = models.PositiveIntegerField(default=0, editable=False)
+    # Só gravados pelo ranking e pela compactação (campos_para_salvar)
+    CAMPOS_CONTADORES = ('daily_rank', 'daily_rank_date', 'visualizacoes_arquivadas')
+    # Gravados pelo worker de imagens (imagens.py)
+    CAMPOS_IMAGEM = ('imagem_status', 'imagem_hash', 'imagem_variantes')
+
+    class Meta:
+        indexes = [
+            # Paginação por cursor do feed (feed.py)
+            models.Index(fields=['-data_publicacao', '-id'], name='noticia_feed_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Imagem gravada no banco, para saber no save() se o editor trocou
+        if 'imagem' in instancia.__dict__:
+            instancia._imagem_carregada = instancia.__dict__['imagem'] or None
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None or 'imagem' in fields:
+            self._imagem_carregada = self.imagem.name or None
+
+    def _imagem_nova(self):
+        if not self.imagem:
+            return False
+        if not self.imagem._committed or self._state.adding:
+            return True
+        # Sem o valor carregado (campo adiado), só um upload conta como troca
+        return self.imagem.name != getattr(self, '_imagem_carregada', self.imagem.name)
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.titulo)
-        
-        # Processar imagem para proporção 5:3 se foi feito upload
-        if self.imagem:
-            self._processar_imagem()
-        
-        super().save(*args, **kwargs)
 
-    def _processar_imagem(self):
-        """Redimensiona e corta a imagem para proporção 2:1"""
-        try:
-            # Abrir a imagem
-            img = Image.open(self.imagem)
-            
-            # Converter para RGB se necessário (para PNG com transparência)
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            
-            # Proporção desejada: 2:1 (largura / altura = 2.0)
-            proporcao_alvo = 2.0
-            largura_original, altura_original = img.size
-            proporcao_original = largura_original / altura_original
-            
-            # Calcular dimensões para corte centralizado
-            if proporcao_original > proporcao_alvo:
-                # Imagem mais larga - cortar largura
-                nova_largura = int(altura_original * proporcao_alvo)
-                nova_altura = altura_original
-                x_offset = (largura_original - nova_largura) // 2
-                y_offset = 0
-            else:
-                # Imagem mais alta - cortar altura
-                nova_largura = largura_original
-                nova_altura = int(largura_original / proporcao_alvo)
-                x_offset = 0
-                y_offset = (altura_original - nova_altura) // 2
-            
-            # Cortar imagem
-            img_cortada = img.crop((
-                x_offset,
-                y_offset,
-                x_offset + nova_largura,
-                y_offset + nova_altura
-            ))
-            
-            # Redimensionar para tamanho otimizado (máximo 1200px de largura)
-            largura_maxima = 1200
-            if img_cortada.width > largura_maxima:
-                altura_proporcional = int(largura_maxima / proporcao_alvo)
-                img_cortada = img_cortada.resize((largura_maxima, altura_proporcional), Image.Resampling.LANCZOS)
-            
-            # Salvar imagem processada
-            output = BytesIO()
-            img_cortada.save(output, format='JPEG', quality=90, optimize=True)
-            output.seek(0)
-            
-            # Atualizar campo de imagem
-            nome_arquivo = os.path.splitext(os.path.basename(self.imagem.name))[0]
-            self.imagem.save(
-                f"{nome_arquivo}_processada.jpg",
-                ContentFile(output.read()),
-                save=False
-            )
-        except Exception as e:
-            # Se houver erro no processamento, manter imagem original
-            print(f"Erro ao processar imagem: {e}")
-            pass
-
-    def visualizacoes_do_dia(self):
-        # Conta visualizações únicas (por IP) do dia atual
+        # Imagem nova: grava o original e processa em segundo plano (imagens.py)
+        update_fields = kwargs.get('update_fields')
+        processar = (update_fields is None or 'imagem' in update_fields) and self._imagem_nova()
+        if processar:
+            # Até o worker terminar, os templates servem o original sem srcset
+            self.imagem_status = self.IMAGEM_PENDENTE
+            self.imagem_variantes = {}
+        elif not self.imagem:
+            self.imagem_status = ''
+            self.imagem_hash = ''
+            self.imagem_variantes = {}
+        protegidos = self.CAMPOS_CONTADORES
+        if processar or not self.imagem:
+            if update_fields is not None and 'imagem' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | set(self.CAMPOS_IMAGEM)
+        else:
+            # Imagem mantida: quem grava estes campos é o worker, e uma
+            # instância carregada antes dele terminar apagaria o resultado
+            protegidos += ('imagem',) + self.CAMPOS_IMAGEM
+
+        super().save(*args, **campos_para_salvar(self, protegidos, kwargs))
+        self._imagem_carregada = self.imagem.name if self.imagem else None
+        if processar:
+            from .imagens import agendar_processamento
+
+            agendar_processamento(self.pk)
+
+    def visualizacoes_do_dia(self, exato=False):
+        # Visualizações únicas (por IP) do dia atual; estimadas pelo sketch do dia
+        return self.visitantes_unicos(dias=1, exato=exato)
+
+    def visitantes_unicos(self, dias=1, exato=False):
+        """Visitantes únicos (por IP) nos últimos ``dias`` dias, incluindo hoje.
+
+        Por padrão mescla os sketches HyperLogLog diários (erro ~1,6%) sem ler
+        as visualizações brutas; ``exato=True`` conta as linhas (auditoria).
+        """
         hoje = timezone.now().date()
-        return self.visualizacoes.filter(data=hoje).values('ip_address').distinct().count()
+        inicio = hoje - timezone.timedelta(days=dias - 1)
+        if exato:
+            return self.visualizacoes.filter(data__range=(inicio, hoje)).values('ip_address').distinct().count()
+        registros = self.sketches_diarios.filter(data__range=(inicio, hoje)).values_list('registros', flat=True)
+        return mesclar_sketches(registros).estimar()
 
     def total_visualizacoes(self):
-        return self.visualizacoes.count()
+        return self.visualizacoes_arquivadas + self.visualizacoes.count()
 
     def __str__(self):
         return self.titulo
 
+class NoticiaRelacionada(models.Model):
+    """Notícia relacionada pré-calculada para a linha do tempo (ver relacionadas.py)."""
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="relacionadas_calculadas")
+    relacionada = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="relacionada_em")
+    score = models.FloatField()
+    posicao = models.PositiveSmallIntegerField()
+
+    class Meta:
+        unique_together = ('noticia', 'relacionada')
+        ordering = ['noticia', 'posicao']
+
+    def __str__(self):
+        return f"{self.noticia.titulo} -> {self.relacionada.titulo} ({self.score:.2f})"
+
 class Visualizacao(models.Model):
     noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="visualizacoes")
     ip_address = models.GenericIPAddressField()  # Renamed from ip_usuario
@@ -165,6 +216,42 @@ class Visualizacao(models.Model):
     def __str__(self):
         return f"Visualização em {self.noticia.titulo} ({self.data})"
 
+def _sketch_vazio():
+    return bytes(HyperLogLog().m)
+
+
+class SketchVisitantesDiario(models.Model):
+    """Sketch HyperLogLog dos IPs que leram uma notícia em um dia."""
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="sketches_diarios")
+    data = models.DateField()
+    registros = models.BinaryField(default=_sketch_vazio)
+
+    class Meta:
+        unique_together = ('noticia', 'data')
+
+    def hll(self):
+        return HyperLogLog(registros=self.registros)
+
+    def __str__(self):
+        return f"Sketch de {self.noticia.titulo} ({self.data})"
+
+class NoticiaRankingDaily(models.Model):
+    """Visualizações únicas consolidadas por notícia em um dia já fechado."""
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="rankings_diarios")
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    rank = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('noticia', 'date')
+        ordering = ['-date', 'rank']
+        indexes = [
+            models.Index(fields=['date', 'rank']),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} {self.noticia.titulo} ({self.date})"
+
 class Feedback(models.Model):
     nome = models.CharField(max_length=100)
     email = models.EmailField()
@@ -223,25 +310,51 @@ class Enquete(models.Model):
         return self.titulo
 
     def total_votos(self):
-        return sum(opcao.votos.count() for opcao in self.opcoes.all())
+        # Soma dos contadores das opções (aproveita as opções já pré-carregadas)
+        if 'opcoes' in getattr(self, '_prefetched_objects_cache', {}):
+            return sum(opcao.quantidade_votos for opcao in self.opcoes.all())
+        return self.opcoes.aggregate(total=models.Sum('quantidade_votos'))['total'] or 0
 
 
 class Opcao(models.Model):
     enquete = models.ForeignKey(Enquete, on_delete=models.CASCADE, related_name="opcoes")
     texto = models.CharField(max_length=200)
+    # Contador desnormalizado de Voto (signals.py; conferido por reconciliar_votos)
+    quantidade_votos = models.PositiveIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        # O contador só muda por F() (enquetes.ajustar_contador / votos.py)
+        super().save(*args, **campos_para_salvar(self, ('quantidade_votos',), kwargs))
 
     def __str__(self):
         return self.texto
 
     def percentual(self):
-        total = self.enquete.total_votos()
-        return (self.votos.count() / total * 100) if total > 0 else 0
+        # Num laço sobre enquete.opcoes.all() todas as opções apontam para a
+        # mesma instância de enquete: o total é calculado uma vez só
+        enquete = self.enquete
+        if not hasattr(enquete, '_total_votos'):
+            enquete._total_votos = enquete.total_votos()
+        total = enquete._total_votos
+        return (self.quantidade_votos / total * 100) if total > 0 else 0
 
 
 class Voto(models.Model):
     opcao = models.ForeignKey(Opcao, on_delete=models.CASCADE, related_name="votos")
+    # Cópia de opcao.enquete: permite a unicidade por enquete e consultas sem junção
+    enquete = models.ForeignKey(Enquete, on_delete=models.CASCADE, related_name="votos", editable=False)
     ip_usuario = models.GenericIPAddressField()
     data = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['enquete', 'ip_usuario'], name='voto_unico_por_enquete'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self.enquete_id:
+            self.enquete_id = self.opcao.enquete_id
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Voto em {self.opcao.texto} ({self.ip_usuario})"
@@ -0,0 +1,190 @@
+# jcpemobile/pagina_inicial.py
+"""Carregamento das seções da página inicial.
+
+Todas as seções vêm de uma única consulta: ``ROW_NUMBER()`` particionado por
+``secao`` numera as notícias de cada seção da mais recente para a mais antiga
+e só as primeiras de cada partição são lidas. Funciona em SQLite (3.25+) e
+PostgreSQL.
+
+O resultado depende só do conjunto de categorias preferidas e do dia, então
+``obter_pagina_inicial`` o guarda no cache com essa chave. Salvar ou apagar
+uma notícia e recalcular o ranking trocam a geração do cache (ver
+``signals.py``); quando uma entrada vence, só o processo que pega a trava
+recalcula, e os demais continuam servindo a cópia anterior.
+
+O HTML de cada seção também é guardado pelo ``{% cache %}`` do template,
+com uma versão por ``secao`` (``versoes_secoes``) que muda quando uma
+notícia daquela seção é alterada.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Noticia
+
+# secao -> (variável de contexto do index.html, quantidade de notícias)
+SECOES_PAGINA_INICIAL = {
+    'noticia_do_dia': ('noticias_do_dia', 4),
+    'social1': ('noticias_social1', 6),
+    'jc360': ('noticias_jc360', 6),
+    'pernambuco': ('noticias_pernambuco', 6),
+    'blog_do_torcedor': ('noticias_blog_torcedor', 6),
+    'ultimas_noticias': ('noticias_ultimas', 4),
+    'receita_da_boa': ('noticias_receita', 6),
+}
+
+
+def filtrar_categorias(queryset, categorias_preferidas=None):
+    if categorias_preferidas:
+        queryset = queryset.filter(categoria__slug__in=categorias_preferidas)
+    return queryset
+
+
+def carregar_secoes(categorias_preferidas=None):
+    """Retorna ``{variável_de_contexto: [noticias]}`` para todas as seções."""
+    maior_limite = max(limite for _, limite in SECOES_PAGINA_INICIAL.values())
+    noticias = (
+        filtrar_categorias(Noticia.objects.all(), categorias_preferidas)
+        .filter(secao__in=SECOES_PAGINA_INICIAL)
+        .select_related('categoria', 'autor')
+        .annotate(posicao_secao=Window(
+            RowNumber(),
+            partition_by=F('secao'),
+            order_by=[F('data_publicacao').desc(), F('id').desc()],
+        ))
+        .filter(posicao_secao__lte=maior_limite)
+        .order_by('secao', 'posicao_secao')
+    )
+
+    secoes = {variavel: [] for variavel, _ in SECOES_PAGINA_INICIAL.values()}
+    for noticia in noticias:
+        variavel, limite = SECOES_PAGINA_INICIAL[noticia.secao]
+        if noticia.posicao_secao <= limite:
+            secoes[variavel].append(noticia)
+    return secoes
+
+
+def carregar_pagina_inicial(categorias_preferidas=None, limite_mais_vistas=9):
+    """Dados completos do ``index.html``: seções e mais vistas do último ranking diário."""
+    contexto = carregar_secoes(categorias_preferidas)
+    # Ranking pré-calculado pelo comando update_daily_ranking (último dia fechado)
+    contexto['noticias_mais_vistas'] = list(
+        filtrar_categorias(Noticia.objects.select_related('categoria', 'autor'), categorias_preferidas)
+        .order_by(F('daily_rank').asc(nulls_last=True), '-data_publicacao')[:limite_mais_vistas]
+    )
+    return contexto
+
+
+CHAVE_GERACAO = 'pagina_inicial:geracao'
+
+
+def normalizar_categorias(categorias_preferidas=None):
+    """Slugs sem espaços, em minúsculas, sem duplicatas e em ordem."""
+    return sorted({str(slug).strip().lower() for slug in categorias_preferidas or [] if str(slug).strip()})
+
+
+def chave_categorias(categorias_preferidas=None):
+    """Chave do conjunto de categorias (ordem e duplicatas não importam)."""
+    slugs = normalizar_categorias(categorias_preferidas)
+    if not slugs:
+        return 'todas'
+    return hashlib.md5(','.join(slugs).encode()).hexdigest()
+
+
+def geracao_atual():
+    geracao = cache.get(CHAVE_GERACAO)
+    if geracao is None:
+        # Número inicial distinto por processo/reinício para não reaproveitar entradas antigas
+        geracao = int(time.time() * 1000)
+        if not cache.add(CHAVE_GERACAO, geracao, timeout=None):
+            geracao = cache.get(CHAVE_GERACAO, geracao)
+    return geracao
+
+
+def invalidar_pagina_inicial(**kwargs):
+    """Troca a geração: todas as entradas passam a ser recalculadas no próximo acesso."""
+    try:
+        cache.incr(CHAVE_GERACAO)
+    except ValueError:
+        geracao_atual()
+
+
+def obter_pagina_inicial(categorias_preferidas=None):
+    """``carregar_pagina_inicial`` com cache por conjunto de categorias e dia."""
+    # A chave e a consulta usam a mesma lista: slugs que só diferem na caixa
+    # não podem dividir uma entrada calculada com outro filtro
+    categorias_preferidas = normalizar_categorias(categorias_preferidas)
+    ttl = getattr(settings, 'PAGINA_INICIAL_CACHE_TTL', 60)
+    chave = f'pagina_inicial:{timezone.localdate()}:{chave_categorias(categorias_preferidas)}'
+    chave_trava = f'{chave}:trava'
+    geracao = geracao_atual()
+
+    entrada = cache.get(chave)
+    if entrada and entrada['geracao'] == geracao and entrada['expira'] > time.time():
+        return entrada['dados']
+
+    trava = cache.add(chave_trava, 1, timeout=getattr(settings, 'PAGINA_INICIAL_TRAVA_TTL', 10))
+    espera = 0
+    while not trava and espera < 20:
+        # Outro processo está recalculando: servir a cópia anterior, se houver,
+        # ou aguardar um pouco pelo resultado dele.
+        if entrada:
+            return entrada['dados']
+        time.sleep(0.05)
+        espera += 1
+        entrada = cache.get(chave)
+        trava = cache.add(chave_trava, 1, timeout=getattr(settings, 'PAGINA_INICIAL_TRAVA_TTL', 10))
+
+    try:
+        dados = carregar_pagina_inicial(categorias_preferidas)
+        cache.set(chave, {
+            'geracao': geracao,
+            'expira': time.time() + ttl,
+            'dados': dados,
+        }, timeout=max(ttl * 10, 600))
+    finally:
+        if trava:
+            cache.delete(chave_trava)
+    return dados
+
+
+def _chave_versao_secao(secao):
+    return f'pagina_inicial:secao:{secao}:versao'
+
+
+def versoes_secoes():
+    """Versão atual do HTML de cada seção: ``{secao: versao}``."""
+    chaves = {_chave_versao_secao(secao): secao for secao in SECOES_PAGINA_INICIAL}
+    encontradas = cache.get_many(chaves)
+    versoes = {}
+    for chave, secao in chaves.items():
+        if chave not in encontradas:
+            cache.add(chave, int(time.time() * 1000), timeout=None)
+            encontradas[chave] = cache.get(chave, 0)
+        versoes[secao] = encontradas[chave]
+    return versoes
+
+
+def invalidar_secoes(*secoes):
+    """Muda a versão das seções informadas (todas, se nenhuma for passada)."""
+    for secao in secoes or SECOES_PAGINA_INICIAL:
+        if secao not in SECOES_PAGINA_INICIAL:
+            continue
+        try:
+            cache.incr(_chave_versao_secao(secao))
+        except ValueError:
+            cache.add(_chave_versao_secao(secao), int(time.time() * 1000), timeout=None)
+
+
+def contexto_fragmentos(categorias_preferidas=None):
+    """Variáveis usadas nas chaves do ``{% cache %}`` das seções do index.html."""
+    return {
+        'fragmentos_ttl': getattr(settings, 'PAGINA_INICIAL_FRAGMENTOS_TTL', 600),
+        'versoes_secoes': versoes_secoes(),
+        'chave_categorias': chave_categorias(categorias_preferidas),
+    }
@@ -0,0 +1,263 @@
+# jcpemobile/ranking.py
+"""Ranking diário de notícias.
+
+Os dias já fechados são consolidados uma única vez em ``NoticiaRankingDaily``
+(comando ``update_daily_ranking``). As páginas de ranking leem essa tabela,
+que tem uma linha por notícia por dia, e só contam linhas brutas de
+``Visualizacao`` do dia corrente (filtradas pelo índice em ``data``).
+
+``ranking_deslizante`` mantém em memória as listas de mais vistas de hoje,
+da semana e do mês, prontas para servir a página ``mais_lidas``.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Noticia, NoticiaRankingDaily, Visualizacao
+from .pagina_inicial import invalidar_pagina_inicial
+from .visualizacoes import buffer_visualizacoes
+
+
+def dias_pendentes(hoje=None):
+    """Dias fechados que têm visualizações mas ainda não foram consolidados."""
+    hoje = hoje or timezone.now().date()
+    com_visualizacoes = set(
+        Visualizacao.objects.filter(data__lt=hoje).values_list('data', flat=True).distinct()
+    )
+    consolidados = set(
+        NoticiaRankingDaily.objects.filter(date__in=com_visualizacoes).values_list('date', flat=True).distinct()
+    )
+    return sorted(com_visualizacoes - consolidados)
+
+
+@transaction.atomic
+def consolidar_dia(dia):
+    """(Re)calcula o ranking de um dia. Retorna quantas notícias entraram no ranking."""
+    contagens = (
+        Visualizacao.objects.filter(data=dia)
+        .values('noticia')
+        .annotate(views=Count('id'))
+        .order_by('-views', 'noticia')
+    )
+    linhas = [
+        NoticiaRankingDaily(noticia_id=item['noticia'], date=dia, views=item['views'], rank=posicao)
+        for posicao, item in enumerate(contagens, start=1)
+    ]
+    if not linhas:
+        # Dia sem linhas brutas (nunca teve visualizações ou já foi compactado):
+        # o ranking existente é a única fonte e não pode ser apagado.
+        return 0
+    NoticiaRankingDaily.objects.filter(date=dia).delete()
+    NoticiaRankingDaily.objects.bulk_create(linhas, batch_size=500)
+    return len(linhas)
+
+
+@transaction.atomic
+def atualizar_daily_rank():
+    """Copia para ``Noticia.daily_rank`` as posições do último dia consolidado."""
+    ultimo_dia = NoticiaRankingDaily.objects.order_by('-date').values_list('date', flat=True).first()
+    if ultimo_dia is None:
+        return None
+
+    # Zera também as do próprio dia: ao recalculá-lo (--dia), quem saiu do
+    # ranking não pode ficar com a posição antiga
+    Noticia.objects.exclude(daily_rank=None).update(daily_rank=None, daily_rank_date=None)
+    noticias = []
+    for noticia_id, rank in NoticiaRankingDaily.objects.filter(date=ultimo_dia).values_list('noticia_id', 'rank'):
+        noticias.append(Noticia(id=noticia_id, daily_rank=rank, daily_rank_date=ultimo_dia))
+    Noticia.objects.bulk_update(noticias, ['daily_rank', 'daily_rank_date'], batch_size=500)
+    # bulk_update não dispara post_save; o "mais vistas" da página inicial mudou
+    transaction.on_commit(invalidar_pagina_inicial)
+    return ultimo_dia
+
+
+def visualizacoes_de_hoje(hoje=None):
+    """Contagem de visualizações brutas de um dia (padrão: hoje) por notícia."""
+    hoje = hoje or timezone.now().date()
+    return Counter(dict(
+        Visualizacao.objects.filter(data=hoje).values('noticia').annotate(views=Count('id')).values_list('noticia', 'views')
+    ))
+
+
+def mais_vistas(top):
+    """Converte pares (id, views) já ordenados em notícias com ``visualizacoes_periodo``."""
+    top = [(noticia_id, views) for noticia_id, views in top if views > 0]
+    noticias = Noticia.objects.select_related('categoria', 'autor').in_bulk([noticia_id for noticia_id, _ in top])
+    resultado = []
+    for noticia_id, views in top:
+        noticia = noticias.get(noticia_id)
+        if noticia is not None:
+            noticia.visualizacoes_periodo = views
+            resultado.append(noticia)
+    return resultado
+
+
+class SpaceSaving:
+    """Contador de heavy hitters com memória limitada (algoritmo Space-Saving).
+
+    Guarda no máximo ``capacidade`` chaves. Uma chave nova, com a estrutura
+    cheia, substitui a de menor contagem e herda essa contagem; assim nenhum
+    item frequente é perdido e o erro de cada contagem é limitado pelo mínimo.
+    """
+
+    def __init__(self, capacidade, contagens=None):
+        self.capacidade = capacidade
+        self.contagens = {}
+        if contagens:
+            for chave, contagem in heapq.nlargest(capacidade, contagens.items(), key=itemgetter(1)):
+                self.contagens[chave] = contagem
+
+    def adicionar(self, chave, peso=1):
+        if chave in self.contagens:
+            self.contagens[chave] += peso
+        elif len(self.contagens) < self.capacidade:
+            self.contagens[chave] = peso
+        else:
+            menor = min(self.contagens, key=self.contagens.__getitem__)
+            self.contagens[chave] = self.contagens.pop(menor) + peso
+
+    def __len__(self):
+        return len(self.contagens)
+
+
+class RankingDeslizante:
+    """Top-N das janelas hoje/semana/mês mantido em memória.
+
+    Cada dia é um balde de contagens por notícia. Os dias fechados vêm de
+    ``NoticiaRankingDaily`` (limitados às ``capacidade`` primeiras posições) e
+    são somados uma vez no total de cada janela; quando o dia vira, o balde
+    que entra é somado e o que sai da janela é subtraído. O dia corrente é um
+    ``SpaceSaving`` alimentado pelo buffer de visualizações e ressincronizado
+    com o banco a cada ``RANKING_SINCRONIZACAO_INTERVALO`` segundos (os outros
+    processos também gravam visualizações). As listas ordenadas ficam prontas
+    até a próxima mudança.
+    """
+
+    JANELAS = {'hoje': 1, 'semana': 7, 'mes': 30}
+
+    def __init__(self, capacidade=2000):
+        self.capacidade = capacidade
+        self._lock = threading.RLock()
+        self.invalidar()
+
+    def invalidar(self):
+        """Descarta o estado; o próximo acesso recarrega tudo do banco."""
+        with self._lock:
+            self._dia = None
+            self._baldes = {}
+            self._fechados = {janela: Counter() for janela in self.JANELAS}
+            self._hoje = SpaceSaving(self.capacidade)
+            self._sincronizado_em = None
+            self._fechados_em = None
+            self._listas = {}
+
+    def top(self, janela, limite=15):
+        """Lista [(noticia_id, views), ...] ordenada da janela pedida."""
+        with self._lock:
+            self._atualizar()
+            chave = (janela, limite)
+            if chave not in self._listas:
+                contagens = Counter(self._fechados[janela])
+                contagens.update(self._hoje.contagens)
+                self._listas[chave] = heapq.nlargest(limite, contagens.items(), key=itemgetter(1))
+            return self._listas[chave]
+
+    def registrar(self, noticia_id, dia, peso=1):
+        with self._lock:
+            if dia != self._dia:
+                return
+            self._hoje.adicionar(noticia_id, peso)
+            self._listas.clear()
+
+    def ao_gravar_visualizacoes(self, chaves):
+        """Ouvinte do buffer de visualizações: soma o lote gravado ao dia corrente."""
+        for noticia_id, _ip, dia in chaves:
+            self.registrar(noticia_id, dia)
+
+    def _atualizar(self):
+        hoje = timezone.now().date()
+        agora = time.monotonic()
+        recarga = getattr(settings, 'RANKING_RECARGA_FECHADOS', 3600)
+        if self._dia is None or self._fechados_em is None or agora - self._fechados_em >= recarga:
+            self._carregar_fechados(hoje)
+        elif hoje != self._dia:
+            self._avancar(hoje)
+
+        intervalo = getattr(settings, 'RANKING_SINCRONIZACAO_INTERVALO', 60)
+        if self._sincronizado_em is None or agora - self._sincronizado_em >= intervalo:
+            self._hoje = SpaceSaving(self.capacidade, visualizacoes_de_hoje(hoje))
+            self._sincronizado_em = agora
+            self._listas.clear()
+
+    def _carregar_fechados(self, hoje):
+        inicio = hoje - timezone.timedelta(days=max(self.JANELAS.values()) - 1)
+        self._baldes = {}
+        for dia in self._dias(inicio, hoje):
+            self._baldes[dia] = Counter()
+        linhas = NoticiaRankingDaily.objects.filter(
+            date__gte=inicio, date__lt=hoje, rank__lte=self.capacidade
+        ).values_list('date', 'noticia_id', 'views')
+        for dia, noticia_id, views in linhas:
+            self._baldes[dia][noticia_id] = views
+        for dia in dias_pendentes(hoje):
+            if dia >= inicio:
+                self._baldes[dia] = self._contar_dia(dia)
+
+        self._fechados = {janela: Counter() for janela in self.JANELAS}
+        for dia, balde in self._baldes.items():
+            for janela, dias in self.JANELAS.items():
+                if dia >= hoje - timezone.timedelta(days=dias - 1):
+                    self._fechados[janela].update(balde)
+        self._dia = hoje
+        self._sincronizado_em = None
+        self._fechados_em = time.monotonic()
+        self._listas.clear()
+
+    def _avancar(self, hoje):
+        """Vira o dia: o balde que fecha entra em cada janela e o mais antigo sai."""
+        if (hoje - self._dia).days > 1:
+            self._carregar_fechados(hoje)
+            return
+        ontem = self._dia
+        balde_novo = self._contar_dia(ontem)
+        self._baldes[ontem] = balde_novo
+        for janela, dias in self.JANELAS.items():
+            if dias == 1:
+                continue
+            self._fechados[janela].update(balde_novo)
+            saiu = hoje - timezone.timedelta(days=dias)
+            self._fechados[janela].subtract(self._baldes.get(saiu, {}))
+            self._fechados[janela] = +self._fechados[janela]
+        limite = hoje - timezone.timedelta(days=max(self.JANELAS.values()))
+        for dia in [dia for dia in self._baldes if dia <= limite]:
+            del self._baldes[dia]
+        self._dia = hoje
+        self._hoje = SpaceSaving(self.capacidade)
+        self._sincronizado_em = None
+        self._listas.clear()
+
+    def _contar_dia(self, dia):
+        contagens = Counter(dict(
+            NoticiaRankingDaily.objects.filter(date=dia, rank__lte=self.capacidade).values_list('noticia_id', 'views')
+        ))
+        if not contagens:
+            contagens = visualizacoes_de_hoje(dia)
+        return Counter(dict(heapq.nlargest(self.capacidade, contagens.items(), key=itemgetter(1))))
+
+    @staticmethod
+    def _dias(inicio, fim):
+        dia = inicio
+        while dia < fim:
+            yield dia
+            dia += timezone.timedelta(days=1)
+
+
+ranking_deslizante = RankingDeslizante(capacidade=getattr(settings, 'RANKING_CAPACIDADE', 2000))
+buffer_visualizacoes.ao_gravar(ranking_deslizante.ao_gravar_visualizacoes)
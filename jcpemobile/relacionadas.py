@@ -0,0 +1,217 @@
+# jcpemobile/relacionadas.py
+"""Notícias relacionadas pré-calculadas (linha do tempo da notícia).
+
+Para cada notícia guardamos em ``NoticiaRelacionada`` as ``K`` mais
+relacionadas com a pontuação:
+
+    PESO_TAG * tags em comum + PESO_CATEGORIA * (mesma categoria) + PESO_RECENCIA * recência
+
+onde recência = 1 / (1 + idade_em_dias / MEIA_VIDA_DIAS). A lista é refeita
+ao salvar a notícia ou mudar suas tags (``signals.py``) e em lote pelo comando
+``atualizar_relacionadas``; a página só lê as linhas prontas.
+
+O recálculo de uma notícia e das vizinhas custa algumas dezenas de consultas,
+então não roda na requisição do editor: depois do commit a notícia entra numa
+fila com uma thread (``FilaRelacionadas``), que junta pedidos repetidos da
+mesma notícia e invalida as páginas em cache das notícias recalculadas.
+Com ``RELACIONADAS_SINCRONO = True`` (útil em testes) o recálculo roda no
+próprio commit.
+"""
+import heapq
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Noticia, NoticiaRelacionada
+
+logger = logging.getLogger(__name__)
+
+TOTAL_RELACIONADAS = 6
+PESO_TAG = 3.0
+PESO_CATEGORIA = 2.0
+PESO_RECENCIA = 1.0
+MEIA_VIDA_DIAS = 30
+# Candidatas só por categoria (sem tag em comum): as mais recentes da categoria
+LIMITE_MESMA_CATEGORIA = 100
+# No recálculo em lote, cada tag contribui com no máximo as N notícias mais
+# recentes (evita custo quadrático em tags muito populares)
+LIMITE_POR_TAG = 500
+
+Tags = Noticia.tags.through
+
+
+def pontuar(tags_em_comum, mesma_categoria, data_publicacao, agora):
+    idade_dias = max((agora - data_publicacao).total_seconds() / 86400, 0) if data_publicacao else 0
+    recencia = 1 / (1 + idade_dias / MEIA_VIDA_DIAS)
+    return PESO_TAG * tags_em_comum + PESO_CATEGORIA * mesma_categoria + PESO_RECENCIA * recencia
+
+
+def _melhores(noticia_id, categoria_id, compartilhadas, mesma_categoria, dados, agora, k):
+    """Seleciona as ``k`` candidatas de maior pontuação (empate: mais recente)."""
+    candidatas = (set(compartilhadas) | set(mesma_categoria)) - {noticia_id}
+    pontuadas = []
+    for candidata in candidatas:
+        candidata_categoria, data_publicacao = dados[candidata]
+        mesma = bool(categoria_id) and candidata_categoria == categoria_id
+        score = pontuar(compartilhadas.get(candidata, 0), mesma, data_publicacao, agora)
+        pontuadas.append((score, data_publicacao, candidata))
+    return [(candidata, score) for score, _, candidata in heapq.nlargest(k, pontuadas)]
+
+
+def _salvar(resultados, todas=False):
+    """Substitui as relacionadas das notícias em ``resultados`` ({id: [(id, score)]})."""
+    existentes = NoticiaRelacionada.objects.all()
+    if not todas:
+        existentes = existentes.filter(noticia_id__in=resultados)
+    existentes.delete()
+    NoticiaRelacionada.objects.bulk_create([
+        NoticiaRelacionada(noticia_id=noticia_id, relacionada_id=relacionada_id, score=score, posicao=posicao)
+        for noticia_id, lista in resultados.items()
+        for posicao, (relacionada_id, score) in enumerate(lista, start=1)
+    ], batch_size=1000)
+
+
+@transaction.atomic
+def atualizar_relacionadas(noticia, k=TOTAL_RELACIONADAS):
+    """Recalcula as relacionadas de uma notícia (poucas consultas, sem varrer o acervo)."""
+    tags_ids = list(Tags.objects.filter(noticia_id=noticia.pk).values_list('tag_id', flat=True))
+    compartilhadas = dict(
+        Tags.objects.filter(tag_id__in=tags_ids).exclude(noticia_id=noticia.pk)
+        .values('noticia_id').annotate(total=Count('tag_id')).values_list('noticia_id', 'total')
+    ) if tags_ids else {}
+    mesma_categoria = list(
+        Noticia.objects.filter(categoria_id=noticia.categoria_id).exclude(pk=noticia.pk)
+        .order_by('-data_publicacao').values_list('id', flat=True)[:LIMITE_MESMA_CATEGORIA]
+    ) if noticia.categoria_id else []
+
+    candidatas = set(compartilhadas) | set(mesma_categoria)
+    dados = {
+        noticia_id: (categoria_id, data_publicacao)
+        for noticia_id, categoria_id, data_publicacao in Noticia.objects.filter(id__in=candidatas)
+        .values_list('id', 'categoria_id', 'data_publicacao')
+    }
+    melhores = _melhores(noticia.pk, noticia.categoria_id, compartilhadas, mesma_categoria,
+                         dados, timezone.now(), k)
+    _salvar({noticia.pk: melhores})
+    return melhores
+
+
+@transaction.atomic
+def atualizar_todas(k=TOTAL_RELACIONADAS):
+    """Recalcula todas as notícias em memória: três leituras e uma gravação em lote."""
+    dados = {}
+    por_categoria = defaultdict(list)
+    for noticia_id, categoria_id, data_publicacao in (
+        Noticia.objects.order_by('-data_publicacao').values_list('id', 'categoria_id', 'data_publicacao')
+    ):
+        dados[noticia_id] = (categoria_id, data_publicacao)
+        if categoria_id:
+            por_categoria[categoria_id].append(noticia_id)
+
+    tags_por_noticia = defaultdict(list)
+    noticias_por_tag = defaultdict(list)
+    for noticia_id, tag_id in Tags.objects.values_list('noticia_id', 'tag_id'):
+        tags_por_noticia[noticia_id].append(tag_id)
+        noticias_por_tag[tag_id].append(noticia_id)
+    for tag_id, noticias in noticias_por_tag.items():
+        noticias.sort(key=lambda noticia_id: dados[noticia_id][1], reverse=True)
+        del noticias[LIMITE_POR_TAG:]
+
+    agora = timezone.now()
+    resultados = {}
+    for noticia_id, (categoria_id, _) in dados.items():
+        compartilhadas = defaultdict(int)
+        for tag_id in tags_por_noticia.get(noticia_id, ()):
+            for outra in noticias_por_tag[tag_id]:
+                if outra != noticia_id:
+                    compartilhadas[outra] += 1
+        mesma_categoria = [
+            outra for outra in por_categoria.get(categoria_id, ())[:LIMITE_MESMA_CATEGORIA + 1]
+            if outra != noticia_id
+        ][:LIMITE_MESMA_CATEGORIA]
+        resultados[noticia_id] = _melhores(noticia_id, categoria_id, compartilhadas, mesma_categoria,
+                                           dados, agora, k)
+    _salvar(resultados, todas=True)
+    return len(resultados)
+
+
+def atualizar_com_vizinhas(noticia, k=TOTAL_RELACIONADAS):
+    """Recalcula a notícia e as suas relacionadas, onde ela também pode passar a aparecer.
+
+    Retorna os ids das notícias recalculadas.
+    """
+    melhores = atualizar_relacionadas(noticia, k)
+    vizinhas = Noticia.objects.filter(id__in=[noticia_id for noticia_id, _ in melhores])
+    recalculadas = [noticia.pk]
+    for vizinha in vizinhas.only('id', 'categoria_id'):
+        atualizar_relacionadas(vizinha, k)
+        recalculadas.append(vizinha.pk)
+    return recalculadas
+
+
+def recalcular(noticia_id):
+    """Recalcula a notícia (se ainda existir) e as vizinhas e invalida as páginas delas."""
+    from .cache_paginas import invalidar_pagina_noticia
+
+    noticia = Noticia.objects.filter(pk=noticia_id).only('id', 'categoria_id').first()
+    if noticia is None:
+        return
+    recalculadas = atualizar_com_vizinhas(noticia)
+    for slug in Noticia.objects.filter(id__in=recalculadas).values_list('slug', flat=True):
+        invalidar_pagina_noticia(slug)
+
+
+class FilaRelacionadas:
+    """Uma thread criada no primeiro uso; cada notícia aparece no máximo uma vez na fila."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pendentes = set()
+
+    def agendar(self, noticia_ids):
+        if getattr(settings, 'RELACIONADAS_SINCRONO', False):
+            for noticia_id in noticia_ids:
+                recalcular(noticia_id)
+            return
+        with self._lock:
+            novas = [noticia_id for noticia_id in dict.fromkeys(noticia_ids) if noticia_id not in self._pendentes]
+            self._pendentes.update(novas)
+            if novas and self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='relacionadas')
+        for noticia_id in novas:
+            self._executor.submit(self._executar, noticia_id)
+
+    def _executar(self, noticia_id):
+        # Sai da fila antes de calcular: uma alteração durante o cálculo agenda de novo
+        with self._lock:
+            self._pendentes.discard(noticia_id)
+        try:
+            recalcular(noticia_id)
+        except Exception:
+            logger.exception('Erro ao recalcular as relacionadas da notícia %s', noticia_id)
+        finally:
+            # A thread tem conexão própria; não deixá-la aberta entre tarefas.
+            connections.close_all()
+
+    def parar(self, esperar=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=esperar)
+                self._executor = None
+
+
+fila_relacionadas = FilaRelacionadas()
+
+
+def agendar_relacionadas(noticia_ids):
+    """Enfileira depois do commit: o recálculo precisa ver a notícia e as tags gravadas."""
+    noticia_ids = list(noticia_ids)
+    if noticia_ids:
+        transaction.on_commit(lambda: fila_relacionadas.agendar(noticia_ids))
@@ -0,0 +1,98 @@
+# jcpemobile/serializacao.py
+"""Serialização em lote de notícias para as APIs JSON.
+
+As colunas vêm de ``.values()`` (sem instanciar ``Noticia``) e as tags, se
+pedidas, de uma única consulta extra para o lote inteiro. O cliente escolhe
+os campos com ``?fields=id,titulo,slug``; só as colunas e junções desses
+campos entram na consulta. São no máximo duas consultas, qualquer que seja o
+tamanho do resultado.
+"""
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+
+from .models import Noticia
+
+# campo da API -> coluna usada no .values() (None: montado à parte)
+CAMPOS = {
+    'id': 'id',
+    'titulo': 'titulo',
+    'subtitulo': 'subtitulo',
+    'slug': 'slug',
+    'resumo': 'resumo',
+    'secao': 'secao',
+    'imagem': 'imagem',
+    'data_publicacao': 'data_publicacao',
+    'categoria': 'categoria__nome',
+    'autor': 'autor__nome',
+    'tags': None,
+}
+CAMPOS_PADRAO = ('id', 'titulo', 'slug', 'resumo', 'data_publicacao', 'categoria', 'autor', 'tags')
+
+
+class CampoInvalido(ValueError):
+    pass
+
+
+def campos_solicitados(parametro, padrao=CAMPOS_PADRAO, extras=()):
+    """Lê ``fields=a,b,c``; sem o parâmetro, usa ``padrao``. ``extras`` são anotações aceitas."""
+    if not parametro:
+        return list(padrao)
+    campos = []
+    for campo in parametro.split(','):
+        campo = campo.strip()
+        if not campo or campo in campos:
+            continue
+        if campo not in CAMPOS and campo not in extras:
+            raise CampoInvalido(f'Campo desconhecido: {campo}')
+        campos.append(campo)
+    return campos
+
+
+def _formatar(campo, valor):
+    if campo == 'data_publicacao':
+        return valor.isoformat() if valor else None
+    if campo == 'imagem':
+        return default_storage.url(valor) if valor else None
+    return valor
+
+
+def tags_por_noticia(noticia_ids):
+    """``{noticia_id: [nomes]}`` numa única consulta."""
+    Tags = Noticia.tags.through
+    tags = defaultdict(list)
+    for noticia_id, nome in (
+        Tags.objects.filter(noticia_id__in=noticia_ids)
+        .order_by('noticia_id', 'tag__nome')
+        .values_list('noticia_id', 'tag__nome')
+    ):
+        tags[noticia_id].append(nome)
+    return tags
+
+
+def serializar_noticias(noticias, campos=CAMPOS_PADRAO, limite=None):
+    """Lista de dicts com ``campos`` para o queryset ``noticias`` (ordem preservada).
+
+    Campos fora de ``CAMPOS`` são lidos como anotações do queryset (ex.: ``match_count``).
+    """
+    colunas = {'id'}
+    for campo in campos:
+        coluna = CAMPOS.get(campo, campo)
+        if coluna:
+            colunas.add(coluna)
+    linhas = noticias.values(*colunas)
+    if limite is not None:
+        linhas = linhas[:limite]
+    linhas = list(linhas)
+
+    tags = tags_por_noticia([linha['id'] for linha in linhas]) if 'tags' in campos and linhas else {}
+    resultado = []
+    for linha in linhas:
+        item = {}
+        for campo in campos:
+            if campo == 'tags':
+                item[campo] = tags.get(linha['id'], [])
+            else:
+                item[campo] = _formatar(campo, linha[CAMPOS.get(campo) or campo])
+        resultado.append(item)
+    return resultado
@@ -0,0 +1,134 @@
+# jcpemobile/signals.py
+"""Receivers que mantêm caches e índices derivados em dia com o banco."""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .busca import registrar_alteracao
+from .cache_paginas import invalidar_pagina_noticia
+from .enquetes import ajustar_contador
+from .models import Autor, Categoria, Enquete, Noticia, Opcao, Tag, Voto
+from .pagina_inicial import invalidar_pagina_inicial, invalidar_secoes
+from .relacionadas import agendar_relacionadas
+from .sugestoes import registrar_alteracao_taxonomia
+from .votos import buffer_votos
+
+
+@receiver(post_save, sender=Noticia)
+@receiver(post_delete, sender=Noticia)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+def invalidar_cache_pagina_inicial(sender, **kwargs):
+    """Notícias, categorias e autores aparecem nos cards da página inicial."""
+    invalidar_pagina_inicial()
+
+
+@receiver(pre_save, sender=Noticia)
+def guardar_estado_anterior(sender, instance, **kwargs):
+    """Se a notícia mudar de seção ou de slug, os dois valores precisam ser invalidados."""
+    instance._secao_anterior = instance._slug_anterior = None
+    if instance.pk:
+        anterior = sender.objects.filter(pk=instance.pk).values('secao', 'slug').first()
+        if anterior:
+            instance._secao_anterior = anterior['secao']
+            instance._slug_anterior = anterior['slug']
+
+
+@receiver(post_save, sender=Noticia)
+@receiver(post_delete, sender=Noticia)
+def invalidar_fragmentos_secao(sender, instance, **kwargs):
+    invalidar_secoes(*{instance.secao, getattr(instance, '_secao_anterior', None) or instance.secao})
+
+
+@receiver(post_save, sender=Noticia)
+@receiver(post_delete, sender=Noticia)
+def invalidar_cache_pagina_noticia(sender, instance, **kwargs):
+    invalidar_pagina_noticia(instance.slug, getattr(instance, '_slug_anterior', None))
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Autor)
+@receiver(post_delete, sender=Autor)
+def invalidar_fragmentos_todas_secoes(sender, **kwargs):
+    invalidar_secoes()
+
+
+@receiver(post_save, sender=Noticia)
+def atualizar_relacionadas_ao_salvar(sender, instance, raw=False, **kwargs):
+    if not raw:
+        agendar_relacionadas([instance.pk])
+
+
+def _noticias_afetadas(instance, action, reverse, pk_set):
+    """Ids das notícias cujas tags mudaram num ``m2m_changed`` de ``Noticia.tags``."""
+    if not reverse:
+        return [instance.pk]
+    if action == 'post_clear':
+        # tag.noticias.clear() não traz pk_set: vem de guardar_noticias_da_tag
+        return getattr(instance, '_noticias_antes_de_limpar', [])
+    return list(pk_set or ())
+
+
+@receiver(m2m_changed, sender=Noticia.tags.through)
+def guardar_noticias_da_tag(sender, instance, action, reverse, **kwargs):
+    if reverse and action == 'pre_clear':
+        instance._noticias_antes_de_limpar = list(instance.noticias.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=Noticia.tags.through)
+def atualizar_relacionadas_ao_mudar_tags(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        # tag.noticias.add(...): instance é a Tag; recalcular as notícias afetadas
+        agendar_relacionadas(_noticias_afetadas(instance, action, reverse, kwargs.get('pk_set')))
+
+
+@receiver(post_save, sender=Noticia)
+@receiver(post_delete, sender=Noticia)
+def reindexar_busca(sender, instance, raw=False, **kwargs):
+    # Só depois do commit: outro processo que reindexar antes leria a versão antiga
+    if not raw:
+        noticia_id = instance.pk
+        transaction.on_commit(lambda: registrar_alteracao(noticia_id))
+
+
+@receiver(m2m_changed, sender=Noticia.tags.through)
+def reindexar_busca_ao_mudar_tags(sender, instance, action, reverse, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    noticia_ids = _noticias_afetadas(instance, action, reverse, kwargs.get('pk_set'))
+
+    def registrar():
+        for noticia_id in noticia_ids:
+            registrar_alteracao(noticia_id)
+    transaction.on_commit(registrar)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def recarregar_taxonomia_sugestoes(sender, **kwargs):
+    transaction.on_commit(registrar_alteracao_taxonomia)
+
+
+@receiver(post_save, sender=Voto)
+def contar_voto(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ajustar_contador(instance.opcao_id, 1)
+
+
+@receiver(post_delete, sender=Voto)
+def descontar_voto(sender, instance, **kwargs):
+    ajustar_contador(instance.opcao_id, -1)
+
+
+@receiver(post_delete, sender=Voto)
+@receiver(post_delete, sender=Opcao)
+@receiver(post_delete, sender=Enquete)
+def esquecer_votantes(sender, instance, **kwargs):
+    # Votante apagado pode votar de novo; opção apagada não aceita mais voto
+    enquete_id = instance.pk if sender is Enquete else instance.enquete_id
+    transaction.on_commit(lambda: buffer_votos.invalidar(enquete_id))
@@ -0,0 +1,228 @@
+# jcpemobile/sugestoes.py
+"""Sugestões de busca por prefixo (autocomplete).
+
+As chaves são títulos de notícias, nomes de tags e de categorias,
+normalizados como na busca (``busca.normalizar``). Títulos entram uma vez
+por palavra relevante ("eleição municipal no recife" também responde a
+"recife"). Ficam num array ordenado, e um prefixo vira um intervalo achado
+por busca binária (``bisect``). Dentro do intervalo vencem as de maior peso:
+visualizações da semana (``ranking_deslizante``) e recência para notícias,
+quantidade de notícias para tags e categorias.
+
+Prefixos de até ``TAMANHO_PREFIXO_CURTO`` caracteres cobrem boa parte do
+array, e percorrer o intervalo a cada tecla custaria caro; as sugestões
+deles ficam guardadas até o array ou os pesos mudarem.
+
+O array acompanha as mudanças sem ser refeito: notícias alteradas chegam
+pelo mesmo registro de alterações do índice de busca
+(``busca.alteracoes_desde``), e tags e categorias, que são poucas, são
+recarregadas quando a versão da taxonomia muda (``registrar_alteracao_taxonomia``).
+"""
+import bisect
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .busca import STOPWORDS, alteracoes_desde, normalizar
+
+CHAVE_VERSAO_TAXONOMIA = 'sugestoes:taxonomia'
+LIMITE_SUGESTOES = 8
+# Palavras de um título que viram chave (as primeiras, sem stopwords)
+PALAVRAS_POR_TITULO = 8
+MEIA_VIDA_DIAS = 30
+# Prefixos com sugestões guardadas (intervalos grandes no array)
+TAMANHO_PREFIXO_CURTO = 2
+# Fim do intervalo de um prefixo: maior que qualquer caractere das chaves
+_MAIOR = '\x7f'
+
+
+def _chave(texto):
+    return ' '.join(normalizar(texto).split())
+
+
+def chaves_titulo(titulo):
+    """A partir de cada palavra relevante do título, o restante dele."""
+    palavras = _chave(titulo).split()
+    chaves = []
+    for i, palavra in enumerate(palavras):
+        if palavra in STOPWORDS or len(palavra) < 2:
+            continue
+        chaves.append(' '.join(palavras[i:]))
+        if len(chaves) >= PALAVRAS_POR_TITULO:
+            break
+    return chaves
+
+
+class IndiceSugestoes:
+    """Array ordenado de ``(chave, origem)``; origem é ``('noticia'|'tag'|'categoria', id)``."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._limpar()
+        self._carregado = False
+        self._versao_noticias = None
+        self._versao_taxonomia = None
+        self._pesos_em = 0.0
+
+    def _limpar(self):
+        self._entradas = []
+        self._chaves_por_origem = {}
+        # origem -> dados exibidos ({'texto', 'tipo', 'slug'/'id'})
+        self._dados = {}
+        self._datas = {}
+        self._pesos = {}
+        # (prefixo curto, limite) -> origens; vale até o array ou os pesos mudarem
+        self._curtos = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._limpar()
+            self._carregado = False
+
+    # --- manutenção ------------------------------------------------------
+
+    def _inserir(self, origem, texto, chaves, dados, em_lote=False):
+        """Com ``em_lote`` as chaves só são acrescentadas; quem chama ordena no fim."""
+        self._remover(origem)
+        self._curtos.clear()
+        for chave in chaves:
+            if em_lote:
+                self._entradas.append((chave, origem))
+            else:
+                bisect.insort(self._entradas, (chave, origem))
+        self._chaves_por_origem[origem] = chaves
+        self._dados[origem] = dict(dados, texto=texto, tipo=origem[0])
+
+    def _remover(self, origem):
+        self._curtos.clear()
+        for chave in self._chaves_por_origem.pop(origem, ()):
+            i = bisect.bisect_left(self._entradas, (chave, origem))
+            if i < len(self._entradas) and self._entradas[i] == (chave, origem):
+                del self._entradas[i]
+        self._dados.pop(origem, None)
+        self._datas.pop(origem, None)
+        self._pesos.pop(origem, None)
+
+    def _descartar(self, tipos):
+        """Remove de uma vez todas as origens dos tipos informados."""
+        self._curtos.clear()
+        self._entradas = [entrada for entrada in self._entradas if entrada[1][0] not in tipos]
+        for origem in [origem for origem in self._dados if origem[0] in tipos]:
+            self._chaves_por_origem.pop(origem, None)
+            self._dados.pop(origem)
+            self._datas.pop(origem, None)
+            self._pesos.pop(origem, None)
+
+    def _carregar_noticias(self, noticia_ids=None):
+        from .models import Noticia
+
+        noticias = Noticia.objects.all()
+        em_lote = noticia_ids is None
+        if em_lote:
+            self._descartar({'noticia'})
+        else:
+            for noticia_id in noticia_ids:
+                self._remover(('noticia', noticia_id))
+            noticias = noticias.filter(id__in=noticia_ids)
+        for noticia_id, titulo, slug, data_publicacao in (
+            noticias.values_list('id', 'titulo', 'slug', 'data_publicacao').iterator(chunk_size=2000)
+        ):
+            origem = ('noticia', noticia_id)
+            self._inserir(origem, titulo, chaves_titulo(titulo), {'slug': slug}, em_lote=em_lote)
+            self._datas[origem] = data_publicacao
+        if em_lote:
+            self._entradas.sort()
+
+    def _carregar_taxonomia(self):
+        from .models import Categoria, Tag
+
+        self._descartar({'tag', 'categoria'})
+        for tag_id, nome, total in Tag.objects.annotate(total=Count('noticias')).values_list('id', 'nome', 'total'):
+            self._inserir(('tag', tag_id), nome, [_chave(nome)], {'id': tag_id}, em_lote=True)
+            self._pesos[('tag', tag_id)] = math.log1p(total)
+        for categoria_id, nome, slug, total in (
+            Categoria.objects.annotate(total=Count('noticias')).values_list('id', 'nome', 'slug', 'total')
+        ):
+            self._inserir(('categoria', categoria_id), nome, [_chave(nome)], {'slug': slug}, em_lote=True)
+            # Categorias são poucas e levam a páginas amplas: sobem um pouco
+            self._pesos[('categoria', categoria_id)] = math.log1p(total) + 1
+        self._entradas.sort()
+
+    def _atualizar_pesos(self):
+        from .ranking import ranking_deslizante
+
+        visualizacoes = dict(ranking_deslizante.top('semana', getattr(settings, 'RANKING_CAPACIDADE', 2000)))
+        agora = timezone.now()
+        for origem, data_publicacao in self._datas.items():
+            idade_dias = max((agora - data_publicacao).total_seconds() / 86400, 0) if data_publicacao else 0
+            self._pesos[origem] = math.log1p(visualizacoes.get(origem[1], 0)) + 1 / (1 + idade_dias / MEIA_VIDA_DIAS)
+        self._pesos_em = time.monotonic()
+        self._curtos.clear()
+
+    def sincronizar(self):
+        with self._lock:
+            versao_taxonomia = versao_taxonomia_atual()
+            if not self._carregado:
+                self._limpar()
+                self._versao_noticias, _ = alteracoes_desde(None)
+                self._carregar_noticias()
+                self._carregar_taxonomia()
+                self._versao_taxonomia = versao_taxonomia
+                self._atualizar_pesos()
+                self._carregado = True
+                return
+
+            self._versao_noticias, alteradas = alteracoes_desde(self._versao_noticias)
+            if alteradas is None:
+                self._carregar_noticias()
+            elif alteradas:
+                self._carregar_noticias(alteradas)
+            if versao_taxonomia != self._versao_taxonomia:
+                self._carregar_taxonomia()
+                self._versao_taxonomia = versao_taxonomia
+            if alteradas is None or alteradas or time.monotonic() - self._pesos_em > getattr(settings, 'SUGESTOES_PESOS_INTERVALO', 60):
+                self._atualizar_pesos()
+
+    # --- consulta --------------------------------------------------------
+
+    def sugerir(self, prefixo, limite=LIMITE_SUGESTOES):
+        prefixo = _chave(prefixo)
+        if not prefixo:
+            return []
+        self.sincronizar()
+        with self._lock:
+            curto = len(prefixo) <= TAMANHO_PREFIXO_CURTO
+            melhores = self._curtos.get((prefixo, limite)) if curto else None
+            if melhores is None:
+                inicio = bisect.bisect_left(self._entradas, (prefixo,))
+                fim = bisect.bisect_left(self._entradas, (prefixo + _MAIOR,), lo=inicio)
+                origens = {origem for _, origem in self._entradas[inicio:fim]}
+                melhores = heapq.nlargest(limite, origens, key=lambda origem: (self._pesos.get(origem, 0), -origem[1]))
+                if curto:
+                    self._curtos[(prefixo, limite)] = melhores
+            return [dict(self._dados[origem]) for origem in melhores]
+
+
+def versao_taxonomia_atual():
+    versao = cache.get(CHAVE_VERSAO_TAXONOMIA)
+    if versao is None:
+        cache.add(CHAVE_VERSAO_TAXONOMIA, 0, timeout=None)
+        versao = cache.get(CHAVE_VERSAO_TAXONOMIA, 0)
+    return versao
+
+
+def registrar_alteracao_taxonomia(**kwargs):
+    """Tags ou categorias mudaram: os índices de sugestões as recarregam."""
+    try:
+        cache.incr(CHAVE_VERSAO_TAXONOMIA)
+    except ValueError:
+        cache.add(CHAVE_VERSAO_TAXONOMIA, 1, timeout=None)
+
+
+indice_sugestoes = IndiceSugestoes()
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..imagens import srcset
+
+register = template.Library()
+
+
+def _atributos(atributos):
+    return format_html_join('', ' {}="{}"', ((nome, valor) for nome, valor in atributos.items() if valor is not None))
+
+
+@register.simple_tag
+def imagem_responsiva(noticia, sizes='100vw', **atributos):
+    """``<img>`` da notícia com ``srcset``/``sizes`` das variantes (imagens.py).
+
+    Uso: ``{% imagem_responsiva noticia sizes="(max-width: 740px) 100vw, 740px" class="x" loading="lazy" %}``.
+    ``alt`` é o título se não for passado; ``class``, ``style``, ``loading`` etc. vão para o ``<img>``.
+    Com as variantes prontas sai um ``<picture>`` (WebP com JPEG de reserva) com
+    ``display: contents``, que não altera o layout; sem elas, o ``<img>`` do original.
+    """
+    imagem = getattr(noticia, 'imagem', None)
+    if not imagem:
+        return ''
+    atributos.setdefault('alt', noticia.titulo)
+    variantes = getattr(noticia, 'imagem_variantes', None) or {}
+    if not variantes.get('jpeg'):
+        return format_html('<img src="{}"{}>', imagem.url, _atributos(atributos))
+    return format_html(
+        '<picture style="display: contents">'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}>'
+        '</picture>',
+        srcset(variantes, 'webp'), sizes,
+        imagem.url, srcset(variantes, 'jpeg'), sizes, _atributos(atributos),
+    )
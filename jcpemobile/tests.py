@@ -1,23 +1,35 @@
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.utils import timezone
 import datetime
+from io import StringIO
+from unittest import mock
 from django.core.management import call_command
+from django.core.cache import cache
 
-from jcpemobile.models import Noticia, Visualizacao, NoticiaRankingDaily
+from jcpemobile.models import Noticia, Visualizacao, NoticiaRankingDaily, NoticiaRelacionada
+from jcpemobile.visualizacoes import BufferVisualizacoes
+from jcpemobile.ranking import RankingDeslizante, SpaceSaving, ranking_deslizante
+from jcpemobile.cardinalidade import HyperLogLog, atualizar_sketches
+from jcpemobile.pagina_inicial import (
+	carregar_secoes, chave_categorias, invalidar_pagina_inicial, obter_pagina_inicial, versoes_secoes,
+)
 
 
+@override_settings(VISUALIZACOES_SINCRONO=True, RANKING_SINCRONIZACAO_INTERVALO=0)
 class VisualizacaoAndRankingTests(TestCase):
 	def setUp(self):
+		ranking_deslizante.invalidar()
 		self.client = Client()
 		self.noticia = Noticia.objects.create(slug='t-noticia', titulo='T', conteudo='x')
 
 	def test_visualizacao_por_ip_por_dia(self):
 		# mesmo IP no mesmo dia não gera visualização duplicada
-		resp1 = self.client.get(f'/noticias/{self.noticia.slug}/?fake_ip=1.2.3.4')
-		resp2 = self.client.get(f'/noticias/{self.noticia.slug}/?fake_ip=1.2.3.4')
-		self.assertEqual(200, resp1.status_code)
-		self.assertEqual(200, resp2.status_code)
-		self.assertEqual(1, Visualizacao.objects.filter(noticia=self.noticia, ip_usuario='1.2.3.4').count())
+		url = f'/api/noticias/{self.noticia.id}/visualizacao/?fake_ip=1.2.3.4'
+		resp1 = self.client.post(url)
+		resp2 = self.client.post(url)
+		self.assertEqual(204, resp1.status_code)
+		self.assertEqual(204, resp2.status_code)
+		self.assertEqual(1, Visualizacao.objects.filter(noticia=self.noticia, ip_address='1.2.3.4').count())
 
 	def test_update_daily_ranking_sets_ranking(self):
 		# cria visualizacoes ontem para 2 noticias com diferentes IPs
@@ -27,9 +39,9 @@ class VisualizacaoAndRankingTests(TestCase):
 
 		# 3 views para noticia1
 		for i in range(3):
-			Visualizacao.objects.create(noticia=self.noticia, ip_usuario=f'10.0.0.{i}', data=dt)
+			Visualizacao.objects.create(noticia=self.noticia, ip_address=f'10.0.0.{i}', data=dt)
 		# 1 view para noticia2
-		Visualizacao.objects.create(noticia=other, ip_usuario='10.0.1.1', data=dt)
+		Visualizacao.objects.create(noticia=other, ip_address='10.0.1.1', data=dt)
 
 		# rodar comando
 		call_command('update_daily_ranking')
@@ -47,3 +59,1364 @@ class VisualizacaoAndRankingTests(TestCase):
 		n2 = Noticia.objects.get(id=other.id)
 		self.assertEqual(1, n1.daily_rank)
 		self.assertEqual(yesterday, n1.daily_rank_date)
+
+
+	def test_update_daily_ranking_e_idempotente(self):
+		yesterday = (timezone.now() - datetime.timedelta(days=1)).date()
+		Visualizacao.objects.create(noticia=self.noticia, ip_address='10.0.0.1', data=yesterday)
+		call_command('update_daily_ranking', stdout=StringIO())
+		call_command('update_daily_ranking', stdout=StringIO())
+		self.assertEqual(1, NoticiaRankingDaily.objects.filter(date=yesterday).count())
+
+	def test_recalcular_dia_limpa_quem_saiu_do_ranking(self):
+		other = Noticia.objects.create(slug='t-noticia-2', titulo='T2', conteudo='y')
+		yesterday = (timezone.now() - datetime.timedelta(days=1)).date()
+		Visualizacao.objects.create(noticia=self.noticia, ip_address='10.0.0.1', data=yesterday)
+		Visualizacao.objects.create(noticia=other, ip_address='10.0.0.2', data=yesterday)
+		call_command('update_daily_ranking', stdout=StringIO())
+		self.assertIsNotNone(Noticia.objects.get(id=other.id).daily_rank)
+
+		Visualizacao.objects.filter(noticia=other).delete()
+		call_command('update_daily_ranking', dia=[yesterday.isoformat()], stdout=StringIO())
+		self.assertEqual(
+			{self.noticia.id: (1, yesterday), other.id: (None, None)},
+			{n.id: (n.daily_rank, n.daily_rank_date) for n in Noticia.objects.all()},
+		)
+
+	def test_mais_lidas_soma_dias_consolidados_e_hoje(self):
+		other = Noticia.objects.create(slug='t-noticia-2', titulo='T2', conteudo='y')
+		hoje = timezone.now().date()
+		ontem = hoje - datetime.timedelta(days=1)
+		for i in range(3):
+			Visualizacao.objects.create(noticia=other, ip_address=f'10.0.0.{i}', data=ontem)
+		call_command('update_daily_ranking', stdout=StringIO())
+		Visualizacao.objects.create(noticia=self.noticia, ip_address='10.0.0.9', data=hoje)
+		Visualizacao.objects.create(noticia=other, ip_address='10.0.0.9', data=hoje)
+
+		resp = self.client.get('/mais-lidas/')
+		self.assertEqual(200, resp.status_code)
+		semana = resp.context['noticias_semana']
+		self.assertEqual([other, self.noticia], semana)
+		self.assertEqual(4, semana[0].visualizacoes_periodo)
+		self.assertEqual(2, len(resp.context['noticias_hoje']))
+
+class BufferVisualizacoesTests(TestCase):
+	def setUp(self):
+		self.noticia = Noticia.objects.create(slug='buffer', titulo='Buffer', conteudo='x')
+		self.buffer = BufferVisualizacoes(intervalo=3600)
+
+	def tearDown(self):
+		self.buffer.parar()
+
+	def test_deduplica_em_memoria_e_grava_em_lote(self):
+		self.assertTrue(self.buffer.registrar(self.noticia.id, '1.1.1.1'))
+		self.assertFalse(self.buffer.registrar(self.noticia.id, '1.1.1.1'))
+		self.assertTrue(self.buffer.registrar(self.noticia.id, '2.2.2.2'))
+		self.assertEqual(2, self.buffer.pendentes())
+		self.assertEqual(0, Visualizacao.objects.count())
+
+		with self.assertNumQueries(2):
+			self.assertEqual(2, self.buffer.flush())
+		self.assertEqual(2, Visualizacao.objects.filter(noticia=self.noticia).count())
+
+		# mesmo leitor depois do flush não volta ao banco
+		self.assertFalse(self.buffer.registrar(self.noticia.id, '1.1.1.1'))
+		self.assertEqual(0, self.buffer.pendentes())
+
+	def test_flush_descarta_noticia_inexistente_sem_perder_o_lote(self):
+		self.buffer.registrar(self.noticia.id, '1.1.1.1')
+		self.buffer.registrar(999999, '1.1.1.1')
+		self.assertEqual(2, self.buffer.flush())
+		self.assertEqual(0, self.buffer.pendentes())
+		self.assertEqual(1, Visualizacao.objects.count())
+
+	def test_flush_ignora_conflito_gravado_por_outro_processo(self):
+		hoje = timezone.now().date()
+		Visualizacao.objects.create(noticia=self.noticia, ip_address='3.3.3.3', data=hoje)
+		self.buffer.registrar(self.noticia.id, '3.3.3.3')
+		self.buffer.flush()
+		self.assertEqual(1, Visualizacao.objects.filter(noticia=self.noticia, ip_address='3.3.3.3').count())
+
+	def test_ouvintes_recebem_so_as_chaves_gravadas(self):
+		hoje = timezone.now().date()
+		Visualizacao.objects.create(noticia=self.noticia, ip_address='3.3.3.3', data=hoje)
+		recebidas = []
+		self.buffer.ao_gravar(recebidas.extend)
+		self.buffer.registrar(self.noticia.id, '3.3.3.3')
+		self.buffer.registrar(self.noticia.id, '4.4.4.4')
+		self.buffer.flush()
+		self.assertEqual([(self.noticia.id, '4.4.4.4', hoje)], recebidas)
+
+	@override_settings(VISUALIZACOES_SINCRONO=True)
+	def test_modo_sincrono_tambem_deduplica(self):
+		with mock.patch.object(self.buffer, '_gravar') as gravar:
+			self.assertTrue(self.buffer.registrar(self.noticia.id, '1.1.1.1'))
+			self.assertFalse(self.buffer.registrar(self.noticia.id, '1.1.1.1'))
+		self.assertEqual(1, gravar.call_count)
+
+	def test_ip_invalido_e_recusado_na_entrada(self):
+		self.assertFalse(self.buffer.registrar(self.noticia.id, 'nao-e-ip'))
+		self.assertTrue(self.buffer.registrar(self.noticia.id, '2001:DB8::0:1'))
+		self.assertFalse(self.buffer.registrar(self.noticia.id, '2001:db8::1'))
+		self.assertEqual(1, self.buffer.flush())
+		self.assertEqual(['2001:db8::1'], list(Visualizacao.objects.values_list('ip_address', flat=True)))
+
+	def test_lote_que_sempre_falha_e_descartado(self):
+		buffer = BufferVisualizacoes(intervalo=3600, max_falhas=2)
+		self.addCleanup(buffer.parar)
+		buffer.registrar(self.noticia.id, '1.1.1.1')
+		with mock.patch.object(buffer, '_gravar', side_effect=RuntimeError('banco fora do ar')):
+			with self.assertLogs('jcpemobile.visualizacoes', 'ERROR'):
+				buffer.flush()
+			self.assertEqual(1, buffer.pendentes())
+			with self.assertLogs('jcpemobile.visualizacoes', 'ERROR') as logs:
+				buffer.flush()
+		self.assertIn('descartando o lote', logs.output[0])
+		self.assertEqual(0, buffer.pendentes())
+		# Os seguintes voltam a ser gravados
+		buffer.registrar(self.noticia.id, '2.2.2.2')
+		self.assertEqual(1, buffer.flush())
+		self.assertEqual(1, Visualizacao.objects.count())
+
+
+class RankingDeslizanteTests(TestCase):
+	def setUp(self):
+		self.a = Noticia.objects.create(slug='a', titulo='A', conteudo='x')
+		self.b = Noticia.objects.create(slug='b', titulo='B', conteudo='x')
+		self.hoje = timezone.now().date()
+
+	def test_space_saving_mantem_heavy_hitters_com_memoria_limitada(self):
+		contador = SpaceSaving(capacidade=2)
+		for chave in ['a'] * 5 + ['b'] * 3 + ['c', 'd']:
+			contador.adicionar(chave)
+		self.assertEqual(2, len(contador))
+		self.assertEqual(5, contador.contagens['a'])
+
+	def test_virada_do_dia_soma_balde_novo_e_descarta_o_antigo(self):
+		antigo = self.hoje - datetime.timedelta(days=6)
+		NoticiaRankingDaily.objects.create(noticia=self.a, date=antigo, views=10, rank=1)
+		for i in range(3):
+			Visualizacao.objects.create(noticia=self.b, ip_address=f'10.0.0.{i}', data=self.hoje)
+
+		ranking = RankingDeslizante()
+		self.assertEqual([(self.a.id, 10), (self.b.id, 3)], ranking.top('semana'))
+		self.assertEqual([(self.b.id, 3)], ranking.top('hoje'))
+
+		amanha = self.hoje + datetime.timedelta(days=1)
+		with mock.patch('jcpemobile.ranking.timezone.now', return_value=timezone.now() + datetime.timedelta(days=1)):
+			with self.assertNumQueries(3):
+				# balde de ontem (ranking + bruto) e ressincronização do novo dia
+				self.assertEqual([(self.b.id, 3)], ranking.top('semana'))
+			self.assertEqual([], ranking.top('hoje'))
+		self.assertEqual(amanha, ranking._dia)
+
+
+class HyperLogLogTests(TestCase):
+	def test_estimativa_e_mescla(self):
+		manha, tarde = HyperLogLog(), HyperLogLog()
+		for i in range(3000):
+			manha.adicionar(f'10.0.{i // 256}.{i % 256}')
+		for i in range(2000, 5000):
+			tarde.adicionar(f'10.0.{i // 256}.{i % 256}')
+		self.assertEqual(4096, len(manha.para_bytes()))
+		self.assertAlmostEqual(3000, manha.estimar(), delta=150)
+		self.assertAlmostEqual(5000, manha.mesclar(tarde).estimar(), delta=250)
+
+	def test_noticia_estima_unicos_sem_ler_visualizacoes(self):
+		noticia = Noticia.objects.create(slug='hll', titulo='HLL', conteudo='x')
+		hoje = timezone.now().date()
+		ontem = hoje - datetime.timedelta(days=1)
+		atualizar_sketches([(noticia.id, f'1.1.1.{i}', hoje) for i in range(40)])
+		atualizar_sketches([(noticia.id, f'1.1.1.{i}', ontem) for i in range(20, 60)])
+
+		with self.assertNumQueries(1):
+			self.assertAlmostEqual(40, noticia.visualizacoes_do_dia(), delta=3)
+		self.assertAlmostEqual(60, noticia.visitantes_unicos(dias=7), delta=3)
+		self.assertEqual(0, noticia.visualizacoes_do_dia(exato=True))
+
+	def test_reconstruir_sketches_a_partir_das_visualizacoes(self):
+		from io import StringIO
+		from django.core.management import call_command
+		noticia = Noticia.objects.create(slug='hll-antigo', titulo='HLL', conteudo='x')
+		hoje = timezone.now().date()
+		ontem = hoje - datetime.timedelta(days=1)
+		Visualizacao.objects.bulk_create(
+			[Visualizacao(noticia=noticia, ip_address=f'2.2.2.{i}', data=ontem) for i in range(30)]
+		)
+		self.assertEqual(0, noticia.visitantes_unicos(dias=2))
+		call_command('reconstruir_sketches', lote=7, stdout=StringIO())
+		# Repetir não conta os mesmos IPs de novo
+		call_command('reconstruir_sketches', desde=str(ontem), stdout=StringIO())
+		self.assertAlmostEqual(30, noticia.visitantes_unicos(dias=2), delta=2)
+
+	def test_compactacao_poda_sketches_antigos(self):
+		from io import StringIO
+		from django.core.management import call_command
+		from jcpemobile.models import SketchVisitantesDiario
+		noticia = Noticia.objects.create(slug='hll-poda', titulo='HLL', conteudo='x')
+		hoje = timezone.now().date()
+		atualizar_sketches([(noticia.id, '1.1.1.1', hoje - datetime.timedelta(days=dias)) for dias in (0, 10, 40)])
+		call_command('compactar_visualizacoes', retencao_sketches_dias=30, stdout=StringIO())
+		self.assertEqual(
+			[hoje - datetime.timedelta(days=10), hoje],
+			list(SketchVisitantesDiario.objects.order_by('data').values_list('data', flat=True)),
+		)
+
+
+class CompactacaoVisualizacoesTests(TestCase):
+	def test_compacta_em_lotes_preservando_totais(self):
+		noticia = Noticia.objects.create(slug='antiga', titulo='Antiga', conteudo='x')
+		hoje = timezone.now().date()
+		antigo = hoje - datetime.timedelta(days=100)
+		for i in range(5):
+			Visualizacao.objects.create(noticia=noticia, ip_address=f'10.0.0.{i}', data=antigo)
+		Visualizacao.objects.create(noticia=noticia, ip_address='10.0.0.1', data=hoje)
+		self.assertEqual(6, noticia.total_visualizacoes())
+
+		call_command('compactar_visualizacoes', retencao_dias=30, lote=2, stdout=StringIO())
+		call_command('compactar_visualizacoes', retencao_dias=30, lote=2, stdout=StringIO())
+
+		noticia.refresh_from_db()
+		self.assertEqual(1, Visualizacao.objects.count())
+		self.assertEqual(5, noticia.visualizacoes_arquivadas)
+		self.assertEqual(6, noticia.total_visualizacoes())
+		self.assertEqual(5, NoticiaRankingDaily.objects.get(noticia=noticia, date=antigo).views)
+
+		# recalcular um dia já compactado não apaga o ranking consolidado
+		call_command('update_daily_ranking', dia=[antigo.isoformat()], stdout=StringIO())
+		self.assertTrue(NoticiaRankingDaily.objects.filter(noticia=noticia, date=antigo).exists())
+
+	def test_save_da_instancia_antiga_nao_apaga_o_arquivado(self):
+		from django.db.models import F
+
+		noticia = Noticia.objects.create(slug='editada', titulo='Editada', conteudo='x')
+		editor = Noticia.objects.get(pk=noticia.pk)
+		# A compactação arquiva um lote enquanto o editor está com a página aberta
+		Noticia.objects.filter(pk=noticia.pk).update(
+			visualizacoes_arquivadas=F('visualizacoes_arquivadas') + 5, daily_rank=2,
+		)
+		editor.titulo = 'Editada de novo'
+		editor.save()
+
+		noticia.refresh_from_db()
+		self.assertEqual('Editada de novo', noticia.titulo)
+		self.assertEqual((5, 2), (noticia.visualizacoes_arquivadas, noticia.daily_rank))
+
+
+class PaginaInicialTests(TestCase):
+	def setUp(self):
+		cache.clear()
+
+	def test_secoes_em_uma_consulta_com_limite_por_secao(self):
+		for i in range(8):
+			Noticia.objects.create(slug=f'dia-{i}', titulo=f'Dia {i}', conteudo='x', secao='noticia_do_dia')
+			Noticia.objects.create(slug=f'pe-{i}', titulo=f'PE {i}', conteudo='x', secao='pernambuco')
+
+		with self.assertNumQueries(1):
+			secoes = carregar_secoes()
+			self.assertEqual(4, len(secoes['noticias_do_dia']))
+			self.assertEqual(6, len(secoes['noticias_pernambuco']))
+			self.assertEqual([], secoes['noticias_jc360'])
+			self.assertEqual('pe-7', secoes['noticias_pernambuco'][0].slug)
+
+	def test_index_renderiza_com_consultas_constantes(self):
+		for i in range(10):
+			Noticia.objects.create(slug=f'n-{i}', titulo=f'N {i}', conteudo='x', secao='jc360')
+		with self.assertNumQueries(2):
+			resp = self.client.get('/')
+		self.assertEqual(200, resp.status_code)
+		self.assertEqual(6, len(resp.context['noticias_jc360']))
+
+
+	def test_cache_por_categorias_invalidado_ao_salvar_noticia(self):
+		noticia = Noticia.objects.create(slug='c-1', titulo='C 1', conteudo='x', secao='jc360')
+		self.client.get('/')
+		with self.assertNumQueries(0):
+			resp = self.client.get('/')
+		self.assertEqual([noticia], resp.context['noticias_jc360'])
+		# mesmo conjunto de categorias em outra ordem usa a mesma chave
+		self.assertEqual(chave_categorias(['b', 'a']), chave_categorias(['a', 'b', 'a']))
+
+		outra = Noticia.objects.create(slug='c-2', titulo='C 2', conteudo='x', secao='jc360')
+		resp = self.client.get('/')
+		self.assertEqual([outra, noticia], resp.context['noticias_jc360'])
+
+	def test_entrada_vencida_servida_enquanto_outro_processo_recalcula(self):
+		obter_pagina_inicial()
+		invalidar_pagina_inicial()
+		chave = f'pagina_inicial:{timezone.localdate()}:todas'
+		cache.add(f'{chave}:trava', 1)
+		with self.assertNumQueries(0):
+			self.assertIn('noticias_jc360', obter_pagina_inicial())
+
+	def test_categorias_com_caixa_diferente_filtram_igual_a_chave(self):
+		from jcpemobile.models import Categoria
+		esportes = Categoria.objects.create(nome='Esportes')
+		noticia = Noticia.objects.create(slug='e-1', titulo='E 1', conteudo='x', secao='jc360', categoria=esportes)
+		self.assertEqual([noticia], obter_pagina_inicial([' Esportes '])['noticias_jc360'])
+		self.assertEqual([noticia], obter_pagina_inicial(['esportes'])['noticias_jc360'])
+
+
+	def test_fragmento_da_secao_renovado_apenas_quando_a_secao_muda(self):
+		noticia = Noticia.objects.create(slug='f-1', titulo='Titulo Original', conteudo='x', secao='pernambuco')
+		self.assertContains(self.client.get('/'), 'Titulo Original')
+		versoes = versoes_secoes()
+
+		noticia.titulo = 'Titulo Novo'
+		noticia.save()
+		novas = versoes_secoes()
+		self.assertNotEqual(versoes['pernambuco'], novas['pernambuco'])
+		self.assertEqual(versoes['jc360'], novas['jc360'])
+		self.assertContains(self.client.get('/'), 'Titulo Novo')
+
+		noticia.secao = 'jc360'
+		noticia.save()
+		self.assertNotEqual(novas['pernambuco'], versoes_secoes()['pernambuco'])
+		self.assertNotEqual(novas['jc360'], versoes_secoes()['jc360'])
+
+
+class PaginaNoticiaTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		self.noticia = Noticia.objects.create(slug='viral', titulo='Notícia viral', conteudo='x')
+
+	def test_pagina_anonima_servida_do_cache_ate_a_noticia_mudar(self):
+		self.assertContains(self.client.get('/viral/'), 'Notícia viral')
+		with self.assertNumQueries(0):
+			resp = self.client.get('/viral/')
+		self.assertContains(resp, 'Notícia viral')
+		self.assertEqual(0, Visualizacao.objects.count())
+
+		self.noticia.titulo = 'Notícia atualizada'
+		self.noticia.save()
+		self.assertContains(self.client.get('/viral/'), 'Notícia atualizada')
+
+	def test_estado_do_leitor_vem_por_json(self):
+		from django.contrib.auth.models import User
+		from jcpemobile.models import Enquete, NoticaSalva, Opcao, Voto
+		from jcpemobile.votos import buffer_votos
+		buffer_votos.invalidar()
+		usuario = User.objects.create_user('leitor', password='senha-segura-123')
+		NoticaSalva.objects.create(usuario=usuario, noticia=self.noticia)
+		enquete = Enquete.objects.create(titulo='E', pergunta='P?', noticia=self.noticia)
+		Voto.objects.create(opcao=Opcao.objects.create(enquete=enquete, texto='Sim'), ip_usuario='5.5.5.5')
+
+		self.client.force_login(usuario)
+		dados = self.client.get(f'/api/noticias/{self.noticia.id}/estado/?fake_ip=5.5.5.5').json()
+		self.assertTrue(dados['salva'])
+		self.assertEqual({'id': enquete.id, 'ja_votou': True}, dados['enquete'])
+
+
+@override_settings(RELACIONADAS_SINCRONO=True)
+class NoticiasRelacionadasTests(TestCase):
+	def setUp(self):
+		cache.clear()
+		from jcpemobile.models import Categoria, Tag
+		self.politica = Categoria.objects.create(nome='Política')
+		self.esportes = Categoria.objects.create(nome='Esportes')
+		self.eleicoes, self.recife = Tag.objects.create(nome='Eleições'), Tag.objects.create(nome='Recife')
+		with self.captureOnCommitCallbacks(execute=True):
+			self.base = Noticia.objects.create(slug='base', titulo='Base', conteudo='x', categoria=self.politica)
+			self.base.tags.set([self.eleicoes, self.recife])
+			self.duas_tags = Noticia.objects.create(slug='duas', titulo='Duas', conteudo='x', categoria=self.esportes)
+			self.duas_tags.tags.set([self.eleicoes, self.recife])
+			self.categoria = Noticia.objects.create(slug='cat', titulo='Cat', conteudo='x', categoria=self.politica)
+			self.solta = Noticia.objects.create(slug='solta', titulo='Solta', conteudo='x', categoria=self.esportes)
+
+	def test_pontuacao_pesa_tags_categoria_e_recencia(self):
+		ids = list(self.base.relacionadas_calculadas.values_list('relacionada_id', flat=True))
+		self.assertEqual([self.duas_tags.id, self.categoria.id], ids)
+		# a notícia nova também entrou na linha do tempo das vizinhas
+		self.assertIn(self.base.id, self.categoria.relacionadas_calculadas.values_list('relacionada_id', flat=True))
+
+	def test_comando_em_lote_igual_ao_calculo_incremental(self):
+		antes = sorted(NoticiaRelacionada.objects.values_list('noticia_id', 'relacionada_id', 'posicao'))
+		call_command('atualizar_relacionadas', stdout=StringIO())
+		self.assertEqual(antes, sorted(NoticiaRelacionada.objects.values_list('noticia_id', 'relacionada_id', 'posicao')))
+
+	def test_pagina_le_relacionadas_prontas(self):
+		resp = self.client.get('/base/')
+		self.assertEqual([self.duas_tags, self.categoria], resp.context['noticias_relacionadas'])
+
+	def test_recalculo_fica_para_depois_do_commit(self):
+		with self.captureOnCommitCallbacks(execute=False) as callbacks:
+			nova = Noticia.objects.create(slug='nova', titulo='Nova', conteudo='x', categoria=self.politica)
+		self.assertFalse(nova.relacionadas_calculadas.exists())
+		# Sem relacionadas calculadas, a página mostra as mais recentes da categoria
+		resp = self.client.get('/nova/')
+		self.assertEqual([self.categoria, self.base], resp.context['noticias_relacionadas'])
+		for callback in callbacks:
+			callback()
+		self.assertTrue(nova.relacionadas_calculadas.exists())
+
+	def test_limpar_noticias_da_tag_recalcula_as_afetadas(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			self.eleicoes.noticias.clear()
+			self.recife.noticias.clear()
+		ids = list(self.base.relacionadas_calculadas.values_list('relacionada_id', flat=True))
+		self.assertEqual([self.categoria.id], ids)
+
+
+class FeedNeelsTests(TestCase):
+	def setUp(self):
+		Noticia.objects.bulk_create([
+			Noticia(slug=f'feed-{i}', titulo=f'Feed {i}', conteudo='x') for i in range(15)
+		])
+		# Metade com a mesma data: o id desempata sem repetir nem pular notícias
+		agora = timezone.now()
+		ids = list(Noticia.objects.order_by('id').values_list('id', flat=True))
+		Noticia.objects.filter(id__in=ids[:8]).update(data_publicacao=agora - datetime.timedelta(days=1))
+		Noticia.objects.filter(id__in=ids[8:]).update(data_publicacao=agora)
+
+	def test_cursor_percorre_o_acervo_na_ordem_sem_repetir(self):
+		esperado = list(Noticia.objects.order_by('-data_publicacao', '-id').values_list('slug', flat=True))
+		vistos, cursor = [], ''
+		while True:
+			with self.assertNumQueries(1):
+				resp = self.client.get('/api/neels/', {'cursor': cursor, 'limite': 4})
+			dados = resp.json()
+			self.assertLessEqual(len(dados['noticias']), 4)
+			vistos += [noticia['slug'] for noticia in dados['noticias']]
+			cursor = dados['proximo_cursor']
+			if not cursor:
+				break
+		self.assertEqual(esperado, vistos)
+
+	def test_pagina_renderiza_so_a_primeira_tela(self):
+		resp = self.client.get('/neels/')
+		self.assertEqual(200, resp.status_code)
+		self.assertEqual(6, len(resp.context['noticias']))
+		self.assertTrue(resp.context['proximo_cursor'])
+		self.assertContains(resp, 'neels-sentinela')
+
+	def test_cursor_invalido(self):
+		resp = self.client.get('/api/neels/', {'cursor': 'lixo'})
+		self.assertEqual(400, resp.status_code)
+
+
+class LinhaDoTempoTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Categoria, Tag
+		self.esporte = Categoria.objects.create(nome='Esporte', slug='esporte')
+		self.tag = Tag.objects.create(nome='copa')
+		datas = [(2024, 1), (2024, 1), (2024, 3), (2025, 2)]
+		for i, (ano, mes) in enumerate(datas):
+			noticia = Noticia.objects.create(
+				slug=f'lt-{i}', titulo=f'LT {i}', conteudo='x',
+				categoria=self.esporte if i % 2 == 0 else None,
+			)
+			Noticia.objects.filter(pk=noticia.pk).update(
+				data_publicacao=timezone.make_aware(datetime.datetime(ano, mes, 10 + i))
+			)
+			if i < 2:
+				noticia.tags.add(self.tag)
+
+	def test_esqueleto_agregado_no_banco(self):
+		# esqueleto + categorias e tags dos filtros, sem ler notícias
+		with self.assertNumQueries(3):
+			resp = self.client.get('/linha-do-tempo/')
+			timeline = resp.context['timeline']
+			self.assertEqual([2025, 2024], [ano['ano'] for ano in timeline])
+			self.assertEqual([(3, 1), (1, 2)], [(mes['numero'], mes['total']) for mes in timeline[1]['meses']])
+
+	def test_filtros_no_servidor(self):
+		resp = self.client.get('/linha-do-tempo/', {'categoria': 'esporte'})
+		self.assertEqual(2, sum(ano['total'] for ano in resp.context['timeline']))
+		resp = self.client.get('/api/linha-do-tempo/2024/1/', {'tag': 'copa'})
+		self.assertEqual(['lt-1', 'lt-0'], [noticia['slug'] for noticia in resp.json()['noticias']])
+
+	def test_mes_paginado(self):
+		resp = self.client.get('/api/linha-do-tempo/2024/1/', {'limite': 1})
+		dados = resp.json()
+		self.assertEqual(['lt-1'], [noticia['slug'] for noticia in dados['noticias']])
+		self.assertEqual(['copa'], dados['noticias'][0]['tags'])
+		dados = self.client.get('/api/linha-do-tempo/2024/1/', {'limite': 1, 'cursor': dados['proximo_cursor']}).json()
+		self.assertEqual(['lt-0'], [noticia['slug'] for noticia in dados['noticias']])
+		self.assertIsNone(dados['proximo_cursor'])
+		self.assertEqual(404, self.client.get('/api/linha-do-tempo/2024/13/').status_code)
+		self.assertEqual(404, self.client.get('/api/linha-do-tempo/0/1/').status_code)
+		self.assertEqual(404, self.client.get('/api/linha-do-tempo/9999/12/').status_code)
+		self.assertEqual(200, self.client.get('/api/linha-do-tempo/9998/12/').status_code)
+
+
+@override_settings(PAINEL_NOTICIAS_POR_PAGINA=5)
+class PainelAdministrativoTests(TestCase):
+	def setUp(self):
+		from django.contrib.auth.models import User
+		from jcpemobile.models import Autor, Categoria
+		cache.clear()
+		self.client.force_login(User.objects.create_user('editor', password='senha-segura-123', is_staff=True))
+		self.esporte = Categoria.objects.create(nome='Esporte', slug='esporte')
+		self.autor = Autor.objects.create(nome='Ana')
+		for i in range(12):
+			Noticia.objects.create(
+				slug=f'painel-{i}', titulo=f'Painel {i}', conteudo='x',
+				categoria=self.esporte if i < 3 else None, autor=self.autor, secao='jc360',
+			)
+
+	def test_paginado_e_filtrado_no_servidor(self):
+		resp = self.client.get('/painel/')
+		self.assertEqual(5, len(resp.context['noticias']))
+		self.assertEqual(3, resp.context['pagina'].paginator.num_pages)
+
+		resp = self.client.get('/painel/', {'categoria': self.esporte.id, 'q': 'painel 1'})
+		self.assertEqual(['painel-1'], [noticia.slug for noticia in resp.context['noticias']])
+		resp = self.client.get('/painel/', {'secao': 'pernambuco'})
+		self.assertEqual(0, resp.context['pagina'].paginator.count)
+
+	def test_estatisticas_vem_do_retrato_em_cache(self):
+		resp = self.client.get('/painel/')
+		self.assertEqual(12, resp.context['total_noticias'])
+
+		Noticia.objects.create(slug='nova', titulo='Nova', conteudo='x')
+		# Retrato ainda válido: nenhum count() dos totais, o valor é o do retrato
+		with mock.patch('jcpemobile.estatisticas.calcular_estatisticas') as calcular:
+			resp = self.client.get('/painel/')
+		calcular.assert_not_called()
+		self.assertEqual(12, resp.context['total_noticias'])
+
+	@override_settings(ESTATISTICAS_CACHE_TTL=0)
+	def test_retrato_vencido_atualizado_em_segundo_plano(self):
+		from jcpemobile import estatisticas
+		self.client.get('/painel/')
+		with mock.patch.object(estatisticas.threading, 'Thread') as thread:
+			resp = self.client.get('/painel/')
+			self.client.get('/painel/')
+		# Serve o retrato anterior e só um acesso dispara a atualização
+		self.assertEqual(12, resp.context['total_noticias'])
+		thread.assert_called_once()
+		thread.return_value.start.assert_called_once()
+
+
+class SerializacaoNoticiasTests(TestCase):
+	def setUp(self):
+		from jcpemobile.trigramas import indice_trigramas
+		cache.clear()
+		indice_trigramas.invalidar()
+
+	def criar_noticias(self, quantidade, inicio=0):
+		from jcpemobile.models import Autor, Categoria, Tag
+		categoria, _ = Categoria.objects.get_or_create(nome='Esporte', slug='esporte')
+		autor, _ = Autor.objects.get_or_create(nome='Ana')
+		tags = [Tag.objects.get_or_create(nome=nome)[0] for nome in ('copa', 'gol')]
+		for i in range(inicio, inicio + quantidade):
+			noticia = Noticia.objects.create(
+				slug=f'ser-{i}', titulo=f'Ser {i}', conteudo='x', categoria=categoria, autor=autor,
+			)
+			noticia.tags.set(tags)
+
+	def test_consultas_constantes_qualquer_que_seja_o_tamanho(self):
+		self.criar_noticias(3)
+		with self.assertNumQueries(2):
+			poucas = self.client.get('/api/noticias/').json()['noticias']
+		self.criar_noticias(30, inicio=3)
+		# Nomes de tags resolvidos pelo índice de trigramas, carregado uma vez
+		self.client.get('/api/noticias/', {'tags': 'copa', 'fields': 'id'})
+		with self.assertNumQueries(2):
+			muitas = self.client.get('/api/noticias/', {'tags': 'copa,gol'}).json()['noticias']
+		self.assertEqual(3, len(poucas))
+		self.assertEqual(33, len(muitas))
+		self.assertEqual(['copa', 'gol'], muitas[0]['tags'])
+		self.assertEqual('Esporte', muitas[0]['categoria'])
+
+	def test_fields_limita_colunas_e_dispensa_tags(self):
+		self.criar_noticias(5)
+		with self.assertNumQueries(1):
+			noticias = self.client.get('/api/noticias/', {'fields': 'id,titulo,slug'}).json()['noticias']
+		self.assertEqual({'id', 'titulo', 'slug'}, set(noticias[0]))
+		self.assertEqual(400, self.client.get('/api/noticias/', {'fields': 'id,senha'}).status_code)
+
+
+class SincronizacaoSalvosTests(TestCase):
+	def setUp(self):
+		from django.contrib.auth.models import User
+		self.usuario = User.objects.create_user('leitor', password='senha-segura-123')
+		self.client.force_login(self.usuario)
+		Noticia.objects.bulk_create([
+			Noticia(slug=f'salva-{i}', titulo=f'Salva {i}', conteudo='x') for i in range(60)
+		])
+		self.ids = list(Noticia.objects.order_by('id').values_list('id', flat=True))
+
+	def sincronizar(self, **dados):
+		import json
+		return self.client.post('/api/salvos/sincronizar/', json.dumps(dados), content_type='application/json')
+
+	def test_lote_em_uma_requisicao_com_consultas_constantes(self):
+		from jcpemobile.models import NoticaSalva
+		NoticaSalva.objects.create(usuario=self.usuario, noticia_id=self.ids[0])
+		# sessão + usuário, validação dos ids, insert, delete e a lista final
+		with self.assertNumQueries(6):
+			resp = self.sincronizar(adicionar=self.ids[1:51] + [999999], remover=[self.ids[0]])
+		dados = resp.json()
+		self.assertEqual(set(self.ids[1:51]), set(dados['salvos']))
+		self.assertEqual(50, len(dados['noticias']))
+		self.assertEqual({'id', 'titulo', 'slug', 'resumo', 'imagem', 'categoria', 'data_publicacao'}, set(dados['noticias'][0]))
+
+		# Reenviar os mesmos ids não duplica nada
+		resp = self.sincronizar(adicionar=self.ids[1:51], fields='id')
+		self.assertEqual(50, NoticaSalva.objects.filter(usuario=self.usuario).count())
+		self.assertEqual([{'id': resp.json()['salvos'][0]}], resp.json()['noticias'][:1])
+
+	def test_requisicao_invalida(self):
+		self.assertEqual(400, self.sincronizar(adicionar=self.ids, remover=list(range(1000, 1500))).status_code)
+		resp = self.client.post('/api/salvos/sincronizar/', 'nao-e-json', content_type='application/json')
+		self.assertEqual(400, resp.status_code)
+
+	def test_get_so_le_a_lista(self):
+		from jcpemobile.models import NoticaSalva
+		NoticaSalva.objects.create(usuario=self.usuario, noticia_id=self.ids[0])
+		with mock.patch.object(NoticaSalva.objects, 'bulk_create') as bulk_create:
+			resp = self.client.get('/api/salvos/sincronizar/', {'fields': 'id'})
+		bulk_create.assert_not_called()
+		self.assertEqual([self.ids[0]], resp.json()['salvos'])
+		self.assertIn('private', resp['Cache-Control'])
+
+	def test_login_avisa_o_script_para_sincronizar_uma_vez(self):
+		self.client.logout()
+		self.usuario.email = 'leitor@example.com'
+		self.usuario.save()
+		resp = self.client.post('/login/', {'email': 'leitor@example.com', 'senha': 'senha-segura-123'})
+		self.assertEqual(302, resp.status_code)
+		self.assertEqual('1', resp.cookies['salvos_apos_login'].value)
+
+
+@override_settings(RELACIONADAS_SINCRONO=True)
+class BuscaTests(TestCase):
+	def setUp(self):
+		from jcpemobile.busca import indice_busca
+		from jcpemobile.models import Categoria, Tag
+		from jcpemobile.trigramas import indice_trigramas
+		cache.clear()
+		indice_busca.invalidar()
+		indice_trigramas.invalidar()
+		self.politica = Categoria.objects.create(nome='Política', slug='politica')
+		self.tag = Tag.objects.create(nome='eleicoes')
+		self.eleicao = Noticia.objects.create(
+			slug='eleicao', titulo='Eleição municipal no Recife', conteudo='Candidatos debatem propostas.',
+			categoria=self.politica,
+		)
+		self.eleicao.tags.add(self.tag)
+		Noticia.objects.create(slug='futebol', titulo='Sport vence clássico', conteudo='As eleições do clube ficam para depois.')
+		Noticia.objects.create(slug='receita', titulo='Receita de bolo', conteudo='Farinha, ovos e açúcar.')
+
+	def buscar(self, **params):
+		return self.client.get('/api/busca/', params).json()
+
+	def test_normaliza_acentos_e_radicais(self):
+		from jcpemobile.busca import termos
+		self.assertEqual(termos('Eleições'), termos('eleicao'))
+		self.assertEqual(termos('políticas'), termos('POLITICO'))
+		self.assertEqual([], termos('de da do'))
+
+	def test_ranking_bm25_com_filtros(self):
+		dados = self.buscar(q='eleicoes')
+		# O termo no título pesa mais que no conteúdo
+		self.assertEqual(['eleicao', 'futebol'], [noticia['slug'] for noticia in dados['resultados']])
+		self.assertEqual(2, dados['total'])
+		self.assertEqual(['eleicao'], [noticia['slug'] for noticia in self.buscar(q='eleicoes', categoria='politica')['resultados']])
+		self.assertEqual(['eleicao'], [noticia['slug'] for noticia in self.buscar(q='eleicoes', tag='eleicoes')['resultados']])
+		self.assertEqual([], self.buscar(q='eleicoes', categoria='inexistente')['resultados'])
+		# Dígitos que int() não aceita são tratados como nome de tag
+		resposta = self.client.get('/api/busca/', {'q': 'eleicoes', 'tag': '²'})
+		self.assertEqual(200, resposta.status_code)
+		self.assertEqual([], resposta.json()['resultados'])
+
+	def test_indice_atualizado_por_sinais_sem_reconstruir(self):
+		from jcpemobile.busca import indice_busca
+		self.buscar(q='bolo')
+		with mock.patch.object(indice_busca, 'carregar') as carregar:
+			with self.captureOnCommitCallbacks(execute=True):
+				Noticia.objects.create(slug='bolo-fuba', titulo='Bolo de fubá', conteudo='x')
+				Noticia.objects.filter(slug='receita').delete()
+			slugs = [noticia['slug'] for noticia in self.buscar(q='bolos')['resultados']]
+		carregar.assert_not_called()
+		self.assertEqual(['bolo-fuba'], slugs)
+
+	def test_busca_nao_consulta_a_tabela_por_termo(self):
+		self.buscar(q='recife')
+		# Índice já carregado: só a leitura dos resultados encontrados
+		with self.assertNumQueries(1):
+			dados = self.buscar(q='recife', fields='id,slug')
+		self.assertEqual([{'id': self.eleicao.id, 'slug': 'eleicao', 'score': dados['resultados'][0]['score']}], dados['resultados'])
+
+
+@override_settings(
+	VISUALIZACOES_SINCRONO=True, RANKING_SINCRONIZACAO_INTERVALO=0, SUGESTOES_PESOS_INTERVALO=0,
+	RELACIONADAS_SINCRONO=True,
+)
+class SugestoesTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Categoria, Tag
+		from jcpemobile.sugestoes import indice_sugestoes
+		cache.clear()
+		indice_sugestoes.invalidar()
+		ranking_deslizante.invalidar()
+		self.categoria = Categoria.objects.create(nome='Educação', slug='educacao')
+		Tag.objects.create(nome='Eleições 2024')
+		self.popular = Noticia.objects.create(slug='eleicao-recife', titulo='Eleição no Recife tem segundo turno', conteudo='x')
+		Noticia.objects.create(slug='eleicao-olinda', titulo='Eleição em Olinda', conteudo='x')
+
+	def sugerir(self, q):
+		return self.client.get('/api/busca/sugestoes/', {'q': q})
+
+	def test_prefixo_sem_acento_em_titulos_tags_e_categorias(self):
+		textos = [s['texto'] for s in self.sugerir('ele').json()['sugestoes']]
+		self.assertEqual({'Eleição no Recife tem segundo turno', 'Eleição em Olinda', 'Eleições 2024'}, set(textos))
+		# Palavras no meio do título também são prefixo
+		self.assertEqual(['eleicao-recife'], [s['slug'] for s in self.sugerir('recif').json()['sugestoes']])
+		self.assertEqual([{'texto': 'Educação', 'tipo': 'categoria', 'slug': 'educacao'}], self.sugerir('EDUC').json()['sugestoes'])
+
+	def test_popularidade_ordena_e_resposta_cacheavel(self):
+		for i in range(3):
+			self.client.post(f'/api/noticias/{self.popular.id}/visualizacao/', REMOTE_ADDR=f'10.0.0.{i}')
+		resp = self.sugerir('eleicao')
+		self.assertEqual('eleicao-recife', resp.json()['sugestoes'][0]['slug'])
+		self.assertIn('public', resp['Cache-Control'])
+		self.assertIn('max-age=60', resp['Cache-Control'])
+		self.assertIn('max-age=300', self.sugerir('el')['Cache-Control'])
+
+	def test_mudancas_aplicadas_sem_reconstruir(self):
+		from jcpemobile.models import Tag
+		self.sugerir('x')
+		with self.captureOnCommitCallbacks(execute=True):
+			Noticia.objects.create(slug='xadrez', titulo='Xadrez escolar cresce', conteudo='x')
+			Tag.objects.create(nome='Xingu')
+			Noticia.objects.filter(slug='eleicao-olinda').delete()
+		with self.assertNumQueries(4):
+			# só as notícias alteradas, tags e categorias (taxonomia mudou) e os pesos
+			textos = {s['texto'] for s in self.sugerir('x').json()['sugestoes']}
+		self.assertEqual({'Xadrez escolar cresce', 'Xingu'}, textos)
+		self.assertEqual([], self.sugerir('olinda').json()['sugestoes'])
+
+	@override_settings(SUGESTOES_PESOS_INTERVALO=3600)
+	def test_prefixo_curto_nao_percorre_o_intervalo_a_cada_tecla(self):
+		from jcpemobile import sugestoes
+		primeira = self.sugerir('e').json()['sugestoes']
+		with mock.patch.object(sugestoes.heapq, 'nlargest', wraps=sugestoes.heapq.nlargest) as nlargest:
+			self.assertEqual(primeira, self.sugerir('e').json()['sugestoes'])
+			self.assertEqual(0, nlargest.call_count)
+			# Prefixos longos continuam calculados na hora
+			self.sugerir('ele')
+			self.assertEqual(1, nlargest.call_count)
+			with self.captureOnCommitCallbacks(execute=True):
+				Noticia.objects.create(slug='enchente', titulo='Enchente no Recife', conteudo='x')
+			self.assertIn('Enchente no Recife', [s['texto'] for s in self.sugerir('e').json()['sugestoes']])
+
+
+class BuscaBancoTests(TestCase):
+	def setUp(self):
+		self.eleicao = Noticia.objects.create(
+			slug='eleicao', titulo='Eleição municipal no Recife', conteudo='Candidatos debatem propostas.',
+		)
+		self.futebol = Noticia.objects.create(slug='futebol', titulo='Sport vence clássico', conteudo='A eleição do clube fica para depois.')
+		Noticia.objects.create(slug='receita', titulo='Receita de bolo', conteudo='Farinha, ovos e açúcar.')
+
+	def slugs(self, consulta):
+		from jcpemobile.busca_banco import buscar_noticias
+		return list(buscar_noticias(consulta).order_by('-relevancia').values_list('slug', flat=True))
+
+	def test_sem_acentos_por_prefixo_e_titulo_pesando_mais(self):
+		self.assertEqual(['eleicao', 'futebol'], self.slugs('eleicao'))
+		self.assertEqual(['eleicao'], self.slugs('municip recife'))
+		self.assertEqual([], self.slugs('"; DROP TABLE --'))
+
+	def test_indice_mantido_pelo_banco(self):
+		Noticia.objects.filter(slug='receita').update(titulo='Receita de torta')
+		self.futebol.delete()
+		Noticia.objects.create(slug='bolo', titulo='Bolo de fubá', conteudo='x')
+		self.assertEqual(['receita'], self.slugs('torta'))
+		self.assertEqual(['bolo'], self.slugs('bolo'))
+		self.assertEqual(['eleicao'], self.slugs('eleicao'))
+
+	def test_garantir_estrutura_recria_triggers(self):
+		from django.db import connection
+		from jcpemobile.busca_banco import TABELA_FTS, garantir_estrutura
+		with connection.cursor() as cursor:
+			cursor.execute(f'DROP TRIGGER {TABELA_FTS}_ai')
+		Noticia.objects.create(slug='perdida', titulo='Notícia sem trigger', conteudo='x')
+		self.assertEqual([], self.slugs('trigger'))
+		garantir_estrutura()
+		self.assertEqual(['perdida'], self.slugs('trigger'))
+
+	@override_settings(BUSCA_MOTOR='banco')
+	def test_api_publica_com_motor_do_banco(self):
+		dados = self.client.get('/api/busca/', {'q': 'eleição', 'fields': 'slug'}).json()
+		self.assertEqual(2, dados['total'])
+		self.assertEqual(['eleicao', 'futebol'], [noticia['slug'] for noticia in dados['resultados']])
+		self.assertIn('score', dados['resultados'][0])
+
+	def test_busca_do_admin(self):
+		from django.contrib.auth.models import User
+		self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+		resposta = self.client.get('/admin/jcpemobile/noticia/', {'q': 'clássico'})
+		self.assertEqual(1, resposta.context['cl'].result_count)
+		self.assertContains(resposta, 'Sport vence clássico')
+		# Mais relevante primeiro (a palavra no título pesa mais que no conteúdo)
+		resposta = self.client.get('/admin/jcpemobile/noticia/', {'q': 'eleição'})
+		self.assertEqual([self.eleicao, self.futebol], list(resposta.context['cl'].result_list))
+		Noticia.objects.filter(pk=self.eleicao.pk).update(data_publicacao=timezone.now() - datetime.timedelta(days=30))
+		resposta = self.client.get('/admin/jcpemobile/noticia/', {'q': 'eleição'})
+		self.assertEqual([self.eleicao, self.futebol], list(resposta.context['cl'].result_list))
+
+
+@override_settings(RELACIONADAS_SINCRONO=True)
+class TrigramasTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Categoria, Tag
+		from jcpemobile.trigramas import indice_trigramas
+		cache.clear()
+		indice_trigramas.invalidar()
+		self.brasileirao = Tag.objects.create(nome='Brasileirão')
+		self.petrobras = Tag.objects.create(nome='Petrobras')
+		Tag.objects.create(nome='Brasília')
+		Categoria.objects.create(nome='Política', slug='politica')
+		self.noticia = Noticia.objects.create(slug='jogo', titulo='Sport vence no Brasileirão', conteudo='x')
+		self.noticia.tags.add(self.brasileirao)
+		Noticia.objects.create(slug='outra', titulo='Outra', conteudo='x').tags.add(self.petrobras)
+
+	def test_trigramas_como_pg_trgm(self):
+		from jcpemobile.trigramas import trigramas
+		self.assertEqual({'  g', ' go', 'gol', 'ol '}, trigramas('Gol'))
+		self.assertEqual(trigramas('Brasileirão'), trigramas('BRASILEIRAO'))
+
+	def test_resolve_nomes_com_erros(self):
+		from jcpemobile.trigramas import indice_trigramas
+		resolvidas = indice_trigramas.resolver_tags(['brasileirao', 'Petrobrás', 'petrobas', 'xyz'])
+		self.assertEqual({
+			'brasileirao': self.brasileirao.id, 'Petrobrás': self.petrobras.id, 'petrobas': self.petrobras.id,
+		}, resolvidas)
+		# Com o índice carregado, resolver não consulta o banco
+		with self.assertNumQueries(0):
+			indice_trigramas.resolver_tags(['brasileirao'])
+
+	def test_filtro_por_nome_aproximado(self):
+		dados = self.client.get('/api/noticias/', {'tags': 'brasileirao', 'fields': 'slug'}).json()
+		self.assertEqual([{'slug': 'jogo'}], dados['noticias'])
+		self.assertEqual({'brasileirao': self.brasileirao.id}, dados['tags_resolvidas'])
+		dados = self.client.get('/api/noticias/', {'tags': 'brasileirao,petrobras', 'match': 'all', 'fields': 'slug'}).json()
+		self.assertEqual([], dados['noticias'])
+
+	def test_candidatos_ordenados_por_similaridade(self):
+		dados = self.client.get('/api/busca/aproximada/', {'q': 'brasileiro'}).json()
+		tags = [candidato['texto'] for candidato in dados['candidatos']['tag']]
+		self.assertEqual('Brasileirão', tags[0])
+		self.assertEqual(['Sport vence no Brasileirão'], [c['texto'] for c in dados['candidatos']['noticia']])
+		self.assertEqual(['Política'], [c['texto'] for c in self.client.get(
+			'/api/busca/aproximada/', {'q': 'politca', 'tipos': 'categoria'}).json()['candidatos']['categoria']])
+		self.assertEqual(400, self.client.get('/api/busca/aproximada/', {'q': 'x', 'tipos': 'autor'}).status_code)
+
+	def test_taxonomia_alterada_recarrega(self):
+		from jcpemobile.models import Tag
+		from jcpemobile.trigramas import indice_trigramas
+		self.assertEqual({}, indice_trigramas.resolver_tags(['carnaval']))
+		with self.captureOnCommitCallbacks(execute=True):
+			carnaval = Tag.objects.create(nome='Carnaval')
+		self.assertEqual({'carnval': carnaval.id}, indice_trigramas.resolver_tags(['carnval']))
+
+	def test_resolucao_rapida_com_milhares_de_tags(self):
+		import time
+		from jcpemobile.trigramas import IndiceTrigramas, _Indice
+		indice = IndiceTrigramas()
+		indice._indices['tag'] = tags = _Indice()
+		for i in range(5000):
+			tags.adicionar(i, f'tag {i} assunto {i * 7919 % 1000}')
+		tags.adicionar(5000, 'Brasileirão Série A')
+		with mock.patch.object(indice, 'sincronizar'):
+			inicio = time.perf_counter()
+			for _ in range(100):
+				resolvidas = indice.resolver_tags(['brasileirao seri a'])
+			media = (time.perf_counter() - inicio) / 100
+		self.assertEqual({'brasileirao seri a': 5000}, resolvidas)
+		self.assertLess(media, 0.001)
+
+
+class ContadoresVotosTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Enquete, Opcao
+		self.enquete = Enquete.objects.create(titulo='Enquete', pergunta='Quem vence?')
+		self.sim = Opcao.objects.create(enquete=self.enquete, texto='Sim')
+		self.nao = Opcao.objects.create(enquete=self.enquete, texto='Não')
+		self.talvez = Opcao.objects.create(enquete=self.enquete, texto='Talvez')
+
+	def votar(self, opcao, quantidade):
+		from jcpemobile.models import Voto
+		for i in range(quantidade):
+			Voto.objects.create(opcao=opcao, ip_usuario=f'10.0.{opcao.id}.{i}')
+
+	def test_contadores_acompanham_votos(self):
+		from jcpemobile.models import Voto
+		self.votar(self.sim, 3)
+		self.votar(self.nao, 1)
+		Voto.objects.filter(opcao=self.sim).first().delete()
+		self.sim.refresh_from_db()
+		self.nao.refresh_from_db()
+		self.assertEqual((2, 1), (self.sim.quantidade_votos, self.nao.quantidade_votos))
+		self.assertEqual(3, self.enquete.total_votos())
+
+	def test_resultados_em_uma_consulta(self):
+		from jcpemobile.enquetes import resultados_enquete
+		self.votar(self.sim, 3)
+		self.votar(self.nao, 1)
+		with self.assertNumQueries(1):
+			resultados = resultados_enquete(self.enquete.id)
+		self.assertEqual(4, resultados['total'])
+		self.assertEqual([75.0, 25.0, 0], [opcao['percentual'] for opcao in resultados['opcoes']])
+		dados = self.client.get(f'/api/enquetes/{self.enquete.id}/resultados/').json()
+		self.assertEqual([3, 1, 0], [opcao['votos'] for opcao in dados['opcoes']])
+
+	def test_save_da_opcao_nao_sobrescreve_o_contador(self):
+		from jcpemobile.models import Opcao
+		editada = Opcao.objects.get(id=self.sim.id)
+		self.votar(self.sim, 2)
+		editada.texto = 'Sim, claro'
+		editada.save()
+		self.assertEqual(('Sim, claro', 2), Opcao.objects.values_list('texto', 'quantidade_votos').get(id=self.sim.id))
+
+	def test_percentual_calcula_o_total_uma_vez(self):
+		from jcpemobile.models import Enquete
+		self.votar(self.sim, 3)
+		self.votar(self.nao, 1)
+		enquete = Enquete.objects.get(id=self.enquete.id)
+		with self.assertNumQueries(2):
+			percentuais = [opcao.percentual() for opcao in enquete.opcoes.all()]
+		self.assertEqual([75.0, 25.0, 0], percentuais)
+		self.assertEqual(404, self.client.get('/api/enquetes/999/resultados/').status_code)
+
+	def test_reconciliar_corrige_divergencias(self):
+		from jcpemobile.models import Opcao
+		self.votar(self.sim, 2)
+		Opcao.objects.filter(id=self.sim.id).update(quantidade_votos=7)
+		Opcao.objects.filter(id=self.talvez.id).update(quantidade_votos=1)
+		saida = StringIO()
+		call_command('reconciliar_votos', '--dry-run', stdout=saida)
+		self.assertIn('2 divergências encontradas', saida.getvalue())
+		self.assertEqual(7, Opcao.objects.get(id=self.sim.id).quantidade_votos)
+		call_command('reconciliar_votos', stdout=StringIO())
+		self.assertEqual([2, 0, 0], list(Opcao.objects.order_by('id').values_list('quantidade_votos', flat=True)))
+
+	def test_admin_lista_total_anotado(self):
+		from django.contrib.auth.models import User
+		from jcpemobile.models import Enquete
+		self.votar(self.sim, 2)
+		for i in range(5):
+			Enquete.objects.create(titulo=f'Outra {i}', pergunta='?')
+		self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'senha'))
+		url = '/admin/jcpemobile/enquete/'
+		self.client.get(url)
+		with self.assertNumQueries(5):
+			# sessão, usuário, contagem, contagem total e a listagem anotada
+			resposta = self.client.get(url)
+		self.assertContains(resposta, '<td class="field-total_votos">2</td>', html=True)
+
+
+class BufferVotosTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Enquete, Opcao
+		from jcpemobile.votos import BufferVotos
+		self.noticia = Noticia.objects.create(slug='com-enquete', titulo='Com enquete', conteudo='x')
+		self.enquete = Enquete.objects.create(titulo='Enquete', pergunta='Quem vence?', noticia=self.noticia)
+		self.sim = Opcao.objects.create(enquete=self.enquete, texto='Sim')
+		self.nao = Opcao.objects.create(enquete=self.enquete, texto='Não')
+		self.buffer = BufferVotos(intervalo=3600)
+
+	def tearDown(self):
+		self.buffer.parar()
+
+	def test_dedupe_em_memoria_e_gravacao_em_lote(self):
+		from jcpemobile.models import Opcao, Voto
+		from jcpemobile.votos import OpcaoInvalida
+		self.assertTrue(self.buffer.registrar(self.enquete.id, self.sim.id, '1.1.1.1'))
+		# Carregada a enquete, votar e conferir não consultam o banco
+		with self.assertNumQueries(0):
+			self.assertFalse(self.buffer.registrar(self.enquete.id, self.nao.id, '1.1.1.1'))
+			self.assertTrue(self.buffer.registrar(self.enquete.id, self.nao.id, '2.2.2.2'))
+			self.assertTrue(self.buffer.registrar(self.enquete.id, str(self.sim.id), '3.3.3.3'))
+			self.assertTrue(self.buffer.ja_votou(self.enquete.id, '2.2.2.2'))
+		self.assertFalse(self.buffer.registrar(self.enquete.id, self.sim.id, 'nao-e-ip'))
+		with self.assertRaises(OpcaoInvalida):
+			self.buffer.registrar(self.enquete.id, 999, '4.4.4.4')
+		self.assertEqual(3, self.buffer.pendentes())
+		self.assertEqual(0, Voto.objects.count())
+
+		self.assertEqual(3, self.buffer.flush())
+		self.assertEqual(3, Voto.objects.filter(enquete=self.enquete).count())
+		self.assertEqual([2, 1], list(Opcao.objects.order_by('id').values_list('quantidade_votos', flat=True)))
+
+	def test_banco_descarta_voto_gravado_por_outro_processo(self):
+		from django.db import IntegrityError, transaction
+		from jcpemobile.models import Opcao, Voto
+		self.buffer.ja_votou(self.enquete.id, '9.9.9.9')
+		# Outro processo grava o mesmo IP depois que este carregou os votantes
+		Voto.objects.create(opcao=self.nao, ip_usuario='5.5.5.5')
+		self.assertTrue(self.buffer.registrar(self.enquete.id, self.sim.id, '5.5.5.5'))
+		self.buffer.flush()
+		self.assertEqual(1, Voto.objects.count())
+		self.assertEqual([0, 1], list(Opcao.objects.order_by('id').values_list('quantidade_votos', flat=True)))
+		with self.assertRaises(IntegrityError), transaction.atomic():
+			Voto.objects.create(opcao=self.sim, ip_usuario='5.5.5.5')
+
+	def test_contador_soma_so_os_votos_gravados(self):
+		from jcpemobile.models import Opcao, Voto
+		# Contador divergente não é recontado pelo flush, só incrementado
+		Opcao.objects.filter(pk=self.sim.pk).update(quantidade_votos=10)
+		self.buffer.ja_votou(self.enquete.id, '9.9.9.9')
+		Voto.objects.create(opcao=self.nao, ip_usuario='5.5.5.5')
+		self.buffer.registrar(self.enquete.id, self.sim.id, '5.5.5.5')
+		self.buffer.registrar(self.enquete.id, self.sim.id, '6.6.6.6')
+		self.buffer.flush()
+		self.assertEqual([11, 1], list(Opcao.objects.order_by('id').values_list('quantidade_votos', flat=True)))
+
+	def test_sem_returning_filtra_os_ja_gravados(self):
+		from django.db import connection
+		from jcpemobile.models import Opcao, Voto
+		self.buffer.ja_votou(self.enquete.id, '9.9.9.9')
+		Voto.objects.create(opcao=self.nao, ip_usuario='5.5.5.5')
+		self.buffer.registrar(self.enquete.id, self.sim.id, '5.5.5.5')
+		self.buffer.registrar(self.enquete.id, self.nao.id, '6.6.6.6')
+		with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+			self.assertEqual(2, self.buffer.flush())
+		self.assertEqual(2, Voto.objects.count())
+		self.assertEqual([0, 2], list(Opcao.objects.order_by('id').values_list('quantidade_votos', flat=True)))
+
+	def test_voto_em_opcao_apagada_e_descartado(self):
+		from jcpemobile.models import Opcao, Voto
+		self.buffer.registrar(self.enquete.id, self.sim.id, '1.1.1.1')
+		self.buffer.registrar(self.enquete.id, self.nao.id, '2.2.2.2')
+		Opcao.objects.filter(pk=self.sim.pk).delete()
+		self.assertEqual(2, self.buffer.flush())
+		self.assertEqual(0, self.buffer.pendentes())
+		self.assertEqual([self.nao.id], list(Voto.objects.values_list('opcao_id', flat=True)))
+
+	def test_lote_que_sempre_falha_e_descartado(self):
+		from jcpemobile.votos import BufferVotos
+		buffer = BufferVotos(intervalo=3600, max_falhas=3)
+		buffer.registrar(self.enquete.id, self.sim.id, '1.1.1.1')
+		with mock.patch.object(buffer, '_gravar', side_effect=RuntimeError), self.assertLogs('jcpemobile.votos', 'ERROR'):
+			for _ in range(2):
+				self.assertEqual(0, buffer.flush())
+				self.assertEqual(1, buffer.pendentes())
+			self.assertEqual(0, buffer.flush())
+		self.assertEqual(0, buffer.pendentes())
+		# O votante descartado pode votar de novo
+		self.assertTrue(buffer.registrar(self.enquete.id, self.sim.id, '1.1.1.1'))
+		buffer.parar()
+
+	def test_apagar_votos_ou_opcoes_esquece_os_votantes(self):
+		from jcpemobile.models import Opcao, Voto
+		from jcpemobile.votos import buffer_votos
+		Voto.objects.create(opcao=self.sim, ip_usuario='1.1.1.1')
+		buffer_votos.invalidar()
+		self.assertTrue(buffer_votos.ja_votou(self.enquete.id, '1.1.1.1'))
+		with self.captureOnCommitCallbacks(execute=True):
+			Voto.objects.all().delete()
+		self.assertFalse(buffer_votos.ja_votou(self.enquete.id, '1.1.1.1'))
+		self.assertIn(self.enquete.id, buffer_votos._enquetes)
+		with self.captureOnCommitCallbacks(execute=True):
+			Opcao.objects.filter(enquete=self.enquete).delete()
+		self.assertNotIn(self.enquete.id, buffer_votos._enquetes)
+
+	@override_settings(VOTOS_SINCRONO=True)
+	def test_votacao_pela_pagina_da_noticia(self):
+		from jcpemobile.enquetes import resultados_enquete
+		from jcpemobile.votos import buffer_votos
+		buffer_votos.invalidar()
+		url = f'/{self.noticia.slug}/?fake_ip=7.7.7.7'
+		self.assertEqual(302, self.client.post(url, {'opcao_id': self.sim.id}).status_code)
+		self.assertEqual(200, self.client.post(url, {'opcao_id': self.nao.id}).status_code)
+		self.assertEqual([1, 0], [opcao['votos'] for opcao in resultados_enquete(self.enquete.id)['opcoes']])
+		estado = self.client.get(f'/api/noticias/{self.noticia.id}/estado/?fake_ip=7.7.7.7').json()
+		self.assertTrue(estado['enquete']['ja_votou'])
+
+
+	@override_settings(ENQUETE_AO_VIVO_SSE=True)
+	def test_pagina_da_noticia_liga_a_enquete_ao_vivo(self):
+		resposta = self.client.get(f'/{self.noticia.slug}/')
+		self.assertContains(resposta, f'data-url-ao-vivo="/api/enquetes/{self.enquete.id}/ao-vivo/"')
+		self.assertContains(resposta, f'name="opcao_id" value="{self.sim.id}"')
+		self.assertContains(resposta, 'js/enquete.js')
+		# A página em cache não traz o token: o estado do leitor define o cookie
+		estado = self.client.get(f'/api/noticias/{self.noticia.id}/estado/')
+		self.assertIn('csrftoken', estado.cookies)
+
+	@override_settings(ENQUETE_AO_VIVO_SSE=False, ENQUETE_RESULTADOS_INTERVALO=20)
+	def test_sem_asgi_a_pagina_consulta_os_resultados(self):
+		resposta = self.client.get(f'/{self.noticia.slug}/')
+		self.assertNotContains(resposta, 'data-url-ao-vivo')
+		self.assertContains(resposta, f'data-url-resultados="/api/enquetes/{self.enquete.id}/resultados/"')
+		self.assertContains(resposta, 'data-intervalo="20000"')
+		self.assertEqual(404, self.client.get(f'/api/enquetes/{self.enquete.id}/ao-vivo/').status_code)
+
+@override_settings(ENQUETE_AO_VIVO_INTERVALO=0.01, ENQUETE_AO_VIVO_PING=60, ENQUETE_AO_VIVO_SSE=True)
+class EnqueteAoVivoTests(TestCase):
+	def setUp(self):
+		from jcpemobile.models import Enquete, Opcao
+		self.enquete = Enquete.objects.create(titulo='Enquete', pergunta='Quem vence?')
+		self.sim = Opcao.objects.create(enquete=self.enquete, texto='Sim')
+		Opcao.objects.create(enquete=self.enquete, texto='Não')
+
+	async def test_uma_agregacao_por_tick_para_todos_os_leitores(self):
+		import asyncio
+		import json
+		from asgiref.sync import sync_to_async
+		from jcpemobile import ao_vivo, enquetes
+		from jcpemobile.models import Voto
+		central = ao_vivo.CentralAoVivo()
+		with mock.patch.object(ao_vivo, 'resultados_enquete', wraps=enquetes.resultados_enquete) as resultados:
+			filas = [await central.conectar(self.enquete.id) for _ in range(50)]
+			self.assertEqual(1, resultados.call_count)
+			self.assertEqual(50, len(central))
+			for fila in filas:
+				fila.get_nowait()
+			await sync_to_async(Voto.objects.create)(opcao=self.sim, ip_usuario='1.1.1.1')
+			eventos = await asyncio.gather(*(asyncio.wait_for(fila.get(), 1) for fila in filas))
+			ticks = resultados.call_count - 1
+		self.assertEqual(1, len(set(eventos)))
+		dados = json.loads(eventos[0].split('data: ', 1)[1])
+		self.assertEqual([1, 0], [opcao['votos'] for opcao in dados['opcoes']])
+		# Uma consulta por tick, não por leitor
+		self.assertLess(ticks, 10)
+		for fila in filas:
+			central.desconectar(self.enquete.id, fila)
+		self.assertEqual(0, len(central))
+
+	async def test_erro_numa_agregacao_nao_derruba_a_transmissao(self):
+		import asyncio
+		from jcpemobile import ao_vivo, enquetes
+		central = ao_vivo.CentralAoVivo()
+		fila = await central.conectar(self.enquete.id)
+		fila.get_nowait()
+		transmissao = central._transmissoes[self.enquete.id]
+		falhas = [RuntimeError('banco fora do ar')]
+
+		def resultados(enquete_id):
+			if falhas:
+				raise falhas.pop()
+			return dict(enquetes.resultados_enquete(enquete_id), total=99)
+
+		with mock.patch.object(ao_vivo, 'resultados_enquete', resultados), self.assertLogs('jcpemobile.ao_vivo', 'ERROR'):
+			evento = await asyncio.wait_for(fila.get(), 1)
+		self.assertIn('"total":99', evento)
+		central.desconectar(self.enquete.id, fila)
+		await asyncio.wait_for(transmissao.tarefa, 1)
+		self.assertIsNone(transmissao.tarefa)
+
+	async def test_falha_ao_conectar_nao_deixa_leitor_pendurado(self):
+		from jcpemobile import ao_vivo
+		central = ao_vivo.CentralAoVivo()
+		with mock.patch.object(ao_vivo, 'resultados_enquete', side_effect=RuntimeError('banco fora do ar')):
+			with self.assertRaises(RuntimeError):
+				await central.conectar(self.enquete.id)
+		self.assertEqual(0, len(central))
+		self.assertNotIn(self.enquete.id, central._transmissoes)
+
+	async def test_endpoint_sse(self):
+		resposta = await self.async_client.get(f'/api/enquetes/{self.enquete.id}/ao-vivo/')
+		self.assertEqual('text/event-stream', resposta['Content-Type'])
+		conteudo = aiter(resposta.streaming_content)
+		self.assertEqual(b'retry: 3000\n\n', await anext(conteudo))
+		self.assertIn(b'event: resultados', await anext(conteudo))
+		await conteudo.aclose()
+		self.assertEqual(404, (await self.async_client.get('/api/enquetes/999/ao-vivo/')).status_code)
+
+
+class ImagensNoticiaTests(TestCase):
+	def setUp(self):
+		import shutil
+		import tempfile
+
+		self.media = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+		configuracao = override_settings(MEDIA_ROOT=self.media, IMAGENS_SINCRONO=True, RELACIONADAS_SINCRONO=True)
+		configuracao.enable()
+		self.addCleanup(configuracao.disable)
+
+	def _upload(self, tamanho=(1000, 800), nome='foto.png', cor=(200, 30, 30, 255)):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+		from io import BytesIO
+		from PIL import Image
+
+		saida = BytesIO()
+		Image.new('RGBA', tamanho, cor).save(saida, format='PNG')
+		return SimpleUploadedFile(nome, saida.getvalue(), content_type='image/png')
+
+	def _criar(self, slug, imagem):
+		return Noticia.objects.create(slug=slug, titulo=slug, conteudo='x', imagem=imagem)
+
+	def test_save_nao_processa_e_serve_original(self):
+		with self.captureOnCommitCallbacks(execute=False):
+			noticia = self._criar('img-1', self._upload())
+		noticia.refresh_from_db()
+		self.assertEqual(Noticia.IMAGEM_PENDENTE, noticia.imagem_status)
+		self.assertTrue(noticia.imagem.name.startswith('noticias/foto'))
+		self.assertEqual('', noticia.imagem_hash)
+
+	def test_worker_corta_e_aponta_para_processada(self):
+		from PIL import Image
+
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('img-2', self._upload((3000, 1000)))
+		noticia.refresh_from_db()
+		self.assertEqual(Noticia.IMAGEM_PRONTA, noticia.imagem_status)
+		self.assertEqual(f'noticias/processadas/{noticia.imagem_hash}.jpg', noticia.imagem.name)
+		with Image.open(noticia.imagem.path) as img:
+			self.assertEqual((1200, 600), img.size)
+			self.assertEqual('JPEG', img.format)
+
+	def test_save_de_instancia_antiga_nao_desfaz_o_worker(self):
+		from jcpemobile.imagens import processar_imagem_noticia
+
+		with self.captureOnCommitCallbacks(execute=False):
+			noticia = self._criar('img-antiga', self._upload())
+		antiga = Noticia.objects.get(pk=noticia.pk)
+		self.assertEqual(Noticia.IMAGEM_PRONTA, processar_imagem_noticia(noticia.pk))
+		antiga.titulo = 'Título editado'
+		with self.captureOnCommitCallbacks(execute=True):
+			antiga.save()
+		noticia.refresh_from_db()
+		self.assertEqual('Título editado', noticia.titulo)
+		self.assertEqual(Noticia.IMAGEM_PRONTA, noticia.imagem_status)
+		self.assertEqual(f'noticias/processadas/{noticia.imagem_hash}.jpg', noticia.imagem.name)
+		self.assertTrue(noticia.imagem_variantes)
+
+	def test_mesmo_arquivo_nao_e_reprocessado(self):
+		from jcpemobile import imagens
+
+		with self.captureOnCommitCallbacks(execute=True):
+			primeira = self._criar('img-3', self._upload())
+		with mock.patch.object(imagens, 'cortar_e_redimensionar', wraps=imagens.cortar_e_redimensionar) as cortar:
+			with self.captureOnCommitCallbacks(execute=True):
+				segunda = self._criar('img-4', self._upload())
+			# Salvar sem trocar a imagem não reprocessa
+			segunda.refresh_from_db()
+			segunda.titulo = 'outro título'
+			with self.captureOnCommitCallbacks(execute=True):
+				segunda.save()
+		primeira.refresh_from_db()
+		segunda.refresh_from_db()
+		self.assertEqual(0, cortar.call_count)
+		self.assertEqual(primeira.imagem.name, segunda.imagem.name)
+		self.assertEqual(Noticia.IMAGEM_PRONTA, segunda.imagem_status)
+		# Já pronta: uma segunda tarefa para a mesma notícia não faz nada
+		self.assertIsNone(imagens.processar_imagem_noticia(segunda.pk))
+
+	def test_arquivo_invalido_fica_com_erro_e_comando_retoma(self):
+		from django.core.files.uploadedfile import SimpleUploadedFile
+
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('img-5', SimpleUploadedFile('quebrada.jpg', b'nao e imagem'))
+		noticia.refresh_from_db()
+		self.assertEqual(Noticia.IMAGEM_ERRO, noticia.imagem_status)
+		self.assertEqual('noticias/quebrada.jpg', noticia.imagem.name)
+
+		noticia.imagem = self._upload(nome='nova.png')
+		with self.captureOnCommitCallbacks(execute=False):
+			noticia.save()
+		saida = StringIO()
+		call_command('processar_imagens', stdout=saida)
+		noticia.refresh_from_db()
+		self.assertEqual(Noticia.IMAGEM_PRONTA, noticia.imagem_status)
+		self.assertIn('1 imagens processadas', saida.getvalue())
+
+	def test_imagem_trocada_durante_o_processamento_prevalece(self):
+		from jcpemobile import imagens
+
+		with self.captureOnCommitCallbacks(execute=False):
+			noticia = self._criar('img-6', self._upload())
+		original = imagens.cortar_e_redimensionar
+
+		def trocar_no_meio(arquivo):
+			Noticia.objects.filter(pk=noticia.pk).update(imagem='noticias/outra.png', imagem_status=Noticia.IMAGEM_PENDENTE)
+			return original(arquivo)
+
+		with mock.patch.object(imagens, 'cortar_e_redimensionar', trocar_no_meio):
+			imagens.processar_imagem_noticia(noticia.pk)
+		noticia.refresh_from_db()
+		self.assertEqual('noticias/outra.png', noticia.imagem.name)
+		self.assertEqual(Noticia.IMAGEM_PENDENTE, noticia.imagem_status)
+
+	def test_variantes_em_webp_e_jpeg(self):
+		from django.core.files.storage import default_storage
+		from PIL import Image
+
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('var-1', self._upload((2400, 1600)))
+		noticia.refresh_from_db()
+		variantes = noticia.imagem_variantes
+		self.assertEqual([320, 640, 960, 1200], [largura for largura, _ in variantes['webp']])
+		self.assertEqual([320, 640, 960, 1200], [largura for largura, _ in variantes['jpeg']])
+		# A maior JPEG é a própria processada
+		self.assertEqual(noticia.imagem.name, variantes['jpeg'][-1][1])
+		largura, nome = variantes['webp'][1]
+		with default_storage.open(nome) as arquivo, Image.open(arquivo) as img:
+			self.assertEqual(('WEBP', (640, 320)), (img.format, img.size))
+
+	def test_imagem_pequena_nao_e_ampliada(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('var-2', self._upload((700, 350)))
+		noticia.refresh_from_db()
+		self.assertEqual([320, 640, 700], [largura for largura, _ in noticia.imagem_variantes['webp']])
+
+	def test_tag_emite_srcset_e_sizes(self):
+		from django.template import Context, Template
+
+		modelo = Template('{% load imagens_responsivas %}{% imagem_responsiva noticia sizes="50vw" class="capa" %}')
+		with self.captureOnCommitCallbacks(execute=False):
+			noticia = self._criar('var-3', self._upload())
+		# Pendente: o original, sem srcset
+		html = modelo.render(Context({'noticia': noticia}))
+		self.assertIn(f'src="{noticia.imagem.url}"', html)
+		self.assertNotIn('srcset', html)
+
+		call_command('processar_imagens', stdout=StringIO())
+		noticia.refresh_from_db()
+		html = modelo.render(Context({'noticia': noticia}))
+		self.assertIn('<source type="image/webp" srcset="/media/noticias/processadas/', html)
+		self.assertIn('-320.webp 320w', html)
+		self.assertIn('-640.jpg 640w', html)
+		self.assertIn('sizes="50vw"', html)
+		self.assertIn('class="capa"', html)
+		self.assertIn('alt="var-3"', html)
+
+	def test_comando_gera_variantes_das_imagens_antigas(self):
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('var-4', self._upload())
+		noticia.refresh_from_db()
+		Noticia.objects.filter(pk=noticia.pk).update(imagem_variantes={})
+		call_command('processar_imagens', '--variantes', stdout=StringIO())
+		atualizada = Noticia.objects.get(pk=noticia.pk)
+		self.assertEqual(noticia.imagem.name, atualizada.imagem.name)
+		self.assertEqual(noticia.imagem_variantes, atualizada.imagem_variantes)
+
+	def test_jpeg_grande_e_decodificado_reduzido(self):
+		from io import BytesIO
+		from PIL import Image
+		from jcpemobile.imagens import cortar_e_redimensionar
+
+		arquivo = BytesIO()
+		Image.new('RGB', (4800, 3000), (10, 120, 200)).save(arquivo, format='JPEG')
+		arquivo.seek(0)
+		with mock.patch.object(Image.Image, 'crop', autospec=True, side_effect=Image.Image.crop) as crop:
+			img = cortar_e_redimensionar(arquivo)
+		self.assertEqual((1200, 600), img.size)
+		self.assertEqual('RGB', img.mode)
+		# O decodificador entregou 1/4 da resolução: o recorte já tem o tamanho final
+		self.assertEqual((1200, 750), crop.call_args[0][0].size)
+
+	def test_png_transparente_recebe_fundo_branco(self):
+		from jcpemobile.imagens import cortar_e_redimensionar
+
+		img = cortar_e_redimensionar(self._upload((3000, 1000), cor=(0, 0, 0, 0)))
+		self.assertEqual(('RGB', (1200, 600)), (img.mode, img.size))
+		self.assertEqual((255, 255, 255), img.getpixel((600, 300)))
+
+	@override_settings(IMAGENS_MAX_PIXELS=10_000)
+	def test_limite_de_pixels(self):
+		from jcpemobile.forms import NoticiaForm
+
+		form = NoticiaForm(data={'titulo': 'Título longo o bastante'}, files={'imagem': self._upload((200, 100))})
+		self.assertIn('resolução grande demais', form.errors['imagem'][0])
+
+		with self.captureOnCommitCallbacks(execute=True):
+			noticia = self._criar('img-bomba', self._upload((200, 100)))
+		noticia.refresh_from_db()
+		self.assertEqual(Noticia.IMAGEM_ERRO, noticia.imagem_status)
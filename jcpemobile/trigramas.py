@@ -0,0 +1,294 @@
+# jcpemobile/trigramas.py
+"""Correspondência aproximada por trigramas (nomes de tags, categorias e títulos).
+
+Cada texto é normalizado como na busca (``busca.normalizar``: minúsculas, sem
+acentos) e quebrado nos trigramas de cada palavra, com o mesmo preenchimento
+do ``pg_trgm`` ("  recife " -> "  r", " re", "rec", ..., "fe "). Um índice
+invertido ``trigrama -> ids`` fica em memória, um por tipo, então comparar
+uma consulta custa só as listas dos seus trigramas ("Brasileirao",
+"Bolsonaru" e "Petrobrás" acham "Brasileirão", "Bolsonaro" e "Petrobras").
+
+- Tags e categorias: similaridade de Jaccard entre os conjuntos (a
+  ``similarity()`` do ``pg_trgm``), limiar ``LIMIAR_NOMES``.
+- Títulos: fração dos trigramas da consulta presentes no título (próxima da
+  ``word_similarity()``), limiar ``LIMIAR_TITULOS``.
+
+Os índices acompanham as mudanças como as sugestões: tags e categorias
+recarregam quando a versão da taxonomia muda, títulos pelo registro de
+alterações da busca. Com ``TRIGRAMAS_PG_TRGM`` e as extensões instaladas no
+PostgreSQL (migrações 0019 e 0025), a comparação é feita pelo banco, com os
+mesmos resultados (sem acentos, casamento exato primeiro).
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+
+from .busca import alteracoes_desde, normalizar
+from .sugestoes import versao_taxonomia_atual
+
+LIMIAR_NOMES = 0.3
+LIMIAR_TITULOS = 0.6
+TIPOS = ('tag', 'categoria', 'noticia')
+
+_PALAVRA = re.compile(r'[a-z0-9]+')
+
+
+def trigramas(texto):
+    """Conjunto de trigramas do texto normalizado, como no ``pg_trgm``."""
+    resultado = set()
+    for palavra in _PALAVRA.findall(normalizar(texto)):
+        preenchida = f'  {palavra} '
+        resultado.update(preenchida[i:i + 3] for i in range(len(preenchida) - 2))
+    return resultado
+
+
+def _chave(texto):
+    return ' '.join(_PALAVRA.findall(normalizar(texto)))
+
+
+class _Indice:
+    """Índice de um tipo: ``trigrama -> {id}`` e os trigramas de cada id."""
+
+    def __init__(self):
+        self.postings = {}
+        self.trigramas = {}
+        self.textos = {}
+        # chave normalizada -> ids (casamento exato, sem contar trigramas)
+        self.exatos = {}
+
+    def adicionar(self, item_id, texto):
+        self.remover(item_id)
+        conjunto = trigramas(texto)
+        for trigrama in conjunto:
+            self.postings.setdefault(trigrama, set()).add(item_id)
+        self.trigramas[item_id] = len(conjunto)
+        self.textos[item_id] = texto
+        self.exatos.setdefault(_chave(texto), set()).add(item_id)
+
+    def remover(self, item_id):
+        texto = self.textos.pop(item_id, None)
+        if texto is None:
+            return
+        self.trigramas.pop(item_id)
+        for trigrama in trigramas(texto):
+            ids = self.postings.get(trigrama)
+            if ids is not None:
+                ids.discard(item_id)
+                if not ids:
+                    del self.postings[trigrama]
+        ids = self.exatos.get(_chave(texto))
+        if ids is not None:
+            ids.discard(item_id)
+            if not ids:
+                del self.exatos[_chave(texto)]
+
+    def similares(self, consulta, limite, limiar, contido=False):
+        """``[(id, similaridade)]`` em ordem decrescente."""
+        conjunto = trigramas(consulta)
+        if not conjunto:
+            return []
+        tamanho = len(conjunto)
+        # Quem passa do limiar divide pelo menos ``minimo`` trigramas com a
+        # consulta, então aparece em alguma das ``tamanho - minimo + 1`` listas
+        # mais curtas: só elas geram candidatos (trigramas comuns como "  a" não)
+        listas = sorted((self.postings.get(trigrama, ()) for trigrama in conjunto), key=len)
+        minimo = max(1, math.ceil(limiar * tamanho))
+        comuns = Counter()
+        for ids in listas[:tamanho - minimo + 1]:
+            comuns.update(ids)
+        for ids in listas[tamanho - minimo + 1:]:
+            for item_id in comuns:
+                if item_id in ids:
+                    comuns[item_id] += 1
+        candidatos = []
+        for item_id, quantidade in comuns.items():
+            if contido:
+                similaridade = quantidade / tamanho
+            else:
+                similaridade = quantidade / (tamanho + self.trigramas[item_id] - quantidade)
+            if similaridade >= limiar:
+                candidatos.append((similaridade, -item_id))
+        return [(-item_id, similaridade) for similaridade, item_id in heapq.nlargest(limite, candidatos)]
+
+
+class IndiceTrigramas:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.invalidar()
+
+    def invalidar(self):
+        with self._lock:
+            self._indices = {}
+            self._versao_taxonomia = None
+            self._versao_noticias = None
+
+    # --- manutenção ------------------------------------------------------
+
+    def _carregar(self, tipo, ids=None):
+        from .models import Categoria, Noticia, Tag
+
+        modelo, campo = {'tag': (Tag, 'nome'), 'categoria': (Categoria, 'nome'), 'noticia': (Noticia, 'titulo')}[tipo]
+        indice = self._indices.get(tipo) if ids is not None else None
+        if indice is None:
+            indice = self._indices[tipo] = _Indice()
+            objetos = modelo.objects.all()
+        else:
+            for item_id in ids:
+                indice.remover(item_id)
+            objetos = modelo.objects.filter(id__in=ids)
+        for item_id, texto in objetos.values_list('id', campo).iterator(chunk_size=2000):
+            indice.adicionar(item_id, texto)
+
+    def sincronizar(self, tipos):
+        """Carrega os tipos pedidos ainda ausentes e aplica as alterações pendentes."""
+        with self._lock:
+            versao_taxonomia = versao_taxonomia_atual()
+            if versao_taxonomia != self._versao_taxonomia:
+                self._indices.pop('tag', None)
+                self._indices.pop('categoria', None)
+                self._versao_taxonomia = versao_taxonomia
+            if 'noticia' in self._indices:
+                self._versao_noticias, alteradas = alteracoes_desde(self._versao_noticias)
+                if alteradas is None:
+                    del self._indices['noticia']
+                elif alteradas:
+                    self._carregar('noticia', alteradas)
+            for tipo in tipos:
+                if tipo not in self._indices:
+                    if tipo == 'noticia':
+                        self._versao_noticias, _ = alteracoes_desde(None)
+                    self._carregar(tipo)
+
+    # --- consulta --------------------------------------------------------
+
+    def similares(self, consulta, tipo, limite=10, limiar=None):
+        """``[{'id', 'texto', 'similaridade'}]`` do tipo, do mais ao menos parecido."""
+        contido = tipo == 'noticia'
+        if limiar is None:
+            limiar = LIMIAR_TITULOS if contido else LIMIAR_NOMES
+        if usar_pg_trgm():
+            return _similares_pg_trgm(consulta, tipo, limite, limiar, contido)
+        self.sincronizar((tipo,))
+        with self._lock:
+            indice = self._indices[tipo]
+            return [
+                {'id': item_id, 'texto': indice.textos[item_id], 'similaridade': round(similaridade, 4)}
+                for item_id, similaridade in indice.similares(consulta, limite, limiar, contido)
+            ]
+
+    def resolver_tags(self, nomes):
+        """``{nome pedido: tag_id}`` com a tag exata (sem acentos/caixa) ou a mais parecida."""
+        if usar_pg_trgm():
+            resolvidas = {}
+            for nome in nomes:
+                tag_id = _exata_pg_trgm(nome)
+                if tag_id is None:
+                    candidatas = _similares_pg_trgm(nome, 'tag', 1, LIMIAR_NOMES, False)
+                    tag_id = candidatas[0]['id'] if candidatas else None
+                if tag_id is not None:
+                    resolvidas[nome] = tag_id
+            return resolvidas
+
+        self.sincronizar(('tag',))
+        resolvidas = {}
+        with self._lock:
+            indice = self._indices['tag']
+            for nome in nomes:
+                exatas = indice.exatos.get(_chave(nome))
+                if exatas:
+                    resolvidas[nome] = min(exatas)
+                    continue
+                candidatas = indice.similares(nome, 1, LIMIAR_NOMES)
+                if candidatas:
+                    resolvidas[nome] = candidatas[0][0]
+        return resolvidas
+
+
+# --- pg_trgm ---------------------------------------------------------------
+#
+# O banco compara o texto sem acentos e em minúsculas, como o índice em
+# memória: ``jcpemobile_sem_acento`` envolve o ``unaccent`` numa função
+# IMMUTABLE (exigência para entrar na expressão do índice). A consulta usa os
+# operadores ``%`` e ``<%``, os únicos que o índice GIN de trigramas atende,
+# com o limiar passado em ``pg_trgm.similarity_threshold`` /
+# ``pg_trgm.word_similarity_threshold``.
+
+# Criada pela migração 0025, com os índices GIN sobre ela
+FUNCAO_SEM_ACENTO = 'jcpemobile_sem_acento'
+
+_pg_trgm_instalado = {}
+
+
+def pg_trgm_instalado():
+    """Extensões e função instaladas pela migração? (consultado uma vez por banco)"""
+    if connection.vendor != 'postgresql':
+        return False
+    nome = connection.settings_dict['NAME']
+    if nome not in _pg_trgm_instalado:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1 FROM pg_proc WHERE proname = %s', (FUNCAO_SEM_ACENTO,))
+            _pg_trgm_instalado[nome] = cursor.fetchone() is not None
+    return _pg_trgm_instalado[nome]
+
+
+def usar_pg_trgm():
+    return getattr(settings, 'TRIGRAMAS_PG_TRGM', False) and pg_trgm_instalado()
+
+
+def _modelo_e_campo(tipo):
+    from .models import Categoria, Noticia, Tag
+
+    return {'tag': (Tag, 'nome'), 'categoria': (Categoria, 'nome'), 'noticia': (Noticia, 'titulo')}[tipo]
+
+
+def _expressao(modelo, campo):
+    return f'{FUNCAO_SEM_ACENTO}("{modelo._meta.db_table}"."{campo}")'
+
+
+def _similares_pg_trgm(consulta, tipo, limite, limiar, contido):
+    from django.db.models import BooleanField, FloatField
+    from django.db.models.expressions import RawSQL
+
+    modelo, campo = _modelo_e_campo(tipo)
+    expressao = _expressao(modelo, campo)
+    termo = ' '.join(_PALAVRA.findall(normalizar(consulta)))
+    if not termo:
+        return []
+    if contido:
+        # A consulta contida no título: word_similarity(consulta, título)
+        filtro, funcao, parametro = f'%s <%% {expressao}', f'word_similarity(%s, {expressao})', 'pg_trgm.word_similarity_threshold'
+    else:
+        filtro, funcao, parametro = f'{expressao} %% %s', f'similarity({expressao}, %s)', 'pg_trgm.similarity_threshold'
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT set_config(%s, %s, false)', (parametro, str(limiar)))
+    linhas = (
+        modelo.objects.filter(RawSQL(filtro, (termo,), output_field=BooleanField()))
+        .annotate(similaridade=RawSQL(funcao, (termo,), output_field=FloatField()))
+        .order_by('-similaridade', 'id')
+        .values_list('id', campo, 'similaridade')[:limite]
+    )
+    return [{'id': item_id, 'texto': texto, 'similaridade': round(similaridade, 4)} for item_id, texto, similaridade in linhas]
+
+
+def _exata_pg_trgm(nome):
+    """Tag de nome igual sem acentos/caixa (o ``=`` também usa o índice de trigramas)."""
+    from django.db.models import BooleanField
+    from django.db.models.expressions import RawSQL
+
+    from .models import Tag
+
+    termo = normalizar(nome).strip()
+    if not termo:
+        return None
+    return (
+        Tag.objects.filter(RawSQL(f'{_expressao(Tag, "nome")} = %s', (termo,), output_field=BooleanField()))
+        .order_by('id').values_list('id', flat=True).first()
+    )
+
+
+indice_trigramas = IndiceTrigramas()
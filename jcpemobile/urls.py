@@ -5,7 +5,10 @@ from .views import (
     admin_dashboard, admin_criar_noticia, admin_editar_noticia, admin_deletar_noticia,
     admin_criar_autor, neels, detalhe_enquete, lista_enquetes, painel_diario
     , listar_tags, noticias_por_tags, atualizar_preferencias, noticias_personalizadas,
-    api_preferencias, linha_do_tempo
+    api_preferencias, linha_do_tempo, api_registrar_visualizacao, api_estado_noticia,
+    api_feed_neels, api_linha_do_tempo_mes, api_sincronizar_salvos,
+    api_buscar, api_sugestoes, api_busca_aproximada, api_resultados_enquete,
+    api_enquete_ao_vivo
 )
 
 urlpatterns = [
@@ -26,6 +29,16 @@ urlpatterns = [
     path('api/preferencias/', api_preferencias, name='api_preferencias'),
     path('api/preferencias/tags/', atualizar_preferencias, name='api_atualizar_preferencias'),
     path('api/noticias/personalizadas/', noticias_personalizadas, name='api_noticias_personalizadas'),
+    path('api/busca/', api_buscar, name='api_buscar'),
+    path('api/busca/sugestoes/', api_sugestoes, name='api_sugestoes'),
+    path('api/busca/aproximada/', api_busca_aproximada, name='api_busca_aproximada'),
+    path('api/salvos/sincronizar/', api_sincronizar_salvos, name='api_sincronizar_salvos'),
+    path('api/neels/', api_feed_neels, name='api_feed_neels'),
+    path('api/linha-do-tempo/<int:ano>/<int:mes>/', api_linha_do_tempo_mes, name='api_linha_do_tempo_mes'),
+    path('api/noticias/<int:noticia_id>/visualizacao/', api_registrar_visualizacao, name='api_registrar_visualizacao'),
+    path('api/noticias/<int:noticia_id>/estado/', api_estado_noticia, name='api_estado_noticia'),
+    path('api/enquetes/<int:enquete_id>/resultados/', api_resultados_enquete, name='api_resultados_enquete'),
+    path('api/enquetes/<int:enquete_id>/ao-vivo/', api_enquete_ao_vivo, name='api_enquete_ao_vivo'),
     
     
     # Rotas de Admin (Painel Customizado)
@@ -1,15 +1,38 @@
 # jcpemobile/views.py
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.utils.dateparse import parse_date
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.core.cache import cache
+from django.utils.cache import patch_cache_control
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.decorators import login_required, user_passes_test
 from .models import Noticia, Visualizacao, NoticaSalva, Categoria, Autor, Feedback, Enquete, Voto, Opcao, Tag, PerfilUsuario
 from .forms import CadastroUsuarioForm, NoticiaForm, FeedbackForm
+from .visualizacoes import registrar_visualizacao
+from .ranking import mais_vistas, ranking_deslizante
+from .pagina_inicial import contexto_fragmentos, obter_pagina_inicial
+from .cache_paginas import chave_pagina_noticia, guardar_pagina_noticia
+from .feed import TAMANHO_PAGINA, CursorInvalido, pagina_feed, paginar_por_cursor, serializar_card
+from .linha_do_tempo import montar_esqueleto, noticias_do_mes
+from .estatisticas import obter_estatisticas
+from .serializacao import CampoInvalido, campos_solicitados, serializar_noticias
+from .busca import indice_busca, inicio_do_periodo
+from . import busca_banco
+from .sugestoes import indice_sugestoes
+from .enquetes import resultados_enquete
+from .relacionadas import TOTAL_RELACIONADAS
+from .ao_vivo import central_ao_vivo
+from .votos import OpcaoInvalida, buffer_votos
+from .trigramas import TIPOS as TIPOS_APROXIMADOS, indice_trigramas
 from django.db import IntegrityError
 import json
 
@@ -29,11 +52,8 @@ def get_client_ip(request):
         ip = request.META.get('REMOTE_ADDR')
     return ip
 
-def index(request):
-    """View para a página inicial"""
-    hoje = timezone.now().date()
-
-    # Verificar se há preferências de categorias ANTES de buscar notícias
+def obter_categorias_preferidas(request):
+    """Slugs de categorias preferidas: perfil, depois cookie, depois ?categorias="""
     categorias_preferidas = None
 
     # Se usuário está logado, buscar preferências do perfil
@@ -69,48 +89,21 @@ def index(request):
             if categorias_param:
                 categorias_preferidas = [c.strip() for c in categorias_param.split(',') if c.strip()]
 
-    # Buscar notícias mais vistas do dia (aplicando filtro de categorias se houver)
-    noticias_query = Noticia.objects.all()
+    return categorias_preferidas
 
-    if categorias_preferidas:
-        print(f"[DEBUG] Filtrando por categorias: {categorias_preferidas}")
-        noticias_query = noticias_query.filter(categoria__slug__in=categorias_preferidas)
 
-    noticias_mais_vistas = noticias_query.annotate(
-        visualizacoes_dia=Count('visualizacoes', filter=Q(visualizacoes__data=hoje))
-    ).order_by('-visualizacoes_dia', '-data_publicacao')[:9]
-
-    # Filtrar todas as notícias por categorias preferidas se existirem
+def index(request):
+    """View para a página inicial"""
+    # Verificar se há preferências de categorias ANTES de buscar notícias
+    categorias_preferidas = obter_categorias_preferidas(request)
     if categorias_preferidas:
-        todas_noticias = Noticia.objects.filter(
-            categoria__slug__in=categorias_preferidas
-        ).select_related('categoria', 'autor').order_by('-data_publicacao')
-        print(f"[DEBUG] Total de notícias filtradas: {todas_noticias.count()}")
-    else:
-        # Pegar todas as notícias se não houver preferências
-        todas_noticias = Noticia.objects.select_related('categoria', 'autor').order_by('-data_publicacao')
-        print(f"[DEBUG] Sem filtro - Total de notícias: {todas_noticias.count()}")
-
-    # Filtrar notícias por seção
-    noticias_do_dia = todas_noticias.filter(secao='noticia_do_dia')[:4]
-    noticias_social1 = todas_noticias.filter(secao='social1')[:6]
-    noticias_jc360 = todas_noticias.filter(secao='jc360')[:6]
-    noticias_pernambuco = todas_noticias.filter(secao='pernambuco')[:6]
-    noticias_blog_torcedor = todas_noticias.filter(secao='blog_do_torcedor')[:6]
-    noticias_ultimas = todas_noticias.filter(secao='ultimas_noticias')[:4]
-    noticias_receita = todas_noticias.filter(secao='receita_da_boa')[:6]
+        print(f"[DEBUG] Filtrando por categorias: {categorias_preferidas}")
 
-    context = {
-        'noticias_mais_vistas': noticias_mais_vistas,
-        'todas_noticias': todas_noticias,
-        'noticias_do_dia': noticias_do_dia,
-        'noticias_social1': noticias_social1,
-        'noticias_jc360': noticias_jc360,
-        'noticias_pernambuco': noticias_pernambuco,
-        'noticias_blog_torcedor': noticias_blog_torcedor,
-        'noticias_ultimas': noticias_ultimas,
-        'noticias_receita': noticias_receita,
-    }
+    # Seções (uma consulta com ROW_NUMBER por seção) e mais vistas do dia,
+    # em cache por conjunto de categorias
+    context = dict(obter_pagina_inicial(categorias_preferidas))
+    # Versões usadas pelo {% cache %} do HTML de cada seção no template
+    context.update(contexto_fragmentos(categorias_preferidas))
     return render(request, 'index.html', context)
 
 # Página com todas as enquetes
@@ -125,18 +118,21 @@ def detalhe_enquete(request, enquete_id):
 
     # IMPORTANT: get_client_ip agora lê POST/GET fake_ip também
     ip_usuario = get_client_ip(request)
-    ja_votou = Voto.objects.filter(opcao__enquete=enquete, ip_usuario=ip_usuario).exists()
+    # Votantes da enquete ficam em memória (votos.py): sem consulta por voto
+    ja_votou = buffer_votos.ja_votou(enquete.id, ip_usuario)
 
     if request.method == 'POST':
         if ja_votou:
             # avisar que já votou
             messages.warning(request, "Você já votou nesta enquete com o IP atual.")
         else:
-            opcao_id = request.POST.get('opcao')
-            # validação adicional: opcao_id existe
-            opcao = get_object_or_404(Opcao, id=opcao_id, enquete=enquete)
-            Voto.objects.create(opcao=opcao, ip_usuario=ip_usuario)
-            messages.success(request, "Voto registrado com sucesso!")
+            try:
+                if buffer_votos.registrar(enquete.id, request.POST.get('opcao'), ip_usuario):
+                    messages.success(request, "Voto registrado com sucesso!")
+                else:
+                    messages.warning(request, "Você já votou nesta enquete com o IP atual.")
+            except OpcaoInvalida:
+                raise Http404('Opção inválida')
         # redireciona para a mesma página para evitar reenvio de formulário
         # preservando querystring (ex.: ?fake_ip=1.2.3.4) para conveniência de testes
         redirect_url = request.path
@@ -145,104 +141,167 @@ def detalhe_enquete(request, enquete_id):
             redirect_url = f"{redirect_url}?{qs}"
         return redirect(redirect_url)
 
-    opcoes = enquete.opcoes.all()
-    total_votos = enquete.total_votos()
+    # Votos e percentuais de todas as opções em uma consulta (contadores de Opcao)
+    resultados = resultados_enquete(enquete.id)
 
     contexto = {
         'enquete': enquete,
-        'opcoes': opcoes,
-        'total_votos': total_votos,
+        'opcoes': resultados['opcoes'],
+        'total_votos': resultados['total'],
         'ja_votou': ja_votou,
     }
 
     return render(request, 'detalhe_enquete.html', contexto)
 
 
+@require_http_methods(["GET"])
+def api_resultados_enquete(request, enquete_id):
+    """Votos e percentuais de cada opção da enquete."""
+    resultados = resultados_enquete(enquete_id)
+    if not resultados['opcoes']:
+        get_object_or_404(Enquete, id=enquete_id)
+    return JsonResponse(dict(resultados, enquete_id=enquete_id))
+
+
+@require_http_methods(["GET"])
+async def api_enquete_ao_vivo(request, enquete_id):
+    """Resultados da enquete por Server-Sent Events (servir via ASGI: claraboiacorp/asgi.py).
+
+    Eventos ``resultados`` com o mesmo JSON de api_resultados_enquete, enviados
+    quando os votos mudam (no máximo um a cada ENQUETE_AO_VIVO_INTERVALO s).
+    Sem ENQUETE_AO_VIVO_SSE (deploy WSGI) responde 404: o stream nunca termina
+    e prenderia um worker.
+    """
+    if not getattr(settings, 'ENQUETE_AO_VIVO_SSE', False):
+        raise Http404('Resultados ao vivo desativados')
+    if not await Enquete.objects.filter(id=enquete_id).aexists():
+        raise Http404('Enquete não encontrada')
+    response = StreamingHttpResponse(central_ao_vivo.eventos(enquete_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx: não acumular o stream no buffer do proxy
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 def neels(request):
     """View para a página Neels"""
-    # Pegar todas as notícias ordenadas por data de publicação
-    noticias = Noticia.objects.select_related('categoria', 'autor').order_by('-data_publicacao')
-    
+    # Só a primeira tela; o restante vem de api_feed_neels conforme o leitor rola
+    noticias, proximo_cursor = pagina_feed()
+
     context = {
         'noticias': noticias,
+        'proximo_cursor': proximo_cursor,
     }
     return render(request, 'neels.html', context)
 
+
+@require_http_methods(["GET"])
+def api_feed_neels(request):
+    """Próxima página do feed do Neels.
+
+    Query params:
+      - cursor: valor de ``proximo_cursor`` da resposta anterior (vazio = início)
+      - limite: notícias por página (máximo feed.LIMITE_MAXIMO)
+    """
+    try:
+        limite = int(request.GET.get('limite', TAMANHO_PAGINA))
+        noticias, proximo_cursor = pagina_feed(request.GET.get('cursor'), limite)
+    except (ValueError, CursorInvalido):
+        return JsonResponse({'success': False, 'message': 'Parâmetros inválidos'}, status=400)
+
+    html = render_to_string('includes/card_neels.html', {'noticias': noticias}, request=request)
+    return JsonResponse({
+        'noticias': [serializar_card(noticia) for noticia in noticias],
+        'html': html,
+        'proximo_cursor': proximo_cursor,
+    })
+
 def noticia_detalhe(request, slug):
-    noticia = get_object_or_404(Noticia, slug=slug)
-    ip = get_client_ip(request)
-
-    # Cria uma visualização apenas se o IP ainda não tiver registrado essa notícia hoje
-    if not Visualizacao.objects.filter(noticia=noticia, ip_address=ip, data=timezone.now().date()).exists():
-        Visualizacao.objects.create(
-            noticia=noticia,
-            ip_address=ip,
-            data=timezone.now().date()  # Set the date field
-        )
+    # Visitantes anônimos recebem o HTML do cache: a leitura é registrada pelo
+    # beacon da página (api_registrar_visualizacao) e o estado do leitor
+    # (salva, já votou) vem de api_estado_noticia
+    anonimo = request.method == 'GET' and not request.user.is_authenticated
+    if anonimo:
+        html = cache.get(chave_pagina_noticia(slug))
+        if html is not None:
+            return HttpResponse(html)
 
-    # Verificar se o usuário já salvou esta notícia
-    noticia_salva = False
-    if request.user.is_authenticated:
-        noticia_salva = NoticaSalva.objects.filter(usuario=request.user, noticia=noticia).exists()
+    noticia = get_object_or_404(Noticia, slug=slug)
 
     # Processar votação da enquete se houver
-    ja_votou_enquete = False
-    enquete = None
-    if hasattr(noticia, 'enquete'):
-        enquete = noticia.enquete
-
-        # Verificar se já votou
-        ja_votou_enquete = Voto.objects.filter(
-            opcao__enquete=enquete,
-            ip_usuario=ip
-        ).exists()
-
-        # Processar voto se for POST
-        if request.method == 'POST' and not ja_votou_enquete:
-            opcao_id = request.POST.get('opcao_id')
-            if opcao_id:
-                try:
-                    opcao = Opcao.objects.get(id=opcao_id, enquete=enquete)
-                    Voto.objects.create(opcao=opcao, ip_usuario=ip)
-                    ja_votou_enquete = True
+    enquete = getattr(noticia, 'enquete', None)
+    if request.method == 'POST' and enquete is not None:
+        opcao_id = request.POST.get('opcao_id')
+        if opcao_id:
+            try:
+                if buffer_votos.registrar(enquete.id, opcao_id, get_client_ip(request)):
                     messages.success(request, 'Voto registrado com sucesso!')
                     return redirect('noticia_detalhe', slug=slug)
-                except Opcao.DoesNotExist:
-                    messages.error(request, 'Opção inválida.')
-        elif request.method == 'POST' and ja_votou_enquete:
-            messages.warning(request, 'Você já votou nesta enquete.')
-
-    # Buscar notícias relacionadas para a linha do tempo
-    # Critério: mesma categoria E compartilham tags
-    noticias_relacionadas = []
-    
-    if noticia.categoria:
-        # Obter IDs das tags da notícia atual
-        tags_ids = noticia.tags.values_list('id', flat=True)
-        
-        if tags_ids:
-            # Buscar notícias da mesma categoria que compartilham pelo menos uma tag
-            noticias_relacionadas = Noticia.objects.filter(
-                categoria=noticia.categoria,
-                tags__id__in=tags_ids
-            ).exclude(
-                id=noticia.id
-            ).distinct().select_related('categoria', 'autor').order_by('-data_publicacao')[:6]
-        
-        # Se não encontrou notícias com tags em comum, buscar apenas da mesma categoria
-        if len(noticias_relacionadas) == 0:
-            noticias_relacionadas = Noticia.objects.filter(
-                categoria=noticia.categoria
-            ).exclude(
-                id=noticia.id
-            ).select_related('categoria', 'autor').order_by('-data_publicacao')[:6]
-
-    return render(request, 'detalhes_noticia.html', {
+                messages.warning(request, 'Você já votou nesta enquete.')
+            except OpcaoInvalida:
+                messages.error(request, 'Opção inválida.')
+
+    # Notícias relacionadas para a linha do tempo, pré-calculadas por
+    # relacionadas.py (tags em comum, mesma categoria e recência)
+    noticias_relacionadas = list(
+        Noticia.objects.filter(relacionada_em__noticia=noticia)
+        .select_related('categoria', 'autor')
+        .order_by('relacionada_em__posicao')
+    )
+    if not noticias_relacionadas and noticia.categoria_id:
+        # Ainda não calculadas (o recálculo roda em segundo plano): as mais
+        # recentes da mesma categoria
+        noticias_relacionadas = list(
+            Noticia.objects.filter(categoria_id=noticia.categoria_id)
+            .exclude(pk=noticia.pk)
+            .select_related('categoria', 'autor')
+            .order_by('-data_publicacao')[:TOTAL_RELACIONADAS]
+        )
+
+    response = render(request, 'detalhes_noticia.html', {
         'noticia': noticia,
-        'noticia_salva': noticia_salva,
         'noticias_relacionadas': noticias_relacionadas,
         'enquete': enquete,
-        'ja_votou_enquete': ja_votou_enquete
+        'enquete_ao_vivo': getattr(settings, 'ENQUETE_AO_VIVO_SSE', False),
+        'enquete_intervalo_ms': int(getattr(settings, 'ENQUETE_RESULTADOS_INTERVALO', 15) * 1000),
+    })
+    if anonimo:
+        guardar_pagina_noticia(slug, response.content)
+    return response
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def api_registrar_visualizacao(request, noticia_id):
+    """Beacon disparado pela página da notícia para contar a leitura."""
+    registrar_visualizacao(noticia_id, get_client_ip(request))
+    return HttpResponse(status=204)
+
+
+@require_http_methods(["GET"])
+@ensure_csrf_cookie
+def api_estado_noticia(request, noticia_id):
+    """Estado do leitor em uma notícia: se está salva e se já votou na enquete.
+
+    Também define o cookie de CSRF, que a página em cache não traz (o voto na
+    enquete é um POST).
+    """
+    salva = False
+    if request.user.is_authenticated:
+        salva = NoticaSalva.objects.filter(usuario=request.user, noticia_id=noticia_id).exists()
+
+    enquete = None
+    enquete_id = Enquete.objects.filter(noticia_id=noticia_id).values_list('id', flat=True).first()
+    if enquete_id:
+        enquete = {
+            'id': enquete_id,
+            'ja_votou': buffer_votos.ja_votou(enquete_id, get_client_ip(request)),
+        }
+
+    return JsonResponse({
+        'noticia_id': noticia_id,
+        'salva': salva,
+        'enquete': enquete,
     })
 
 
@@ -324,14 +383,18 @@ def login_usuario(request):
             if user is not None:
                 login(request, user)
                 if is_ajax:
-                    return JsonResponse({
+                    response = JsonResponse({
                         'success': True,
                         'message': 'Login realizado com sucesso!',
                         'redirect_url': '/'
                     })
                 else:
                     messages.success(request, 'Login realizado com sucesso!')
-                    return redirect('index')
+                    response = redirect('index')
+                # Aviso de uso único para js/noticias.js levar à conta os
+                # salvos feitos antes do login (apagado pelo próprio script)
+                response.set_cookie(COOKIE_SALVOS_APOS_LOGIN, '1', max_age=3600, samesite='Lax')
+                return response
             else:
                 if is_ajax:
                     return JsonResponse({
@@ -370,26 +433,11 @@ def salvos(request):
 
 def mais_lidas(request):
     """View para página de notícias mais lidas"""
-    # Pegar notícias mais vistas hoje
-    noticias_hoje = Noticia.objects.all().annotate(
-        visualizacoes_dia=Count('visualizacoes', filter=Q(visualizacoes__data=timezone.now().date()))
-    ).filter(visualizacoes_dia__gt=0).order_by('-visualizacoes_dia')
-    # Pegar notícias mais vistas da semana
-    data_semana_atras = timezone.now().date() - timezone.timedelta(days=7)
-    noticias_semana = Noticia.objects.all().annotate(
-        visualizacoes_semana=Count('visualizacoes', filter=Q(visualizacoes__data__gte=data_semana_atras))
-    ).filter(visualizacoes_semana__gt=0).order_by('-visualizacoes_semana')
-    
-    # Pegar notícias mais vistas do mês
-    data_mes_atras = timezone.now().date() - timezone.timedelta(days=30)
-    noticias_mes = Noticia.objects.all().annotate(
-        visualizacoes_mes=Count('visualizacoes', filter=Q(visualizacoes__data__gte=data_mes_atras))
-    ).filter(visualizacoes_mes__gt=0).order_by('-visualizacoes_mes')
-    
+    # Listas pré-ordenadas pelo ranking deslizante (dias fechados + dia corrente)
     context = {
-        'noticias_hoje': noticias_hoje[:15],
-        'noticias_semana': noticias_semana[:15],
-        'noticias_mes': noticias_mes[:15],
+        'noticias_hoje': mais_vistas(ranking_deslizante.top('hoje', 15)),
+        'noticias_semana': mais_vistas(ranking_deslizante.top('semana', 15)),
+        'noticias_mes': mais_vistas(ranking_deslizante.top('mes', 15)),
     }
     
     return render(request, 'mais_lidas.html', context)
@@ -445,6 +493,68 @@ def remover_noticia_salva(request, noticia_id):
         })
 
 
+LIMITE_SINCRONIZACAO_SALVOS = 500
+# Cookie de uso único definido por login_usuario (ver js/noticias.js)
+COOKIE_SALVOS_APOS_LOGIN = 'salvos_apos_login'
+CAMPOS_CARTAO_SALVO = ('id', 'titulo', 'slug', 'resumo', 'imagem', 'categoria', 'data_publicacao')
+
+
+def _ids_validos(valores):
+    ids = []
+    for valor in valores or []:
+        try:
+            ids.append(int(valor))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def api_sincronizar_salvos(request):
+    """Aplica em lote as notícias salvas/removidas e devolve a lista atualizada.
+
+    Requisição: POST JSON {"adicionar": [1, 2], "remover": [3], "fields": "id,titulo"}.
+    Resposta: {"success": true, "salvos": [ids], "noticias": [cartões]}, do mais
+    recente para o mais antigo. Ids inexistentes são ignorados. Um GET
+    (``?fields=``) só devolve a lista, sem escrever nada.
+    """
+    try:
+        data = json.loads(request.body or b'{}') if request.method == 'POST' else {}
+        adicionar = set(_ids_validos(data.get('adicionar')))
+        remover = set(_ids_validos(data.get('remover'))) - adicionar
+        campos = campos_solicitados(data.get('fields') or request.GET.get('fields'), padrao=CAMPOS_CARTAO_SALVO)
+    except (json.JSONDecodeError, AttributeError, CampoInvalido) as e:
+        return JsonResponse({'success': False, 'message': f'Requisição inválida: {e}'}, status=400)
+    if len(adicionar) + len(remover) > LIMITE_SINCRONIZACAO_SALVOS:
+        return JsonResponse({
+            'success': False,
+            'message': f'No máximo {LIMITE_SINCRONIZACAO_SALVOS} notícias por sincronização.'
+        }, status=400)
+
+    if adicionar:
+        existentes = Noticia.objects.filter(id__in=adicionar).values_list('id', flat=True)
+        NoticaSalva.objects.bulk_create(
+            [NoticaSalva(usuario=request.user, noticia_id=noticia_id) for noticia_id in existentes],
+            ignore_conflicts=True,
+        )
+    if remover:
+        NoticaSalva.objects.filter(usuario=request.user, noticia_id__in=remover).delete()
+
+    noticias = serializar_noticias(
+        Noticia.objects.filter(salvamentos__usuario=request.user).order_by('-salvamentos__data_salvamento'),
+        list(dict.fromkeys(['id', *campos])),
+    )
+    response = JsonResponse({
+        'success': True,
+        'salvos': [noticia['id'] for noticia in noticias],
+        'noticias': [{campo: noticia[campo] for campo in campos} for noticia in noticias],
+    })
+    if request.method == 'GET':
+        patch_cache_control(response, private=True, max_age=60)
+    return response
+
+
 @require_http_methods(["POST"])
 def enviar_feedback(request):
     """View para processar o envio de feedback"""
@@ -500,26 +610,57 @@ def is_staff(user):
 
 @user_passes_test(is_staff, login_url='login_usuario')
 def admin_dashboard(request):
-    """View para o painel administrativo"""
-    hoje = timezone.now().date()
-
-    # Estatísticas
-    total_noticias = Noticia.objects.count()
-    total_categorias = Categoria.objects.count()
-    total_autores = Autor.objects.count()
-    visualizacoes_hoje = Visualizacao.objects.filter(data=hoje).count()
-
-    # Listar todas as notícias
-    noticias = Noticia.objects.select_related('categoria', 'autor').order_by('-data_publicacao')
+    """View para o painel administrativo
 
-    context = {
-        'total_noticias': total_noticias,
-        'total_categorias': total_categorias,
-        'total_autores': total_autores,
-        'visualizacoes_hoje': visualizacoes_hoje,
-        'noticias': noticias,
+    Query params (todos opcionais): q (título), categoria, autor, secao,
+    data_inicio e data_fim (AAAA-MM-DD) e page.
+    """
+    filtros = {
+        'q': request.GET.get('q', '').strip(),
+        'categoria': request.GET.get('categoria', ''),
+        'autor': request.GET.get('autor', ''),
+        'secao': request.GET.get('secao', ''),
+        'data_inicio': request.GET.get('data_inicio', ''),
+        'data_fim': request.GET.get('data_fim', ''),
     }
 
+    noticias = Noticia.objects.select_related('categoria', 'autor').only(
+        'id', 'titulo', 'slug', 'data_publicacao', 'categoria', 'categoria__nome', 'autor', 'autor__nome'
+    ).order_by('-data_publicacao', '-id')
+    if filtros['q']:
+        noticias = noticias.filter(titulo__icontains=filtros['q'])
+    if filtros['categoria'].isdecimal():
+        noticias = noticias.filter(categoria_id=int(filtros['categoria']))
+    if filtros['autor'].isdecimal():
+        noticias = noticias.filter(autor_id=int(filtros['autor']))
+    if filtros['secao']:
+        noticias = noticias.filter(secao=filtros['secao'])
+    try:
+        data_inicio = parse_date(filtros['data_inicio'])
+        data_fim = parse_date(filtros['data_fim'])
+    except ValueError:
+        data_inicio = data_fim = None
+    if data_inicio:
+        noticias = noticias.filter(data_publicacao__date__gte=data_inicio)
+    if data_fim:
+        noticias = noticias.filter(data_publicacao__date__lte=data_fim)
+
+    pagina = Paginator(noticias, getattr(settings, 'PAINEL_NOTICIAS_POR_PAGINA', 25)).get_page(request.GET.get('page'))
+    # Filtros repetidos nos links de paginação
+    parametros = request.GET.copy()
+    parametros.pop('page', None)
+
+    context = dict(obter_estatisticas())
+    context.update({
+        'noticias': pagina,
+        'pagina': pagina,
+        'filtros': filtros,
+        'parametros_filtro': parametros.urlencode(),
+        'categorias': Categoria.objects.only('id', 'nome').order_by('nome'),
+        'autores': Autor.objects.only('id', 'nome').order_by('nome'),
+        'secoes': Noticia.SECAO_CHOICES,
+    })
+
     return render(request, 'admin_dashboard.html', context)
 
 
@@ -681,47 +822,43 @@ def noticias_por_tags(request):
     """Lista notícias filtradas por tags.
 
     Query params:
-      - tags: lista separada por vírgula de ids ou nomes (ex: tags=1,2 ou tags=politica,esporte)
-      - match: 'any' (default) ou 'all' — 'all' tenta exigir todas as tags (apenas para ids)
+      - tags: lista separada por vírgula de ids ou nomes (ex: tags=1,2 ou tags=politica,esporte);
+        nomes valem sem acento/caixa e com erros de digitação (trigramas.py)
+      - match: 'any' (default) ou 'all' — 'all' exige todas as tags informadas
+      - fields: campos retornados (ex: fields=id,titulo,slug); padrão em serializacao.CAMPOS_PADRAO
     """
     tags_param = request.GET.get('tags', '')
     match = request.GET.get('match', 'any')
+    try:
+        campos = campos_solicitados(request.GET.get('fields'))
+    except CampoInvalido as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
 
+    resolvidas = None
     if not tags_param:
-        noticias = Noticia.objects.select_related('categoria', 'autor').order_by('-data_publicacao')[:50]
+        noticias, limite = Noticia.objects.order_by('-data_publicacao'), 50
     else:
         tag_list = [x.strip() for x in tags_param.split(',') if x.strip()]
         tag_ids = [int(x) for x in tag_list if x.isdigit()]
         tag_names = [x for x in tag_list if not x.isdigit()]
+        if tag_names:
+            resolvidas = indice_trigramas.resolver_tags(tag_names)
+            tag_ids += [tag_id for tag_id in resolvidas.values() if tag_id not in tag_ids]
 
         if match == 'all' and tag_ids:
-            # Filtrar notícias que tenham todas as tags informadas (por id)
+            # Filtrar notícias que tenham todas as tags informadas
             noticias = Noticia.objects.all()
             for tid in tag_ids:
                 noticias = noticias.filter(tags__id=tid)
-            noticias = noticias.select_related('categoria', 'autor').distinct().order_by('-data_publicacao')[:200]
+            noticias, limite = noticias.distinct().order_by('-data_publicacao'), 200
         else:
-            q = Q()
-            if tag_ids:
-                q |= Q(tags__id__in=tag_ids)
-            if tag_names:
-                q |= Q(tags__nome__in=tag_names)
-            noticias = Noticia.objects.filter(q).select_related('categoria', 'autor').distinct().order_by('-data_publicacao')[:200]
-
-    def serialize(n):
-        return {
-            'id': n.id,
-            'titulo': n.titulo,
-            'slug': n.slug,
-            'resumo': n.resumo,
-            'data_publicacao': n.data_publicacao.isoformat() if n.data_publicacao else None,
-            'categoria': n.categoria.nome if n.categoria else None,
-            'autor': n.autor.nome if n.autor else None,
-            'tags': [t.nome for t in n.tags.all()]
-        }
+            noticias, limite = Noticia.objects.filter(tags__id__in=tag_ids).distinct().order_by('-data_publicacao'), 200
 
-    data = [serialize(n) for n in noticias]
-    return JsonResponse({'noticias': data})
+    resposta = {'noticias': serializar_noticias(noticias, campos, limite)}
+    if resolvidas is not None:
+        # nome pedido -> id da tag usada (nomes sem tag parecida ficam de fora)
+        resposta['tags_resolvidas'] = resolvidas
+    return JsonResponse(resposta)
 
 
 @login_required
@@ -755,33 +892,34 @@ def atualizar_preferencias(request):
 
 @login_required
 def noticias_personalizadas(request):
-    """Retorna notícias personalizadas com base nas tags preferidas do usuário."""
+    """Retorna notícias personalizadas com base nas tags preferidas do usuário.
+
+    Aceita ``fields`` como noticias_por_tags (além de ``match_count``).
+    """
     perfil = getattr(request.user, 'perfil', None)
     if not perfil:
         return JsonResponse({'noticias': []})
 
-    tags = list(perfil.tags_preferidas.all())
-    if not tags:
+    tag_ids = list(perfil.tags_preferidas.values_list('id', flat=True))
+    try:
+        campos = campos_solicitados(
+            request.GET.get('fields'),
+            padrao=('id', 'titulo', 'slug', 'resumo') + (('match_count',) if tag_ids else ()),
+            extras=('match_count',) if tag_ids else (),
+        )
+    except CampoInvalido as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+
+    if not tag_ids:
         # Se usuário não tem preferência, retornar últimas notícias
-        noticias = Noticia.objects.select_related('categoria', 'autor').order_by('-data_publicacao')[:50]
-        data = [{'id': n.id, 'titulo': n.titulo, 'slug': n.slug, 'resumo': n.resumo} for n in noticias]
-        return JsonResponse({'noticias': data})
-
-    noticias = Noticia.objects.filter(tags__in=tags).annotate(
-        match_count=Count('tags', filter=Q(tags__in=tags))
-    ).order_by('-match_count', '-data_publicacao').distinct()[:200]
-
-    data = []
-    for n in noticias:
-        data.append({
-            'id': n.id,
-            'titulo': n.titulo,
-            'slug': n.slug,
-            'resumo': n.resumo,
-            'match_count': getattr(n, 'match_count', 0)
-        })
+        noticias = Noticia.objects.order_by('-data_publicacao')
+        return JsonResponse({'noticias': serializar_noticias(noticias, campos, limite=50)})
 
-    return JsonResponse({'noticias': data})
+    noticias = Noticia.objects.filter(tags__in=tag_ids).annotate(
+        match_count=Count('tags', filter=Q(tags__in=tag_ids))
+    ).order_by('-match_count', '-data_publicacao')
+
+    return JsonResponse({'noticias': serializar_noticias(noticias, campos, limite=200)})
 
 
 # ========== API PARA PREFERÊNCIAS DE CATEGORIAS ==========
@@ -852,55 +990,144 @@ def api_preferencias(request):
             }, status=500)
 
 
+# ========== BUSCA ==========
+@require_http_methods(["GET"])
+def api_buscar(request):
+    """Busca textual nas notícias.
+
+    O motor vem de ``BUSCA_MOTOR``: 'memoria' (índice BM25 em memória, busca.py)
+    ou 'banco' (full-text do próprio banco, busca_banco.py).
+
+    Query params:
+      - q: termos da busca
+      - categoria: slug da categoria; tag: id ou nome de tag (aproximado, como em noticias_por_tags)
+      - data: 'hoje', 'semana' ou 'mes'; ordenar: 'relevancia' (default), 'recentes' ou 'antigas'
+      - pagina, limite (máximo 50) e fields (como em noticias_por_tags)
+    """
+    consulta = request.GET.get('q', '').strip()
+    try:
+        campos = campos_solicitados(
+            request.GET.get('fields'), padrao=('id', 'titulo', 'slug', 'resumo', 'imagem', 'categoria', 'data_publicacao')
+        )
+        limite = max(1, min(int(request.GET.get('limite', 20)), 50))
+        pagina = max(1, int(request.GET.get('pagina', 1)))
+    except (ValueError, CampoInvalido) as e:
+        return JsonResponse({'success': False, 'message': f'Parâmetros inválidos: {e}'}, status=400)
+
+    vazio = {'q': consulta, 'total': 0, 'pagina': pagina, 'resultados': []}
+    if not consulta:
+        return JsonResponse(vazio)
+
+    categoria_id = None
+    if request.GET.get('categoria'):
+        categoria_id = Categoria.objects.filter(slug=request.GET['categoria']).values_list('id', flat=True).first()
+        if categoria_id is None:
+            return JsonResponse(vazio)
+    tag_ids = None
+    tag = request.GET.get('tag', '').strip()
+    if tag:
+        tag_ids = [int(tag)] if tag.isdecimal() else list(indice_trigramas.resolver_tags([tag]).values())
+        if not tag_ids:
+            return JsonResponse(vazio)
+
+    motor = busca_banco if getattr(settings, 'BUSCA_MOTOR', 'memoria') == 'banco' else indice_busca
+    total, encontrados = motor.buscar(
+        consulta,
+        categoria_id=categoria_id,
+        tag_ids=tag_ids,
+        desde=inicio_do_periodo(request.GET.get('data')),
+        ordenar=request.GET.get('ordenar', 'relevancia'),
+        limite=limite,
+        deslocamento=(pagina - 1) * limite,
+    )
+    scores = dict(encontrados)
+    noticias = serializar_noticias(Noticia.objects.filter(id__in=scores), list(dict.fromkeys(['id', *campos])))
+    posicao = {noticia_id: i for i, (noticia_id, _) in enumerate(encontrados)}
+    noticias.sort(key=lambda noticia: posicao[noticia['id']])
+    resultados = []
+    for noticia in noticias:
+        item = {campo: noticia[campo] for campo in campos}
+        item['score'] = round(scores[noticia['id']], 4)
+        resultados.append(item)
+
+    return JsonResponse({'q': consulta, 'total': total, 'pagina': pagina, 'resultados': resultados})
+
+
+@require_http_methods(["GET"])
+def api_busca_aproximada(request):
+    """Tags, categorias e títulos parecidos com ?q=, tolerando erros de digitação.
+
+    Query params: q; tipos (padrão 'tag,categoria,noticia'); limite por tipo (máximo 20).
+    """
+    consulta = request.GET.get('q', '').strip()[:100]
+    tipos = [tipo for tipo in request.GET.get('tipos', ','.join(TIPOS_APROXIMADOS)).split(',') if tipo]
+    try:
+        limite = max(1, min(int(request.GET.get('limite', 5)), 20))
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'limite inválido'}, status=400)
+    if any(tipo not in TIPOS_APROXIMADOS for tipo in tipos):
+        return JsonResponse({'success': False, 'message': f'tipos aceitos: {", ".join(TIPOS_APROXIMADOS)}'}, status=400)
+    candidatos = {tipo: indice_trigramas.similares(consulta, tipo, limite) if consulta else [] for tipo in tipos}
+    return JsonResponse({'q': consulta, 'candidatos': candidatos})
+
+
+@require_http_methods(["GET"])
+def api_sugestoes(request):
+    """Sugestões para o campo de busca a partir do prefixo digitado (?q=)."""
+    prefixo = request.GET.get('q', '')[:100]
+    response = JsonResponse({'q': prefixo, 'sugestoes': indice_sugestoes.sugerir(prefixo)})
+    # Prefixos curtos se repetem entre leitores: guardados por mais tempo
+    # nos caches intermediários (CDN/proxy) e no navegador
+    curto = len(prefixo.strip()) <= 3
+    patch_cache_control(response, public=True, max_age=getattr(
+        settings, 'SUGESTOES_CACHE_PREFIXO_CURTO' if curto else 'SUGESTOES_CACHE_TTL', 300 if curto else 60
+    ))
+    return response
+
+
 # ========== LINHA DO TEMPO ==========
 def linha_do_tempo(request):
-    """View para página de linha do tempo - agrupa notícias cronologicamente."""
-    from collections import defaultdict
-    from datetime import datetime
-
-    # Buscar todas as notícias ordenadas da mais recente para a mais antiga
-    todas_noticias = Noticia.objects.select_related('categoria', 'autor').prefetch_related('tags').order_by('-data_publicacao')
-
-    # Agrupar notícias por ano e mês
-    timeline_data = defaultdict(lambda: defaultdict(list))
-
-    for noticia in todas_noticias:
-        ano = noticia.data_publicacao.year
-        mes = noticia.data_publicacao.month
-        timeline_data[ano][mes].append(noticia)
-
-    # Converter para lista ordenada para o template
-    timeline_list = []
-    for ano in sorted(timeline_data.keys(), reverse=True):
-        meses_data = []
-        for mes in sorted(timeline_data[ano].keys(), reverse=True):
-            # Nome do mês em português
-            meses_pt = {
-                1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril',
-                5: 'Maio', 6: 'Junho', 7: 'Julho', 8: 'Agosto',
-                9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
-            }
-
-            meses_data.append({
-                'numero': mes,
-                'nome': meses_pt[mes],
-                'noticias': timeline_data[ano][mes]
-            })
-
-        timeline_list.append({
-            'ano': ano,
-            'meses': meses_data
-        })
+    """View para página de linha do tempo - só o esqueleto de anos e meses.
 
-    # Buscar todas as categorias e tags para filtros
-    categorias = Categoria.objects.all()
-    tags = Tag.objects.all()
+    As notícias de cada mês vêm de api_linha_do_tempo_mes quando o mês é aberto.
+    """
+    categoria = request.GET.get('categoria') or None
+    tag = request.GET.get('tag') or None
 
     context = {
-        'timeline': timeline_list,
-        'categorias': categorias,
-        'tags': tags,
+        'timeline': montar_esqueleto(categoria, tag),
+        'categorias': Categoria.objects.all(),
+        'tags': Tag.objects.all(),
+        'categoria_selecionada': categoria,
+        'tag_selecionada': tag,
     }
 
     return render(request, 'linha_do_tempo.html', context)
 
+
+@require_http_methods(["GET"])
+def api_linha_do_tempo_mes(request, ano, mes):
+    """Notícias de um mês da linha do tempo, paginadas por cursor.
+
+    Query params: categoria, tag, cursor e limite (mesmos de api_feed_neels).
+    """
+    if not 1 <= mes <= 12:
+        return JsonResponse({'success': False, 'message': 'Mês inválido'}, status=404)
+    # datetime só vai até 9999 e intervalo_do_mes precisa do mês seguinte
+    if not 1 <= ano <= 9998:
+        return JsonResponse({'success': False, 'message': 'Ano inválido'}, status=404)
+
+    noticias = noticias_do_mes(ano, mes, request.GET.get('categoria') or None, request.GET.get('tag') or None)
+    try:
+        limite = int(request.GET.get('limite', TAMANHO_PAGINA))
+        noticias, proximo_cursor = paginar_por_cursor(noticias, request.GET.get('cursor'), limite)
+    except (ValueError, CursorInvalido):
+        return JsonResponse({'success': False, 'message': 'Parâmetros inválidos'}, status=400)
+
+    return JsonResponse({
+        'noticias': [
+            dict(serializar_card(noticia), tags=[tag.nome for tag in noticia.tags.all()])
+            for noticia in noticias
+        ],
+        'proximo_cursor': proximo_cursor,
+    })
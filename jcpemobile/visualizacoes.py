@@ -0,0 +1,176 @@
+# jcpemobile/visualizacoes.py
+"""Ingestão de visualizações em lote (write-behind).
+
+Cada leitura de notícia entra num buffer em memória, deduplicado por
+(noticia, ip, data). Uma thread em segundo plano descarrega o buffer
+periodicamente em lote (``lotes.inserir_ignorando_conflitos``), deixando o
+``unique_together`` de ``Visualizacao`` resolver duplicatas entre processos.
+Os ouvintes (o ranking deslizante) recebem só as chaves que de fato
+entraram, não as que outro processo já tinha gravado. O beacon é público:
+IPs inválidos são recusados na entrada, e um lote que falha
+``VISUALIZACOES_MAX_FALHAS`` vezes seguidas é descartado em vez de voltar ao
+buffer para sempre.
+
+Com ``VISUALIZACOES_SINCRONO = True`` (útil em testes) cada visualização é
+gravada na hora, sem passar pelo buffer, mas com a mesma deduplicação.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+
+from .lotes import inserir_ignorando_conflitos, normalizar_ip
+
+logger = logging.getLogger(__name__)
+
+
+class BufferVisualizacoes:
+    """Acumula visualizações em memória e grava em lote no banco."""
+
+    def __init__(self, intervalo=5.0, tamanho_maximo=500, limite_vistos=100_000, max_falhas=5):
+        self.intervalo = intervalo
+        self.tamanho_maximo = tamanho_maximo
+        self.limite_vistos = limite_vistos
+        self.max_falhas = max_falhas
+        self._falhas = 0
+        self._lock = threading.Lock()
+        self._pendentes = set()
+        # Chaves já gravadas no dia corrente: evita reenviar ao banco o mesmo
+        # leitor que recarrega a página várias vezes.
+        self._vistos = set()
+        self._dia_vistos = None
+        self._ouvintes = []
+        self._thread = None
+        self._parar = threading.Event()
+
+    def registrar(self, noticia_id, ip, data=None):
+        """Registra uma visualização; retorna True se ela for nova neste processo."""
+        ip = normalizar_ip(ip)
+        if ip is None:
+            return False
+        data = data or timezone.now().date()
+        chave = (noticia_id, ip, data)
+
+        sincrono = getattr(settings, 'VISUALIZACOES_SINCRONO', False)
+        with self._lock:
+            if data != self._dia_vistos:
+                self._vistos.clear()
+                self._dia_vistos = data
+            if chave in self._vistos or chave in self._pendentes:
+                return False
+            if not sincrono:
+                self._pendentes.add(chave)
+                cheio = len(self._pendentes) >= self.tamanho_maximo
+
+        if sincrono:
+            self._gravar([chave])
+            with self._lock:
+                if len(self._vistos) >= self.limite_vistos:
+                    self._vistos.clear()
+                self._vistos.add(chave)
+            return True
+
+        self._iniciar()
+        if cheio:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Grava tudo o que está pendente. Retorna o número de chaves enviadas."""
+        with self._lock:
+            if not self._pendentes:
+                return 0
+            lote, self._pendentes = self._pendentes, set()
+
+        try:
+            self._gravar(lote)
+        except Exception:
+            with self._lock:
+                self._falhas += 1
+                if self._falhas >= self.max_falhas:
+                    logger.exception('Erro ao gravar %d visualizações (%d falhas seguidas); descartando o lote',
+                                     len(lote), self._falhas)
+                    self._falhas = 0
+                    return 0
+                logger.exception('Erro ao gravar %d visualizações; devolvendo ao buffer', len(lote))
+                self._pendentes |= lote
+            return 0
+
+        with self._lock:
+            self._falhas = 0
+            if len(self._vistos) + len(lote) > self.limite_vistos:
+                self._vistos.clear()
+            self._vistos.update(chave for chave in lote if chave[2] == self._dia_vistos)
+        return len(lote)
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    def ao_gravar(self, ouvinte):
+        """Registra uma função chamada com as chaves de cada lote que o banco aceitou."""
+        self._ouvintes.append(ouvinte)
+        return ouvinte
+
+    def _gravar(self, chaves):
+        from .models import Noticia, Visualizacao
+
+        # O beacon aceita qualquer id; ids inexistentes derrubariam o lote inteiro
+        # (chave estrangeira), então são descartados aqui, numa consulta por lote.
+        noticia_ids = {noticia_id for noticia_id, _, _ in chaves}
+        existentes = set(Noticia.objects.filter(id__in=noticia_ids).values_list('id', flat=True))
+        agora = timezone.now()
+        linhas = [(noticia_id, ip, data, agora) for noticia_id, ip, data in chaves if noticia_id in existentes]
+        if not linhas:
+            return
+        gravadas = inserir_ignorando_conflitos(
+            Visualizacao, ('noticia', 'ip_address', 'data', 'data_visualizacao'), linhas,
+            unicos=('noticia', 'ip_address', 'data'),
+        )
+        chaves = [linha[:3] for linha in gravadas]
+        if not chaves:
+            return
+        for ouvinte in self._ouvintes:
+            try:
+                ouvinte(chaves)
+            except Exception:
+                logger.exception('Erro no ouvinte de visualizações %r', ouvinte)
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name='buffer-visualizacoes', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self.flush()
+            # A thread tem conexão própria; não deixar aberta entre os ciclos.
+            connections.close_all()
+
+    def parar(self):
+        """Interrompe a thread e descarrega o que restou (usado no desligamento)."""
+        self._parar.set()
+        self.flush()
+
+
+buffer_visualizacoes = BufferVisualizacoes(
+    intervalo=getattr(settings, 'VISUALIZACOES_FLUSH_INTERVALO', 5.0),
+    tamanho_maximo=getattr(settings, 'VISUALIZACOES_FLUSH_TAMANHO', 500),
+    max_falhas=getattr(settings, 'VISUALIZACOES_MAX_FALHAS', 5),
+)
+
+atexit.register(buffer_visualizacoes.parar)
+
+
+def registrar_visualizacao(noticia, ip):
+    """Atalho usado pelas views: aceita a notícia ou o seu id."""
+    noticia_id = getattr(noticia, 'pk', noticia)
+    return buffer_visualizacoes.registrar(noticia_id, ip)
@@ -0,0 +1,218 @@
+# jcpemobile/votos.py
+"""Ingestão de votos de enquete em lote.
+
+Cada processo guarda, por enquete, o conjunto de IPs que já votaram e os ids
+das opções válidas, carregados do banco na primeira vez que a enquete recebe
+um voto (uma consulta por enquete, sem junção: ``Voto.enquete``). Um voto
+novo só passa por esse conjunto e entra num buffer; uma thread descarrega o
+buffer em lote (``lotes.inserir_ignorando_conflitos``) e soma aos contadores
+das opções só os votos que de fato entraram, num único UPDATE.
+
+Quem decide de fato é o banco: a restrição ``voto_unico_por_enquete`` descarta
+o voto que outro processo já gravou para o mesmo IP, e o voto descartado não
+entra nos contadores. Votos em opções apagadas são descartados antes de
+gravar, e um lote que falha ``VOTOS_MAX_FALHAS`` vezes seguidas é abandonado
+em vez de voltar ao buffer para sempre. Apagar votos, opções ou enquetes
+esquece os votantes carregados (``signals.py``).
+
+Com ``VOTOS_SINCRONO = True`` (útil em testes) cada voto é gravado na hora.
+Os resultados (``enquetes.resultados_enquete``) podem atrasar até
+``VOTOS_FLUSH_INTERVALO`` segundos em relação aos votos aceitos.
+"""
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from .lotes import inserir_ignorando_conflitos, normalizar_ip
+
+logger = logging.getLogger(__name__)
+
+
+class OpcaoInvalida(ValueError):
+    pass
+
+
+class _Enquete:
+    __slots__ = ('opcoes', 'votantes')
+
+    def __init__(self, opcoes, votantes):
+        self.opcoes = opcoes
+        self.votantes = votantes
+
+
+class BufferVotos:
+    """Acumula votos em memória, deduplicados por (enquete, ip), e grava em lote."""
+
+    def __init__(self, intervalo=1.0, tamanho_maximo=1000, enquetes_em_memoria=20, max_falhas=5):
+        self.intervalo = intervalo
+        self.tamanho_maximo = tamanho_maximo
+        self.enquetes_em_memoria = enquetes_em_memoria
+        self.max_falhas = max_falhas
+        self._falhas = 0
+        self._lock = threading.Lock()
+        # Um flush por vez: a thread e uma requisição que encheu o buffer
+        # não disputam a mesma tabela
+        self._lock_gravacao = threading.Lock()
+        self._pendentes = []
+        # enquete_id -> _Enquete, das usadas mais recentemente
+        self._enquetes = OrderedDict()
+        self._thread = None
+        self._parar = threading.Event()
+
+    def _enquete(self, enquete_id):
+        """Opções e votantes da enquete (chamado com o lock; carrega se preciso)."""
+        from .models import Opcao, Voto
+
+        estado = self._enquetes.get(enquete_id)
+        if estado is None:
+            opcoes = set(Opcao.objects.filter(enquete_id=enquete_id).values_list('id', flat=True))
+            votantes = set(Voto.objects.filter(enquete_id=enquete_id).values_list('ip_usuario', flat=True))
+            # Votos ainda no buffer também contam
+            votantes.update(ip for pendente_enquete, _, ip, _ in self._pendentes if pendente_enquete == enquete_id)
+            estado = self._enquetes[enquete_id] = _Enquete(opcoes, votantes)
+            while len(self._enquetes) > self.enquetes_em_memoria:
+                self._enquetes.popitem(last=False)
+        else:
+            self._enquetes.move_to_end(enquete_id)
+        return estado
+
+    def ja_votou(self, enquete_id, ip):
+        ip = normalizar_ip(ip)
+        if ip is None:
+            return False
+        with self._lock:
+            return ip in self._enquete(enquete_id).votantes
+
+    def registrar(self, enquete_id, opcao_id, ip):
+        """Aceita o voto; False se o IP já votou na enquete. ``OpcaoInvalida`` se a opção não for dela."""
+        from .models import Opcao
+
+        try:
+            opcao_id = int(opcao_id)
+        except (TypeError, ValueError):
+            raise OpcaoInvalida(opcao_id)
+        ip = normalizar_ip(ip)
+        if ip is None:
+            return False
+
+        with self._lock:
+            estado = self._enquete(enquete_id)
+            if opcao_id not in estado.opcoes:
+                # Pode ser uma opção criada depois que a enquete foi carregada
+                if not Opcao.objects.filter(id=opcao_id, enquete_id=enquete_id).exists():
+                    raise OpcaoInvalida(opcao_id)
+                estado.opcoes.add(opcao_id)
+            if ip in estado.votantes:
+                return False
+            estado.votantes.add(ip)
+            self._pendentes.append((enquete_id, opcao_id, ip, timezone.now()))
+            cheio = len(self._pendentes) >= self.tamanho_maximo
+
+        if getattr(settings, 'VOTOS_SINCRONO', False) or cheio:
+            self.flush()
+        else:
+            self._iniciar()
+        return True
+
+    def flush(self):
+        """Grava os votos pendentes. Retorna quantos foram enviados ao banco."""
+        with self._lock_gravacao:
+            with self._lock:
+                if not self._pendentes:
+                    return 0
+                lote, self._pendentes = self._pendentes, []
+
+            try:
+                self._gravar(lote)
+            except Exception:
+                self._falhas += 1
+                if self._falhas >= self.max_falhas:
+                    logger.exception('Erro ao gravar %d votos (%d falhas seguidas); descartando o lote',
+                                     len(lote), self._falhas)
+                    self._falhas = 0
+                    # Os votantes descartados podem votar de novo
+                    self.invalidar(*{enquete_id for enquete_id, _, _, _ in lote})
+                    return 0
+                logger.exception('Erro ao gravar %d votos; devolvendo ao buffer', len(lote))
+                with self._lock:
+                    self._pendentes[:0] = lote
+                return 0
+            self._falhas = 0
+            return len(lote)
+
+    def pendentes(self):
+        with self._lock:
+            return len(self._pendentes)
+
+    def invalidar(self, *enquete_ids):
+        """Esquece votantes e opções carregados (recarregados no próximo voto).
+
+        Sem argumentos, esquece todas as enquetes.
+        """
+        with self._lock:
+            if not enquete_ids:
+                self._enquetes.clear()
+            for enquete_id in enquete_ids:
+                self._enquetes.pop(enquete_id, None)
+
+    def _gravar(self, lote):
+        from .models import Opcao, Voto
+
+        # Opção apagada (ou movida de enquete) depois do voto derrubaria o lote
+        # inteiro pela chave estrangeira: descartada aqui, numa consulta
+        existentes = set(
+            Opcao.objects.filter(id__in={opcao_id for _, opcao_id, _, _ in lote}).values_list('id', 'enquete_id')
+        )
+        lote = [voto for voto in lote if (voto[1], voto[0]) in existentes]
+        if not lote:
+            return
+
+        with transaction.atomic():
+            # Não passa por signals: os contadores recebem só os votos que
+            # entraram, sem contar a tabela de votos
+            inseridos = {}
+            for _, opcao_id, _, _ in inserir_ignorando_conflitos(
+                Voto, ('enquete', 'opcao', 'ip_usuario', 'data'), lote, unicos=('enquete', 'ip_usuario')
+            ):
+                inseridos[opcao_id] = inseridos.get(opcao_id, 0) + 1
+            if inseridos:
+                Opcao.objects.filter(id__in=inseridos).update(quantidade_votos=F('quantidade_votos') + Case(
+                    *(When(id=opcao_id, then=quantidade) for opcao_id, quantidade in inseridos.items())
+                ))
+
+    def _iniciar(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._loop, name='buffer-votos', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo):
+            self.flush()
+            # A thread tem conexão própria; não deixar aberta entre os ciclos.
+            connections.close_all()
+
+    def parar(self):
+        """Interrompe a thread e descarrega o que restou (usado no desligamento)."""
+        self._parar.set()
+        self.flush()
+
+
+buffer_votos = BufferVotos(
+    intervalo=getattr(settings, 'VOTOS_FLUSH_INTERVALO', 1.0),
+    tamanho_maximo=getattr(settings, 'VOTOS_FLUSH_TAMANHO', 1000),
+    enquetes_em_memoria=getattr(settings, 'VOTOS_ENQUETES_EM_MEMORIA', 20),
+    max_falhas=getattr(settings, 'VOTOS_MAX_FALHAS', 5),
+)
+
+atexit.register(buffer_votos.parar)